@@ -182,6 +182,186 @@ MemRescaleDown = dict(
 )
 
 
+disk_exceeded_upper = dict(
+    _id='disk_exceeded_upper',
+    type='rule',
+    resource="disk",
+    name='disk_exceeded_upper',
+    rule=dict(
+        {"and": [
+            {">": [
+                {"var": "disk.structure.disk.usage"},
+                {"var": "disk.limits.disk.upper"}]},
+            {"<": [
+                {"var": "disk.limits.disk.upper"},
+                {"var": "disk.structure.disk.max"}]},
+            {"<": [
+                {"var": "disk.structure.disk.current"},
+                {"var": "disk.structure.disk.max"}]}
+        ]
+        }),
+    generates="events",
+    action={"events": {"scale": {"up": 1}}},
+    active=True
+)
+
+disk_dropped_lower = dict(
+    _id='disk_dropped_lower',
+    type='rule',
+    resource="disk",
+    name='disk_dropped_lower',
+    rule=dict(
+        {"and": [
+            {">": [
+                {"var": "disk.structure.disk.usage"},
+                0]},
+            {"<": [
+                {"var": "disk.structure.disk.usage"},
+                {"var": "disk.limits.disk.lower"}]},
+            {">": [
+                {"var": "disk.limits.disk.lower"},
+                {"var": "disk.structure.disk.min"}]}]}),
+    generates="events",
+    action={"events": {"scale": {"down": 1}}},
+    active=True
+)
+
+# Disk bandwidth in MB/s, scale it up quickly so that I/O-bound containers don't stall
+DiskRescaleUp = dict(
+    _id='DiskRescaleUp',
+    type='rule',
+    resource="disk",
+    name='DiskRescaleUp',
+    rule=dict(
+        {"and": [
+            {">=": [
+                {"var": "events.scale.up"},
+                2]},
+            {"<=": [
+                {"var": "events.scale.down"},
+                2]}
+        ]}),
+    events_to_remove=2,
+    generates="requests",
+    action={"requests": ["DiskRescaleUp"]},
+    amount=50,
+    rescale_policy="amount",
+    rescale_type="up",
+    active=True
+)
+
+DiskRescaleDown = dict(
+    _id='DiskRescaleDown',
+    type='rule',
+    resource="disk",
+    name='DiskRescaleDown',
+    rule=dict(
+        {"and": [
+            {">=": [
+                {"var": "events.scale.down"},
+                8]},
+            {"<=": [
+                {"var": "events.scale.up"},
+                0]}
+        ]}),
+    events_to_remove=8,
+    generates="requests",
+    action={"requests": ["DiskRescaleDown"]},
+    rescale_policy="fit_to_usage",
+    rescale_type="down",
+    active=True
+)
+
+net_exceeded_upper = dict(
+    _id='net_exceeded_upper',
+    type='rule',
+    resource="net",
+    name='net_exceeded_upper',
+    rule=dict(
+        {"and": [
+            {">": [
+                {"var": "net.structure.net.usage"},
+                {"var": "net.limits.net.upper"}]},
+            {"<": [
+                {"var": "net.limits.net.upper"},
+                {"var": "net.structure.net.max"}]},
+            {"<": [
+                {"var": "net.structure.net.current"},
+                {"var": "net.structure.net.max"}]}
+        ]
+        }),
+    generates="events",
+    action={"events": {"scale": {"up": 1}}},
+    active=True
+)
+
+net_dropped_lower = dict(
+    _id='net_dropped_lower',
+    type='rule',
+    resource="net",
+    name='net_dropped_lower',
+    rule=dict(
+        {"and": [
+            {">": [
+                {"var": "net.structure.net.usage"},
+                0]},
+            {"<": [
+                {"var": "net.structure.net.usage"},
+                {"var": "net.limits.net.lower"}]},
+            {">": [
+                {"var": "net.limits.net.lower"},
+                {"var": "net.structure.net.min"}]}]}),
+    generates="events",
+    action={"events": {"scale": {"down": 1}}},
+    active=True
+)
+
+# Network bandwidth in Mbit/s
+NetRescaleUp = dict(
+    _id='NetRescaleUp',
+    type='rule',
+    resource="net",
+    name='NetRescaleUp',
+    rule=dict(
+        {"and": [
+            {">=": [
+                {"var": "events.scale.up"},
+                2]},
+            {"<=": [
+                {"var": "events.scale.down"},
+                2]}
+        ]}),
+    events_to_remove=2,
+    generates="requests",
+    action={"requests": ["NetRescaleUp"]},
+    amount=100,
+    rescale_policy="amount",
+    rescale_type="up",
+    active=True
+)
+
+NetRescaleDown = dict(
+    _id='NetRescaleDown',
+    type='rule',
+    resource="net",
+    name='NetRescaleDown',
+    rule=dict(
+        {"and": [
+            {">=": [
+                {"var": "events.scale.down"},
+                8]},
+            {"<=": [
+                {"var": "events.scale.up"},
+                0]}
+        ]}),
+    events_to_remove=8,
+    generates="requests",
+    action={"requests": ["NetRescaleDown"]},
+    rescale_policy="fit_to_usage",
+    rescale_type="down",
+    active=True
+)
+
 # This rule is used by the ReBalancer, NOT the Guardian, leave it deactivated
 cpu_usage_low = dict(
     _id='cpu_usage_low',
@@ -328,6 +508,14 @@ if __name__ == "__main__":
         handler.add_rule(mem_dropped_lower)
         handler.add_rule(MemRescaleUp)
         handler.add_rule(MemRescaleDown)
+        handler.add_rule(disk_exceeded_upper)
+        handler.add_rule(disk_dropped_lower)
+        handler.add_rule(DiskRescaleUp)
+        handler.add_rule(DiskRescaleDown)
+        handler.add_rule(net_exceeded_upper)
+        handler.add_rule(net_dropped_lower)
+        handler.add_rule(NetRescaleUp)
+        handler.add_rule(NetRescaleDown)
         handler.add_rule(cpu_usage_high)
         handler.add_rule(cpu_usage_low)
         handler.add_rule(energy_exceeded_upper)
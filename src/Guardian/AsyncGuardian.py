@@ -0,0 +1,303 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import asyncio
+import aiohttp
+
+from src.MyUtils.MyUtils import log_info, log_error
+from src.StateDatabase.async_couchdb import AsyncCouchDBServer
+from src.StateDatabase.async_opentsdb import AsyncOpenTSDBServer
+from src.WattWizard.AsyncWattWizardUtils import AsyncWattWizardUtils
+from src.Guardian.Guardian import TAGS, translator_dict
+
+# Maximum time in seconds to connect to or wait for data from the remote services, as done by the synchronous clients
+REQUEST_TIMEOUT = 10
+
+
+class AsyncGuardianEngine:
+    """
+    Engine that guards the structures of a Guardian epoch as coroutines of a single asyncio event loop, instead of
+    using a pool of threads. The remote operations are done with asynchronous HTTP clients, while all the decisions
+    (i.e., events, requests and limits) are taken by the same Guardian methods used by the threads engine, so both
+    engines produce the same results. The number of structures processed concurrently is bounded by a semaphore.
+    """
+
+    def __init__(self, guardian):
+        self.guardian = guardian
+        self.couchdb = None
+        self.opentsdb = None
+        self.wattwizard = None
+
+    def guard_structures(self, structures):
+        asyncio.run(self.__guard_structures(structures))
+
+    async def __guard_structures(self, structures):
+        guardian = self.guardian
+        connector = aiohttp.TCPConnector(limit=guardian.async_concurrency)
+        # The waits for a free connection are not limited, as they are already bounded by the concurrency
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=REQUEST_TIMEOUT, sock_read=REQUEST_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self.couchdb = AsyncCouchDBServer(guardian.couchdb_handler.server, session)
+            # Use the same databases as the synchronous client, which may have been changed (e.g., for testing)
+            for database_type in ["structures", "limits", "rules", "events", "requests"]:
+                self.couchdb.set_database_name(database_type, guardian.couchdb_handler.get_database_name(database_type))
+            self.opentsdb = AsyncOpenTSDBServer(guardian.opentsdb_handler.server, session)
+            self.wattwizard = AsyncWattWizardUtils(guardian.wattwizard_handler.server, session)
+
+            # Remote database operations
+            rules, structures_usages, structures_limits = await asyncio.gather(
+                self.get_rules(), self.get_structures_usages(structures), self.get_structures_limits(structures))
+
+            guardian.start_epoch_writes()
+
+            semaphore = asyncio.Semaphore(guardian.async_concurrency)
+            coroutines = list()
+            if guardian.vectorized_rules:
+                # Match the usages and limits of all the structures at once, then process the events of each one
+                prepared_structures, structures = guardian.prepare_structures(structures, rules, structures_usages,
+                                                                              structures_limits)
+                with guardian.metrics.timer("phase_duration_seconds", {"phase": "rule_matching"}):
+                    structures_events = guardian.match_structures_usages_and_limits(prepared_structures, rules)
+                for (structure, usages, limits, _), triggered_events in zip(prepared_structures, structures_events):
+                    if triggered_events is None:
+                        continue
+                    coroutines.append(self.process_prepared_structure(structure, usages, limits, rules,
+                                                                      triggered_events, semaphore))
+
+            for structure in structures:
+                coroutines.append(self.serverless(structure, rules, structures_usages.get(structure["name"]),
+                                                  structures_limits.get(structure["name"]), semaphore))
+            await asyncio.gather(*coroutines)
+
+            await self.flush_epoch_writes()
+
+    async def get_rules(self):
+        state_handler = self.guardian.get_state_handler()
+        with self.guardian.metrics.timer("phase_duration_seconds", {"phase": "rules_fetch"}):
+            if state_handler is not self.guardian.couchdb_handler:
+                # Local operation, the databases are mirrored
+                return state_handler.get_rules()
+            # Remote database operation
+            return await self.couchdb.get_rules()
+
+    async def get_structures_usages(self, structures):
+        guardian = self.guardian
+        # Use the samples pushed by the agents if available, the rest of the usages are retrieved from OpenTSDB
+        structures_usages, structures = guardian.get_pushed_usages(structures)
+        usage_queries = guardian.get_structures_usage_queries(structures)
+        with guardian.metrics.timer("phase_duration_seconds", {"phase": "usage_query"}):
+            results = await asyncio.gather(*[
+                # Remote database operation
+                self.opentsdb.get_structures_timeseries(tag, names, guardian.window_difference, guardian.window_delay,
+                                                        metrics_to_retrieve, metrics_to_generate,
+                                                        chunk_size=guardian.usage_query_chunk_size, only_found=True)
+                for tag, names, metrics_to_retrieve, metrics_to_generate in usage_queries], return_exceptions=True)
+
+        for (_, names, _, _), result in zip(usage_queries, results):
+            if isinstance(result, Exception):
+                log_error("Error retrieving the usages of {0} structures, they will be retrieved one by one: {1}".format(
+                    len(names), str(result)), guardian.debug)
+            else:
+                structures_usages.update(result)
+        return structures_usages
+
+    async def get_structures_limits(self, structures):
+        names = [structure["name"] for structure in structures if "guard" in structure and structure["guard"]]
+        structures_limits = dict()
+        state_handler = self.guardian.get_state_handler()
+        try:
+            with self.guardian.metrics.timer("phase_duration_seconds", {"phase": "limits_fetch"}):
+                if state_handler is not self.guardian.couchdb_handler:
+                    # Local operation, the databases are mirrored
+                    limits_documents = state_handler.get_limits_by_names(names)
+                else:
+                    # Remote database operation
+                    limits_documents = await self.couchdb.get_limits_by_names(names)
+            for limits in limits_documents:
+                # There should only be one 'limits' document per structure, keep the first one as get_limits does
+                structures_limits.setdefault(limits["name"], limits)
+        except Exception as e:
+            log_error("Error retrieving the limits of {0} structures, they will be retrieved one by one: {1}".format(
+                len(names), str(e)), self.guardian.debug)
+        return structures_limits
+
+    async def update_structure_events(self, structure, triggered_events):
+        guardian = self.guardian
+        if guardian.event_store:
+            # Local operations, events are kept in memory
+            return guardian.update_structure_events(structure, triggered_events)
+
+        # Remote database operation
+        if triggered_events:
+            await self.couchdb.add_events(triggered_events)
+
+        # Remote database operation
+        all_events = await self.couchdb.get_events(structure)
+
+        # Filter the events according to timestamp
+        filtered_events, old_events = guardian.sort_events(all_events, guardian.event_timeout)
+
+        if old_events:
+            # Remote database operation
+            await self.couchdb.delete_events(old_events)
+
+        # Merge all the event counts
+        return guardian.reduce_structure_events(filtered_events) if filtered_events else dict()
+
+    async def remove_structure_events(self, structure, events_to_remove):
+        if self.guardian.event_store:
+            # Local operations, events are kept in memory
+            self.guardian.remove_structure_events(structure, events_to_remove)
+            return
+        for event in events_to_remove:
+            # Remote database operation
+            await self.couchdb.delete_num_events_by_structure(structure, event, events_to_remove[event])
+
+    async def retrieve_energy_model_estimation(self, structure, usages):
+        """Retrieve beforehand the energy model estimation that the Guardian would retrieve while matching the
+        events and rules of a structure, so that the event loop is not blocked by the synchronous remote operation.
+        The estimation is only needed the first time a power budget is used."""
+        guardian = self.guardian
+        if not guardian.use_energy_model or "energy" not in structure["resources"]:
+            return
+        power_budget = structure["resources"]["energy"]["max"]
+        if guardian.last_power_budget and guardian.last_power_budget == power_budget:
+            return
+
+        # TODO: Check uses cases of each structure subtype and manage them
+        subtype = "host"
+        if guardian.local_energy_model and guardian.energy_models.is_fresh(subtype, guardian.energy_model_name):
+            # Local operation, the model is evaluated without WattWizard
+            return
+        # Remote operation
+        guardian.energy_model_estimations[structure["name"]] = await self.wattwizard.get_usage_meeting_budget(
+            subtype, guardian.energy_model_name, usages[translator_dict["user"]], usages[translator_dict["kernel"]],
+            power_budget)
+
+    async def serverless(self, structure, rules, usages, limits, semaphore):
+        with self.guardian.metrics.timer("structure_processing_seconds"):
+            await self.guard_structure(structure, rules, usages, limits, semaphore)
+
+    async def guard_structure(self, structure, rules, usages, limits, semaphore):
+        guardian = self.guardian
+        if not guardian.check_structure_is_guardable(structure):
+            return
+
+        async with semaphore:
+            try:
+                # If the usages have not been retrieved in bulk, retrieve them now
+                if usages is None:
+                    structure_subtype = structure["subtype"]
+                    metrics_to_retrieve, metrics_to_generate = guardian.get_metrics_to_retrieve_and_generate(
+                        guardian.get_structure_guarded_resources(structure), structure_subtype)
+                    tag = TAGS[structure_subtype]
+
+                    # Remote database operation
+                    usages = await self.opentsdb.get_structure_timeseries({tag: structure["name"]},
+                                                                          guardian.window_difference,
+                                                                          guardian.window_delay,
+                                                                          metrics_to_retrieve, metrics_to_generate)
+
+                if not guardian.check_structure_usages(structure, usages):
+                    return
+                guardian.convert_structure_usages(usages)
+
+                # If the limits have not been retrieved in bulk, retrieve them now
+                if limits is None:
+                    # Remote database operation
+                    limits = await self.couchdb.get_limits(structure)
+
+                limits_resources = guardian.prepare_structure_limits(structure, limits)
+                if not limits_resources:
+                    return
+
+                await self.process_serverless_structure(structure, usages, limits_resources, rules)
+
+            except Exception as e:
+                log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), guardian.debug)
+
+    async def process_serverless_structure(self, structure, usages, limits, rules, triggered_events=None):
+        guardian = self.guardian
+
+        # Match usages and rules to generate events, unless it has already been done for all the structures at once
+        if triggered_events is None:
+            with guardian.metrics.timer("structure_phase_duration_seconds", {"phase": "rule_matching"}):
+                triggered_events = guardian.match_usages_and_limits(structure["name"], rules, usages, limits,
+                                                                    structure["resources"])
+
+        # Persist the new events and merge them with the previous ones
+        with guardian.metrics.timer("structure_phase_duration_seconds", {"phase": "event_io"}):
+            reduced_events = await self.update_structure_events(structure, triggered_events)
+
+        # Match events and rules to generate requests
+        if reduced_events:
+            await self.retrieve_energy_model_estimation(structure, usages)
+        with guardian.metrics.timer("structure_phase_duration_seconds", {"phase": "rule_matching"}):
+            triggered_requests, events_to_remove = guardian.match_structure_requests(
+                structure, rules, reduced_events, limits, usages)
+        guardian.energy_model_estimations.pop(structure["name"], None)
+
+        # Remove events that generated the request
+        with guardian.metrics.timer("structure_phase_duration_seconds", {"phase": "event_io"}):
+            await self.remove_structure_events(structure, events_to_remove)
+
+        guardian.metrics.inc("events_total", len(triggered_events))
+        guardian.metrics.inc("requests_total", len(triggered_requests))
+
+        if triggered_requests:
+            # Deferred until the end of the epoch
+            guardian.add_requests(triggered_requests)
+
+        # DEBUG AND INFO OUTPUT
+        if guardian.debug:
+            guardian.print_structure_info(structure, usages, limits, triggered_events, triggered_requests)
+
+    async def process_prepared_structure(self, structure, usages, limits, rules, triggered_events, semaphore):
+        with self.guardian.metrics.timer("structure_processing_seconds"):
+            async with semaphore:
+                try:
+                    await self.process_serverless_structure(structure, usages, limits, rules, triggered_events)
+                except Exception as e:
+                    log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), self.guardian.debug)
+
+    async def flush_epoch_writes(self):
+        limits, requests = self.guardian.stop_epoch_writes()
+        try:
+            # Remote database operations
+            writes = list()
+            if limits:
+                writes.append(self.couchdb.update_limits(limits))
+            if requests:
+                writes.append(self.couchdb.add_requests(requests))
+            with self.guardian.metrics.timer("phase_duration_seconds", {"phase": "request_writes"}):
+                results = await asyncio.gather(*writes)
+            if limits and not results[0]:
+                # The limits that couldn't be updated have already been reported
+                log_error("Some of the {0} updated limits couldn't be persisted".format(len(limits)), self.guardian.debug)
+            log_info("Persisted {0} updated limits and {1} requests".format(len(limits), len(requests)),
+                     self.guardian.debug)
+        except Exception as e:
+            log_error("Error persisting the limits and requests of the epoch: {0}".format(str(e)), self.guardian.debug)
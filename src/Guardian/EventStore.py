@@ -0,0 +1,165 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from collections import deque
+from threading import Lock
+
+from src.MyUtils.DataModel import Event
+
+
+class EventBuffer:
+    """
+    Buffer of the events with the same name (e.g., CpuBottleneck) for a single structure, ordered by timestamp. The
+    'up' and 'down' counts of the buffered events are kept added up so that they don't have to be reduced every time.
+    Events are buffered as compact slotted documents (see DataModel).
+    """
+    __slots__ = ("resource", "max_events", "events", "scale")
+
+    def __init__(self, resource, max_events):
+        self.resource = resource
+        self.max_events = max_events
+        self.events = deque()
+        self.scale = {"down": 0, "up": 0}
+
+    def __add_scale(self, event, sign):
+        for key, value in event.action["events"]["scale"].items():
+            self.scale[key] = self.scale.get(key, 0) + sign * value
+
+    def append(self, event):
+        if len(self.events) >= self.max_events:
+            self.popleft()
+        self.events.append(event)
+        self.__add_scale(event, 1)
+
+    def popleft(self):
+        event = self.events.popleft()
+        self.__add_scale(event, -1)
+        return event
+
+    def expire(self, oldest_timestamp):
+        expired = list()
+        while self.events and self.events[0].timestamp < oldest_timestamp:
+            expired.append(self.popleft())
+        return expired
+
+
+class EventStore:
+    """
+    In-memory store of the events generated by the Guardian, used instead of the 'events' database to avoid several
+    remote operations per structure on every epoch. It follows the same semantics as sorting the events by timestamp
+    (see Guardian.sort_events) and reducing the valid ones (see Guardian.reduce_structure_events), but the event
+    counts are kept updated as events are added or removed.
+    """
+
+    def __init__(self, max_events=1000):
+        self.max_events = max_events
+        self.__buffers = dict()  # structure name -> event name -> EventBuffer
+        self.__lock = Lock()
+
+    def add_events(self, events):
+        with self.__lock:
+            for event in events:
+                structure_buffers = self.__buffers.setdefault(event["structure"], dict())
+                if event["name"] not in structure_buffers:
+                    structure_buffers[event["name"]] = EventBuffer(event["resource"], self.max_events)
+                structure_buffers[event["name"]].append(Event.from_dict(event))
+
+    def get_events(self, structure):
+        with self.__lock:
+            events = list()
+            for event_buffer in self.__buffers.get(structure["name"], dict()).values():
+                events += [event.to_dict() for event in event_buffer.events]
+            return events
+
+    def get_all_events(self):
+        with self.__lock:
+            events = list()
+            for structure_buffers in self.__buffers.values():
+                for event_buffer in structure_buffers.values():
+                    events += [event.to_dict() for event in event_buffer.events]
+            return events
+
+    def get_reduced_events(self, structure_name, event_timeout):
+        """Remove the events of a structure older than the timeout and get the remaining ones reduced by resource
+
+        Args:
+            structure_name (string): The name of the structure
+            event_timeout (integer): A timeout in seconds
+
+        Returns:
+            (dict) The added up 'up' and 'down' counts of the valid events by resource, same as the output of
+            Guardian.reduce_structure_events
+        """
+        oldest_timestamp = time.time() - event_timeout
+        reduced_events = dict()
+        with self.__lock:
+            structure_buffers = self.__buffers.get(structure_name, dict())
+            for event_name in list(structure_buffers.keys()):
+                event_buffer = structure_buffers[event_name]
+                event_buffer.expire(oldest_timestamp)
+                if not event_buffer.events:
+                    del structure_buffers[event_name]
+                    continue
+                if event_buffer.resource not in reduced_events:
+                    reduced_events[event_buffer.resource] = {"events": {"scale": {"down": 0, "up": 0}}}
+                resource_scale = reduced_events[event_buffer.resource]["events"]["scale"]
+                for key, value in event_buffer.scale.items():
+                    resource_scale[key] = resource_scale.get(key, 0) + value
+            if not structure_buffers:
+                self.__buffers.pop(structure_name, None)
+        return reduced_events
+
+    def delete_num_events_by_structure(self, structure, event_name, event_num):
+        # Remove the oldest events first
+        with self.__lock:
+            event_buffer = self.__buffers.get(structure["name"], dict()).get(event_name)
+            if event_buffer:
+                for _ in range(min(event_num, len(event_buffer.events))):
+                    event_buffer.popleft()
+
+    def get_structure_names(self):
+        with self.__lock:
+            return list(self.__buffers.keys())
+
+    def delete_structures_events(self, structure_names):
+        with self.__lock:
+            for structure_name in structure_names:
+                self.__buffers.pop(structure_name, None)
+
+    def load_events(self, events):
+        """Load events previously persisted in the database (e.g., after a restart) into the store"""
+        loaded_events = list()
+        for event in sorted(events, key=lambda e: e["timestamp"]):
+            event = dict(event)
+            event.pop("_id", None)
+            event.pop("_rev", None)
+            loaded_events.append(event)
+        self.add_events(loaded_events)
+
+    def clear(self):
+        with self.__lock:
+            self.__buffers.clear()
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from threading import Lock
+
+
+class HoltEstimator:
+    """
+    Holt linear trend estimator (double exponential smoothing) of a single usage time series, updated incrementally
+    with one sample per epoch. The first samples are kept to initialize the level and the trend, after that only
+    these two values are stored.
+    """
+    __slots__ = ("warmup_samples", "samples", "level", "trend", "last_update")
+
+    def __init__(self, warmup_samples):
+        self.warmup_samples = warmup_samples
+        self.samples = list()
+        self.level = None
+        self.trend = None
+        self.last_update = None
+
+    def is_ready(self):
+        return self.level is not None
+
+    def update(self, value, alpha, beta):
+        self.last_update = time.time()
+        if not self.is_ready():
+            self.samples.append(value)
+            if len(self.samples) >= self.warmup_samples:
+                # Initialize the level with the last sample and the trend with the average difference between samples
+                differences = [b - a for a, b in zip(self.samples, self.samples[1:])]
+                self.level = self.samples[-1]
+                self.trend = sum(differences) / len(differences) if differences else 0
+                self.samples = list()
+            return
+
+        previous_level = self.level
+        self.level = alpha * value + (1 - alpha) * (self.level + self.trend)
+        self.trend = beta * (self.level - previous_level) + (1 - beta) * self.trend
+
+    def forecast(self, horizon):
+        if not self.is_ready():
+            return None
+        return self.level + horizon * self.trend
+
+
+class UsageForecaster:
+    """
+    In-memory forecaster of the usages of the structures guarded, keeping a Holt estimator for every structure and
+    usage metric (e.g., structure.cpu.usage). It is used by the 'forecast' rescale policy to size the rescalings to
+    the usage expected in the next epochs instead of the current one.
+    """
+
+    def __init__(self, warmup_samples=3):
+        self.warmup_samples = warmup_samples
+        self.__estimators = dict()  # structure name -> metric -> HoltEstimator
+        self.__lock = Lock()
+
+    def update(self, structure_name, usages, alpha, beta, no_data_value=None):
+        """Add the usages of a structure in the current epoch to its estimators
+
+        Args:
+            structure_name (string): The name of the structure
+            usages (dict): The usage values of the structure by metric
+            alpha (float): Smoothing factor of the level, between 0 and 1
+            beta (float): Smoothing factor of the trend, between 0 and 1
+            no_data_value (integer): The value used for metrics without data, which are not added
+        """
+        with self.__lock:
+            structure_estimators = self.__estimators.setdefault(structure_name, dict())
+            for metric, value in usages.items():
+                if value == no_data_value:
+                    continue
+                if metric not in structure_estimators:
+                    structure_estimators[metric] = HoltEstimator(self.warmup_samples)
+                structure_estimators[metric].update(value, alpha, beta)
+
+    def forecast(self, structure_name, metric, horizon):
+        """Get the usage forecast for a structure metric
+
+        Args:
+            structure_name (string): The name of the structure
+            metric (string): The usage metric (e.g., structure.cpu.usage)
+            horizon (integer): The number of epochs ahead to forecast
+
+        Returns:
+            (float) The forecast usage, or None if there are not enough samples yet
+        """
+        with self.__lock:
+            estimator = self.__estimators.get(structure_name, dict()).get(metric)
+            if estimator is None:
+                return None
+            return estimator.forecast(horizon)
+
+    def expire(self, timeout):
+        """Remove the estimators that have not been updated within the timeout (e.g., of structures no longer
+        guarded), as their state is stale.
+
+        Args:
+            timeout (integer): A timeout in seconds
+        """
+        oldest_timestamp = time.time() - timeout
+        with self.__lock:
+            for structure_name in list(self.__estimators.keys()):
+                structure_estimators = self.__estimators[structure_name]
+                for metric in list(structure_estimators.keys()):
+                    if structure_estimators[metric].last_update < oldest_timestamp:
+                        del structure_estimators[metric]
+                if not structure_estimators:
+                    del self.__estimators[structure_name]
+
+    def clear(self):
+        with self.__lock:
+            self.__estimators.clear()
@@ -26,46 +26,75 @@
 
 from __future__ import print_function
 
-from threading import Thread
+from threading import Thread, Lock
+import copy
 import time
 import traceback
 import logging
+import os
+import socket
+import requests
 
-from json_logic import jsonLogic
 from termcolor import colored
 
 from src.MyUtils.MyUtils import MyConfig, log_error, get_service, beat, log_info, log_warning, \
     get_structures, generate_event_name, generate_request_name, wait_operation_thread, structure_is_container, generate_structure_usage_metric, start_epoch, end_epoch
+from src.MyUtils.RuleCompiler import evaluate_rule
+from src.MyUtils.WorkerPool import WorkerPool
+from src.Guardian.EventStore import EventStore
+from src.Guardian.Forecaster import UsageForecaster
+from src.Guardian.PIDController import PIDControllers, DEFAULT_GAINS
+from src.Guardian.ProcessGuardian import ProcessGuardianEngine
+from src.MyUtils.Metrics import MetricsRegistry, MetricsServer
+from src.Guardian.RuleVectorizer import vectorize_rule
+from src.Guardian.Sharding import HashRing, get_alive_members, beat_member
+from src.Guardian.Scheduler import StructureScheduler
+from src.Guardian.UsageIngestion import UsageWindows, UsageIngestionServer
 import src.StateDatabase.couchdb as couchdb
+from src.StateDatabase.couchdb_mirror import CouchDBMirror
 import src.StateDatabase.opentsdb as bdwatchdog
 import src.WattWizard.WattWizardUtils as wattwizard
+from src.WattWizard.LocalEnergyModel import LocalEnergyModels
 
-BDWATCHDOG_CONTAINER_METRICS = {"cpu": ['proc.cpu.user', 'proc.cpu.kernel'], "mem": ['proc.mem.resident', 'proc.mem.virtual'], "energy": ["structure.energy.usage"]}
-BDWATCHDOG_APPLICATION_METRICS = {"cpu": ['structure.cpu.usage'], "mem": ['structure.mem.usage'], "energy": ['structure.energy.usage']}
+# The disk and network bandwidth limits apply to each direction on its own, so only the usage of the direction that is
+# limited is guarded: the disk writes (the reads are given the same limit) and the incoming network traffic, shaped by
+# the tc qdisc of the host side interface of the container
+BDWATCHDOG_CONTAINER_METRICS = {"cpu": ['proc.cpu.user', 'proc.cpu.kernel'], "mem": ['proc.mem.resident', 'proc.mem.virtual'], "energy": ["structure.energy.usage"],
+                                "disk": ['proc.disk.writes.mb'], "net": ['proc.net.tcp.in.mb']}
+BDWATCHDOG_APPLICATION_METRICS = {"cpu": ['structure.cpu.usage'], "mem": ['structure.mem.usage'], "energy": ['structure.energy.usage'],
+                                  "disk": ['structure.disk.usage'], "net": ['structure.net.usage']}
 
 GUARDIAN_CONTAINER_METRICS = {
     'structure.cpu.usage': ['proc.cpu.user', 'proc.cpu.kernel'],
     'structure.cpu.user': ['proc.cpu.user'],
     'structure.cpu.kernel': ['proc.cpu.kernel'],
     'structure.mem.usage': ['proc.mem.resident'],
-    'structure.energy.usage': ["structure.energy.usage"]
+    'structure.energy.usage': ["structure.energy.usage"],
+    'structure.disk.usage': ['proc.disk.writes.mb'],
+    'structure.net.usage': ['proc.net.tcp.in.mb']
 }
 GUARDIAN_APPLICATION_METRICS = {
     'structure.cpu.usage': ['structure.cpu.usage'],
     'structure.cpu.user': ['structure.cpu.user'],
     'structure.cpu.kernel': ['structure.cpu.kernel'],
     'structure.mem.usage': ['structure.mem.usage'],
-    'structure.energy.usage': ['structure.energy.usage']
+    'structure.energy.usage': ['structure.energy.usage'],
+    'structure.disk.usage': ['structure.disk.usage'],
+    'structure.net.usage': ['structure.net.usage']
 }
 BDWATCHDOG_TO_GUARDIAN_CONTAINER = {
     "cpu": ['structure.cpu.usage', 'structure.cpu.user', 'structure.cpu.kernel'],
     "mem": ['structure.mem.usage'],
-    "energy": ["structure.energy.usage"]
+    "energy": ["structure.energy.usage"],
+    "disk": ['structure.disk.usage'],
+    "net": ['structure.net.usage']
 }
 BDWATCHDOG_TO_GUARDIAN_APPLICATION = {
     "cpu": ['structure.cpu.usage', 'structure.cpu.user', 'structure.cpu.kernel'],
     "mem": ['structure.mem.usage'],
-    "energy": ['structure.energy.usage']
+    "energy": ['structure.energy.usage'],
+    "disk": ['structure.disk.usage'],
+    "net": ['structure.net.usage']
 }
 GUARDIAN_METRICS = {"container": GUARDIAN_CONTAINER_METRICS, "application": GUARDIAN_APPLICATION_METRICS}
 BDWATCHDOG_METRICS = {"container": BDWATCHDOG_CONTAINER_METRICS, "application": BDWATCHDOG_APPLICATION_METRICS}
@@ -78,12 +107,26 @@ translator_dict = {
     "user": "structure.cpu.user",
     "kernel": "structure.cpu.kernel",
     "mem": "structure.mem.usage",
-    "energy": "structure.energy.usage"}
+    "energy": "structure.energy.usage",
+    "disk": "structure.disk.usage",
+    "net": "structure.net.usage"}
+
+# BDWatchdog reports the network usage in MB/s (proc.net.tcp.in.mb), while the NodeRescaler applies the network
+# limits in Mbit/s (tc rate), so the usages are converted to the unit of the limits before being compared with them
+USAGE_UNIT_FACTORS = {"structure.net.usage": 8}
 
 CONFIG_DEFAULT_VALUES = {"WINDOW_TIMELAPSE": 10, "WINDOW_DELAY": 10, "EVENT_TIMEOUT": 40, "DEBUG": True,
                          "STRUCTURE_GUARDED": "container", "GUARDABLE_RESOURCES": ["cpu"],
                          "CPU_SHARES_PER_WATT": 5, "USE_ENERGY_MODEL": False,
-                         "ENERGY_MODEL_NAME": "sgdregressor_General", "ACTIVE": True}
+                         "ENERGY_MODEL_NAME": "sgdregressor_General", "USAGE_QUERY_CHUNK_SIZE": 100, "MAX_WORKERS": 32,
+                         "STRUCTURE_DEADLINE": 10, "USE_EVENT_STORE": False, "EVENT_SNAPSHOT_PERIOD": 60,
+                         "ENGINE": "threads", "ASYNC_CONCURRENCY": 100, "METRICS_PORT": 0, "PUSH_METRICS": False,
+                         "VECTORIZED_RULES": False, "FORECAST_ALPHA": 0.5, "FORECAST_BETA": 0.3, "FORECAST_HORIZON": 3,
+                         "USE_CHANGES_FEED": False, "SHARDING": False, "SHARD_TIMEOUT": 30,
+                         "ADAPTIVE_SCHEDULING": False, "MAX_GUARD_INTERVAL": 6,
+                         "INGESTION_HTTP_PORT": 0, "INGESTION_UDP_PORT": 0,
+                         "LOCAL_ENERGY_MODEL": True, "ENERGY_MODEL_REFRESH_PERIOD": 60, "PROCESS_WORKERS": 0,
+                         "ACTIVE": True}
 SERVICE_NAME = "guardian"
 
 NOT_AVAILABLE_STRING = "n/a"
@@ -105,6 +148,34 @@ class Guardian:
         self.couchdb_handler = couchdb.CouchDBServer()
         self.wattwizard_handler = wattwizard.WattWizardUtils()
         self.last_power_budget = None
+        self.energy_model_estimations = dict()
+        self.energy_models = LocalEnergyModels(self.wattwizard_handler)
+        self.worker_pool = None
+        self.async_engine = None
+        self.process_engine = None
+        self.event_store = None
+        self.last_events_snapshot = 0
+        self.couchdb_mirror = None
+        self.instance_name = "{0}@{1}".format(SERVICE_NAME, os.environ.get("GUARDIAN_INSTANCE", socket.gethostname()))
+        self.sharding = False
+        self.hash_ring = None
+        self.pending_limits = None
+        self.pending_requests = None
+        self.pending_writes_lock = Lock()
+        self.metrics = MetricsRegistry("guardian")
+        self.metrics.describe("phase_duration_seconds", "Duration of each phase of an epoch")
+        self.metrics.describe("structure_phase_duration_seconds", "Duration of each phase of the guarding of a structure")
+        self.metrics.describe("structure_processing_seconds", "Time spent guarding each structure")
+        self.metrics.describe("epoch_processing_seconds", "Time spent processing each epoch, without sleeping")
+        self.metrics.describe("events_total", "Events triggered")
+        self.metrics.describe("requests_total", "Requests triggered")
+        self.metrics.describe("epochs_overrun_total", "Epochs whose processing took longer than the time window")
+        self.metrics_server = None
+        self.forecaster = UsageForecaster()
+        self.pid_controllers = PIDControllers()
+        self.scheduler = StructureScheduler()
+        self.usage_windows = UsageWindows(tags=tuple(TAGS.values()))
+        self.ingestion_server = None
         self.NO_METRIC_DATA_DEFAULT_VALUE = self.opentsdb_handler.NO_METRIC_DATA_DEFAULT_VALUE
 
     @staticmethod
@@ -302,6 +373,92 @@ class Guardian:
 
         return -1 * (current_resource_limit - desired_applied_resource_limit)
 
+    def get_amount_from_forecast(self, structure, rule, limits, usages):
+        """Get an amount to rescale the current resource limit using a policy of *fit to the forecast usage*.
+        The usage expected within the configured horizon is forecast from the previous usages of the structure and the
+        new limit is set as in the fit to usage policy, but using the highest between the current and forecast usages
+        so that a resource is never reduced below what is being used. If the usage can't be forecast yet, the current
+        usage is used instead. Scale-ups are never smaller than the rule amount and scale-downs never increase the limit.
+
+        Args:
+            structure (dict): The dictionary containing all of the structure resource information
+            rule (dict): The rule that has been activated
+            limits (dict): The structure limits by resource
+            usages (dict): The structure usages by metric
+
+        Returns:
+            (int) The amount to be rescaled using the forecast policy.
+        """
+        resource_label = rule["resource"]
+        metric = translator_dict[resource_label]
+        usage = usages[metric]
+        forecast_usage = self.forecaster.forecast(structure["name"], metric, self.forecast_horizon)
+        if forecast_usage is not None:
+            usage = max(usage, forecast_usage)
+
+        current_resource_limit = structure["resources"][resource_label]["current"]
+        boundary = limits[resource_label]["boundary"]
+        amount = self.get_amount_from_fit_reduction(current_resource_limit, boundary, usage)
+        if rule["rescale_type"] == "up":
+            amount = max(amount, rule["amount"])
+        else:
+            # A rising forecast must not turn a scale-down into a scale-up
+            amount = min(amount, 0)
+
+        log_info("FORECAST -> cur : {0} | usa : {1} | for : {2} | amount {3}".format(
+            current_resource_limit, usages[metric], forecast_usage, amount), self.debug)
+        return amount
+
+    def get_amount_from_pid(self, structure, rule, limits, usages):
+        """Get an amount to rescale the current resource limit using a *PID controller* policy. The controller of the
+        structure resource aims at placing the usage at the midpoint between the lower and upper limits. Its state is
+        kept across epochs so that repeated rescalings in the same direction grow (integral term) and those that
+        overshoot are damped, instead of going up and down on consecutive activations. The gains can be set in the
+        rule ('kp', 'ki' and 'kd'), otherwise the default ones are used. The amount never goes against the rule
+        rescale type.
+
+        Args:
+            structure (dict): The dictionary containing all of the structure resource information
+            rule (dict): The rule that has been activated
+            limits (dict): The structure limits by resource
+            usages (dict): The structure usages by metric
+
+        Returns:
+            (int) The amount to be rescaled using the PID policy.
+        """
+        resource_label = rule["resource"]
+        usage = usages[translator_dict[resource_label]]
+        setpoint = (limits[resource_label]["upper"] + limits[resource_label]["lower"]) / 2
+        gains = {gain: rule.get(gain, DEFAULT_GAINS[gain]) for gain in DEFAULT_GAINS}
+        output = self.pid_controllers.step(structure["name"], resource_label, usage - setpoint, gains)
+        amount = max(output, 0) if rule["rescale_type"] == "up" else min(output, 0)
+
+        log_info("PID -> usa : {0} | set : {1} | out : {2} | amount {3}".format(usage, setpoint, output, amount), self.debug)
+        return amount
+
+    def get_usage_meeting_budget(self, structure, user_usage, kernel_usage, power_budget):
+        # Estimations may have been retrieved beforehand (e.g., asynchronously), use them if available
+        estimation = self.energy_model_estimations.pop(structure["name"], None)
+        if estimation is not None:
+            return estimation
+
+        # TODO: Check uses cases of each structure subtype and manage them
+        subtype = "host"  # structure["subtype"] if structure["subtype"] != "application" else "host"
+
+        # Evaluate the model locally if possible, its attributes are only retrieved when they may have changed
+        if self.local_energy_model:
+            try:
+                model = self.energy_models.get_model(subtype, self.energy_model_name)
+            except Exception as e:
+                log_warning("Couldn't get a local copy of the energy model '{0}', using WattWizard instead: {1}".format(
+                    self.energy_model_name, str(e)), self.debug)
+            else:
+                return model.get_usage_meeting_budget(user_usage, kernel_usage, power_budget)
+
+        # Remote operation
+        return self.wattwizard_handler.get_usage_meeting_budget(subtype, self.energy_model_name, user_usage,
+                                                                kernel_usage, power_budget)
+
     def get_amount_from_energy_modelling(self, structure, usages, resource):
         """Get an amount that will be reduced from the current resource limit using an energy model that relates
         resource usage with energy usage.
@@ -326,12 +483,9 @@ class Guardian:
         if not self.last_power_budget or self.last_power_budget != power_budget:
             self.last_power_budget = power_budget
 
-            # TODO: Check uses cases of each structure subtype and manage them
-            subtype = "host"  # structure["subtype"] if structure["subtype"] != "application" else "host"
             user_usage = usages[translator_dict["user"]]
             kernel_usage = usages[translator_dict["kernel"]]
-            result = self.wattwizard_handler.get_usage_meeting_budget(subtype, self.energy_model_name, user_usage,
-                                                                      kernel_usage, power_budget)
+            result = self.get_usage_meeting_budget(structure, user_usage, kernel_usage, power_budget)
             log_warning("First time rescaling with this power budget. "
                         "Setting power model estimated CPU ({0}W = {1}% CPU)."
                         .format(power_budget, result["value"]), self.debug)
@@ -449,17 +603,16 @@ class Guardian:
                     str(values["current"]), str(values["boundary"]), str(values["upper"])))
 
     @staticmethod
-    def rule_triggers_event(rule, data, resources):
+    def rule_triggers_event(rule, data, resources, rule_result=None):
         if rule["resource"] not in resources:
             return False
         else:
             return rule["active"] and \
                    resources[rule["resource"]]["guard"] and \
                    rule["generates"] == "events" and \
-                   jsonLogic(rule["rule"], data)
-
-    def match_usages_and_limits(self, structure_name, rules, usages, limits, resources):
+                   (evaluate_rule(rule, data) if rule_result is None else rule_result)
 
+    def get_rules_data(self, rules, usages, limits, resources):
         resources_with_rules = list()
         for rule in rules:
             if rule["resource"] in resources_with_rules:
@@ -471,7 +624,7 @@ class Guardian:
         for resource in self.guardable_resources:
             if resource not in resources_with_rules:
                 log_warning("Resource {0} has no rules applied to it".format(resource), self.debug)
-            elif usages[translator_dict[resource]] != self.NO_METRIC_DATA_DEFAULT_VALUE:
+            elif usages.get(translator_dict[resource], self.NO_METRIC_DATA_DEFAULT_VALUE) != self.NO_METRIC_DATA_DEFAULT_VALUE:
                 useful_resources.append(resource)
 
         data = dict()
@@ -488,14 +641,21 @@ class Guardian:
             if usage_resource in useful_resources:
                 data[usage_resource][struct_type][usage_resource][keys[2]] = usages[usage_metric]
 
+        return data
+
+    def generate_rule_event(self, rule, structure_name):
+        event_name = generate_event_name(rule["action"]["events"], rule["resource"])
+        return self.generate_event(event_name, structure_name, rule["resource"], rule["action"])
+
+    def match_usages_and_limits(self, structure_name, rules, usages, limits, resources):
+        data = self.get_rules_data(rules, usages, limits, resources)
+
         events = []
         for rule in rules:
             try:
                 # Check that the rule is active, the resource to watch is guarded and that the rule is activated
                 if self.rule_triggers_event(rule, data, resources):
-                    event_name = generate_event_name(rule["action"]["events"], rule["resource"])
-                    event = self.generate_event(event_name, structure_name, rule["resource"], rule["action"])
-                    events.append(event)
+                    events.append(self.generate_rule_event(rule, structure_name))
 
             except KeyError as e:
                 log_warning("rule: {0} is missing a parameter {1} {2}".format(
@@ -503,6 +663,47 @@ class Guardian:
 
         return events
 
+    def match_structures_usages_and_limits(self, prepared_structures, rules):
+        """Match the usages and limits of several structures with the rules to generate events, as
+        match_usages_and_limits does for a single structure. Rules that only compare numeric values (e.g., usage
+        against the upper limit) are evaluated for all the structures at once with array operations, while the rest
+        of rules, and the structures whose values can't be compared as arrays, are evaluated one by one.
+
+        Args:
+            prepared_structures (list): Tuples with the structure, usages, limits and rules data of each structure
+            rules (list): The rules
+
+        Returns:
+            (list) The events triggered for each structure, in the same order as the structures, or None for the
+            structures whose rules couldn't be evaluated
+        """
+        structures_data = [data for _, _, _, data in prepared_structures]
+        structures_events = [list() for _ in prepared_structures]
+        for rule in rules:
+            vectorized_rule = vectorize_rule(rule) if rule.get("generates") == "events" else None
+            if vectorized_rule:
+                results, evaluable = vectorized_rule.evaluate(structures_data)
+
+            for i, (structure, _, _, data) in enumerate(prepared_structures):
+                if structures_events[i] is None:
+                    continue
+                resources = structure["resources"]
+                try:
+                    # Use the vectorized result if it was possible to evaluate the rule for this structure
+                    rule_result = bool(results[i]) if vectorized_rule and evaluable[i] else None
+                    if self.rule_triggers_event(rule, data, resources, rule_result):
+                        structures_events[i].append(self.generate_rule_event(rule, structure["name"]))
+
+                except KeyError as e:
+                    log_warning("rule: {0} is missing a parameter {1} {2}".format(
+                        rule["name"], str(e), str(traceback.format_exc())), self.debug)
+                except Exception as e:
+                    # The structure is skipped, as serverless does when its rules can't be evaluated
+                    log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), self.debug)
+                    structures_events[i] = None
+
+        return structures_events
+
     @staticmethod
     def generate_event(event_name, structure_name, resource, action):
         event = dict(
@@ -579,7 +780,7 @@ class Guardian:
             rule_activated = rule["active"] and \
                              rule["generates"] == "requests" and \
                              resource_label in events and \
-                             jsonLogic(rule["rule"], events[resource_label])
+                             evaluate_rule(rule, events[resource_label])
 
             if not rule_activated:
                 continue
@@ -611,6 +812,10 @@ class Guardian:
                     amount = int(ratio * amount)
                     log_warning("PROP -> cur : {0} | upp : {1} | usa: {2} | ratio {3} | amount {4}".format(
                         current_resource_limit, upper_limit, usage, ratio, amount), self.debug)
+                elif rule["rescale_policy"] == "forecast" and resource_label not in NON_ADJUSTABLE_RESOURCES:
+                    amount = self.get_amount_from_forecast(structure, rule, limits, usages)
+                elif rule["rescale_policy"] == "pid" and resource_label not in NON_ADJUSTABLE_RESOURCES:
+                    amount = self.get_amount_from_pid(structure, rule, limits, usages)
                 else:
                     log_warning("Invalid rescale policy '{0} for Rule {1}, skipping it".format(rule["rescale_policy"], rule["name"]), self.debug)
                     continue
@@ -622,6 +827,10 @@ class Guardian:
                     boundary = limits[resource_label]["boundary"]
                     usage = usages[translator_dict[resource_label]]
                     amount = self.get_amount_from_fit_reduction(current_resource_limit, boundary, usage)
+                elif rule["rescale_policy"] == "forecast" and resource_label not in NON_ADJUSTABLE_RESOURCES:
+                    amount = self.get_amount_from_forecast(structure, rule, limits, usages)
+                elif rule["rescale_policy"] == "pid" and resource_label not in NON_ADJUSTABLE_RESOURCES:
+                    amount = self.get_amount_from_pid(structure, rule, limits, usages)
                 elif rule["rescale_policy"] == "proportional" and resource_label == "energy":
                     if self.use_energy_model:
                         amount = self.get_amount_from_energy_modelling(structure, usages, resource_label)
@@ -674,7 +883,7 @@ class Guardian:
 
         container_name_str = "@" + container["name"]
         resources_str = "| "
-        for resource in self.guardable_resources:
+        for resource in self.get_structure_guarded_resources(container):
             if container["resources"][resource]["guard"]:
                 resources_str += resource + "({0})".format(self.get_resource_summary(resource, resources, limits, usages)) + " | "
 
@@ -688,10 +897,22 @@ class Guardian:
             " ".join([container_name_str, resources_str, triggered_requests_and_events]),
             self.debug)
 
-    def process_serverless_structure(self, structure, usages, limits, rules):
+    def update_structure_events(self, structure, triggered_events):
+        """Persist the events triggered for a structure and get all of its current events merged, discarding the
+        ones that have timed out.
+
+        Args:
+            structure (dict): The dictionary containing all of the structure resource information
+            triggered_events (list): The events triggered for the structure in this epoch
 
-        # Match usages and rules to generate events
-        triggered_events = self.match_usages_and_limits(structure["name"], rules, usages, limits, structure["resources"])
+        Returns:
+            (dict) The current events of the structure with their 'scale' counts merged
+        """
+        if self.event_store:
+            # Local operations, events are kept in memory
+            if triggered_events:
+                self.event_store.add_events(triggered_events)
+            return self.event_store.get_reduced_events(structure["name"], self.event_timeout)
 
         # Remote database operation
         if triggered_events:
@@ -707,110 +928,724 @@ class Guardian:
             # Remote database operation
             self.couchdb_handler.delete_events(old_events)
 
+        # Merge all the event counts
+        return self.reduce_structure_events(filtered_events) if filtered_events else dict()
+
+    def remove_structure_events(self, structure, events_to_remove):
+        events_handler = self.event_store if self.event_store else self.couchdb_handler
+        for event in events_to_remove:
+            # Remote database operation, unless events are kept in memory
+            events_handler.delete_num_events_by_structure(structure, event, events_to_remove[event])
+
+    def match_structure_requests(self, structure, rules, reduced_events, limits, usages):
+        # Keep the usage forecasts updated every epoch, even if no requests are generated
+        self.forecaster.update(structure["name"], usages, self.forecast_alpha, self.forecast_beta,
+                               self.NO_METRIC_DATA_DEFAULT_VALUE)
+
+        if self.adaptive_scheduling:
+            self.schedule_structure(structure, usages, limits, reduced_events)
+
         # If there are no events, nothing else to do as no requests will be generated
-        if filtered_events:
-            # Merge all the event counts
-            reduced_events = self.reduce_structure_events(filtered_events)
+        if not reduced_events:
+            return list(), dict()
 
-            # Match events and rules to generate requests
-            triggered_requests, events_to_remove = self.match_rules_and_events(structure, rules, reduced_events, limits, usages)
+        # Match events and rules to generate requests
+        return self.match_rules_and_events(structure, rules, reduced_events, limits, usages)
 
-            # Remove events that generated the request
-            # Remote database operation
-            for event in events_to_remove:
-                self.couchdb_handler.delete_num_events_by_structure(structure, event, events_to_remove[event])
+    def process_serverless_structure(self, structure, usages, limits, rules, triggered_events=None):
 
-            if triggered_requests:
-                # Remote database operation
-                self.couchdb_handler.add_requests(triggered_requests)
+        # Match usages and rules to generate events, unless it has already been done for all the structures at once
+        if triggered_events is None:
+            with self.metrics.timer("structure_phase_duration_seconds", {"phase": "rule_matching"}):
+                triggered_events = self.match_usages_and_limits(structure["name"], rules, usages, limits, structure["resources"])
 
-        else:
-            triggered_requests = list()
+        # Persist the new events and merge them with the previous ones
+        with self.metrics.timer("structure_phase_duration_seconds", {"phase": "event_io"}):
+            reduced_events = self.update_structure_events(structure, triggered_events)
+
+        # Match events and rules to generate requests
+        with self.metrics.timer("structure_phase_duration_seconds", {"phase": "rule_matching"}):
+            triggered_requests, events_to_remove = self.match_structure_requests(structure, rules, reduced_events, limits, usages)
+
+        # Remove events that generated the request
+        with self.metrics.timer("structure_phase_duration_seconds", {"phase": "event_io"}):
+            self.remove_structure_events(structure, events_to_remove)
+
+        self.metrics.inc("events_total", len(triggered_events))
+        self.metrics.inc("requests_total", len(triggered_requests))
+
+        if triggered_requests:
+            # Remote database operation, possibly deferred until the end of the epoch
+            self.add_requests(triggered_requests)
 
         # DEBUG AND INFO OUTPUT
         if self.debug:
             self.print_structure_info(structure, usages, limits, triggered_events, triggered_requests)
 
-    def serverless(self, structure, rules):
-        structure_subtype = structure["subtype"]
+    def get_structure_guarded_resources(self, structure):
+        """Get the resources of a structure that are both guardable by this service and marked as guarded in the
+        structure.
 
-        # Check if structure is guarded
-        if "guard" not in structure or not structure["guard"]:
-            log_warning("structure: {0} is set to leave alone, skipping".format(structure["name"]), self.debug)
-            return
+        Args:
+            structure (dict): The dictionary containing all of the structure resource information
 
-        # Check if the structure has any resource set to guarded
+        Returns:
+            (list) The resources to be guarded for this structure
+        """
         struct_guarded_resources = list()
         for res in self.guardable_resources:
             if res in structure["resources"] and "guard" in structure["resources"][res] and structure["resources"][res]["guard"]:
                 struct_guarded_resources.append(res)
-        if not struct_guarded_resources:
+        return struct_guarded_resources
+
+    @staticmethod
+    def get_metrics_to_retrieve_and_generate(struct_guarded_resources, structure_subtype):
+        """Get the metrics that have to be retrieved from OpenTSDB and the ones that have to be generated from them,
+        for a set of guarded resources of a structure subtype.
+
+        Args:
+            struct_guarded_resources (list): The resources guarded for the structure
+            structure_subtype (string): The structure subtype (e.g., container)
+
+        Returns:
+            (tuple[list,dict]) The metrics to retrieve and the metrics to generate
+        """
+        metrics_to_retrieve = list()
+        metrics_to_generate = dict()
+        for res in struct_guarded_resources:
+            metrics_to_retrieve += BDWATCHDOG_METRICS[structure_subtype][res]
+            if res in BDWATCHDOG_TO_GUARDIAN[structure_subtype]:
+                for usage_metric in BDWATCHDOG_TO_GUARDIAN[structure_subtype][res]:
+                    metrics_to_generate[usage_metric] = GUARDIAN_METRICS[structure_subtype][usage_metric]
+        return metrics_to_retrieve, metrics_to_generate
+
+    def get_structures_usage_queries(self, structures):
+        """Group the structures according to their subtype and guarded resources, as both determine the metrics that
+        have to be retrieved, so that the usages of each group can be retrieved with a few grouped queries.
+
+        Args:
+            structures (list): The structures to be guarded in this epoch
+
+        Returns:
+            (list) Tuples with the tag, the structure names and the metrics to retrieve and generate of each group
+        """
+        groups = dict()
+        for structure in structures:
+            structure_subtype = structure["subtype"]
+            if "guard" not in structure or not structure["guard"] or structure_subtype not in TAGS:
+                continue
+            struct_guarded_resources = self.get_structure_guarded_resources(structure)
+            if struct_guarded_resources:
+                key = (structure_subtype, tuple(struct_guarded_resources))
+                groups.setdefault(key, list()).append(structure["name"])
+
+        usage_queries = list()
+        for (structure_subtype, struct_guarded_resources), names in groups.items():
+            metrics_to_retrieve, metrics_to_generate = \
+                self.get_metrics_to_retrieve_and_generate(struct_guarded_resources, structure_subtype)
+            usage_queries.append((TAGS[structure_subtype], names, metrics_to_retrieve, metrics_to_generate))
+        return usage_queries
+
+    def get_structures_usages(self, structures):
+        """Retrieve the usages of all the structures with a few grouped queries.
+
+        Args:
+            structures (list): The structures to be guarded in this epoch
+
+        Returns:
+            (dict) The usages of each structure indexed by structure name, structures whose usages could not be
+            retrieved are left out
+        """
+        # Use the samples pushed by the agents if available, the rest of the usages are retrieved from OpenTSDB
+        # Structures without any time series in the grouped result are left out, and retrieved one by one later
+        structures_usages, structures = self.get_pushed_usages(structures)
+        for tag, names, metrics_to_retrieve, metrics_to_generate in self.get_structures_usage_queries(structures):
+            try:
+                # Remote database operation
+                structures_usages.update(self.opentsdb_handler.get_structures_timeseries(
+                    tag, names, self.window_difference, self.window_delay,
+                    metrics_to_retrieve, metrics_to_generate, chunk_size=self.usage_query_chunk_size, only_found=True))
+            except Exception as e:
+                log_error("Error retrieving the usages of {0} structures, they will be retrieved one by one: {1}".format(
+                    len(names), str(e)), self.debug)
+
+        return structures_usages
+
+    def get_pushed_usages(self, structures):
+        """Get the usages of the structures from the samples pushed by the agents, without any delay window.
+
+        Args:
+            structures (list): The structures to be guarded in this epoch
+
+        Returns:
+            (tuple[dict,list]) The usages of each structure with pushed samples of all its metrics indexed by structure
+            name, and the rest of structures, whose usages have to be retrieved from OpenTSDB
+        """
+        if not self.ingestion_server:
+            return dict(), structures
+
+        # Local operations, samples are kept in memory
+        self.usage_windows.max_age = self.window_difference
+        self.usage_windows.expire()
+        structures_usages = dict()
+        for tag, names, metrics_to_retrieve, metrics_to_generate in self.get_structures_usage_queries(structures):
+            # Only the structures with samples of all the metrics the usages are generated from are used, otherwise
+            # the usages of the missing ones would be taken as zero instead of being retrieved from OpenTSDB
+            needed_metrics = {metric for metrics in metrics_to_generate.values() for metric in metrics}
+            pushed_names = [name for name in names if self.usage_windows.has_samples(tag, name, needed_metrics)]
+            structures_usages.update(self.usage_windows.get_usages(tag, pushed_names, self.window_difference,
+                                                                   metrics_to_retrieve, metrics_to_generate))
+        return structures_usages, [structure for structure in structures if structure["name"] not in structures_usages]
+
+    def get_structures_limits(self, structures):
+        """Retrieve the limits of all the guarded structures with a single query.
+
+        Args:
+            structures (list): The structures to be guarded in this epoch
+
+        Returns:
+            (dict) The limits document of each structure indexed by structure name, structures whose limits could not
+            be retrieved are left out
+        """
+        names = [structure["name"] for structure in structures if "guard" in structure and structure["guard"]]
+        structures_limits = dict()
+        try:
+            # Remote database operation, unless the databases are mirrored
+            for limits in self.get_state_handler().get_limits_by_names(names):
+                # There should only be one 'limits' document per structure, keep the first one as get_limits does
+                structures_limits.setdefault(limits["name"], limits)
+        except Exception as e:
+            log_error("Error retrieving the limits of {0} structures, they will be retrieved one by one: {1}".format(
+                len(names), str(e)), self.debug)
+        return structures_limits
+
+    def check_structure_is_guardable(self, structure):
+        # Check if structure is guarded
+        if "guard" not in structure or not structure["guard"]:
+            log_warning("structure: {0} is set to leave alone, skipping".format(structure["name"]), self.debug)
+            return False
+
+        # Check if the structure has any resource set to guarded
+        if not self.get_structure_guarded_resources(structure):
             log_warning("Structure {0} is set to guarded but has no resource marked to guard".format(structure["name"]), self.debug)
-            return
+            return False
 
         # Check if structure is being monitored, otherwise, ignore
+        structure_subtype = structure["subtype"]
         if structure_subtype not in BDWATCHDOG_METRICS or structure_subtype not in GUARDIAN_METRICS or structure_subtype not in TAGS:
             log_error("Unknown structure subtype '{0}'".format(structure_subtype), self.debug)
+            return False
+
+        return True
+
+    def check_structure_usages(self, structure, usages):
+        for metric in usages:
+            if usages[metric] == self.NO_METRIC_DATA_DEFAULT_VALUE:
+                log_warning("structure: {0} has no usage data for {1}".format(structure["name"], metric), self.debug)
+
+        # Skip this structure if all the usage metrics are unavailable
+        if all([usages[metric] == self.NO_METRIC_DATA_DEFAULT_VALUE for metric in usages]):
+            log_warning("structure: {0} has no usage data for any metric, skipping".format(structure["name"]), self.debug)
+            return False
+
+        return True
+
+    def convert_structure_usages(self, usages):
+        """Convert in place the usages whose unit differs from the one of their resource limits.
+
+        Args:
+            usages (dict): The usages of the structure, already checked by check_structure_usages
+        """
+        for metric, factor in USAGE_UNIT_FACTORS.items():
+            if metric in usages and usages[metric] != self.NO_METRIC_DATA_DEFAULT_VALUE:
+                usages[metric] = usages[metric] * factor
+
+    def prepare_structure_limits(self, structure, limits):
+        """Adjust the limits of a structure according to its current resource values, persisting them if they have
+        changed.
+
+        Args:
+            structure (dict): The dictionary containing all of the structure resource information
+            limits (dict): The 'limits' document of the structure
+
+        Returns:
+            (dict) The adjusted limits resources, or None if the structure has no limits
+        """
+        limits_resources = limits["resources"]
+
+        if not limits_resources:
+            log_warning("structure: {0} has no limits".format(structure["name"]), self.debug)
+            return None
+
+        # Adjust the structure limits according to the current value, only for the resources guarded as not every
+        # structure has all the guardable resources (e.g., disk or net)
+        original_limits_resources = copy.deepcopy(limits_resources)
+        limits["resources"] = self.adjust_container_state(structure["resources"], limits_resources,
+                                                          self.get_structure_guarded_resources(structure))
+
+        # Remote database operation, possibly deferred until the end of the epoch, only if the limits have changed
+        if limits["resources"] != original_limits_resources:
+            self.update_limit(limits)
+
+        return limits["resources"]
+
+    def serverless(self, structure, rules, usages=None, limits=None):
+        with self.metrics.timer("structure_processing_seconds"):
+            self.guard_structure(structure, rules, usages, limits)
+
+    def guard_structure(self, structure, rules, usages=None, limits=None):
+        if not self.check_structure_is_guardable(structure):
             return
 
         try:
-            metrics_to_retrieve = list()
-            metrics_to_generate = dict()
-            for res in struct_guarded_resources:
-                metrics_to_retrieve += BDWATCHDOG_METRICS[structure_subtype][res]
-                if res in BDWATCHDOG_TO_GUARDIAN[structure_subtype]:
-                    for usage_metric in BDWATCHDOG_TO_GUARDIAN[structure_subtype][res]:
-                        metrics_to_generate[usage_metric] = GUARDIAN_METRICS[structure_subtype][usage_metric]
-            tag = TAGS[structure_subtype]
+            # If the usages have not been retrieved in bulk, retrieve them now
+            if usages is None:
+                structure_subtype = structure["subtype"]
+                metrics_to_retrieve, metrics_to_generate = self.get_metrics_to_retrieve_and_generate(
+                    self.get_structure_guarded_resources(structure), structure_subtype)
+                tag = TAGS[structure_subtype]
 
-            # Remote database operation
-            usages = self.opentsdb_handler.get_structure_timeseries({tag: structure["name"]},
-                                                                    self.window_difference, self.window_delay,
-                                                                    metrics_to_retrieve, metrics_to_generate)
+                # Remote database operation
+                usages = self.opentsdb_handler.get_structure_timeseries({tag: structure["name"]},
+                                                                        self.window_difference, self.window_delay,
+                                                                        metrics_to_retrieve, metrics_to_generate)
 
-            for metric in usages:
-                if usages[metric] == self.NO_METRIC_DATA_DEFAULT_VALUE:
-                    log_warning("structure: {0} has no usage data for {1}".format(structure["name"], metric), self.debug)
+            if not self.check_structure_usages(structure, usages):
+                return
+            self.convert_structure_usages(usages)
 
-            # Skip this structure if all the usage metrics are unavailable
-            if all([usages[metric] == self.NO_METRIC_DATA_DEFAULT_VALUE for metric in usages]):
-                log_warning("structure: {0} has no usage data for any metric, skipping".format(structure["name"]), self.debug)
+            # If the limits have not been retrieved in bulk, retrieve them now
+            if limits is None:
+                # Remote database operation
+                limits = self.couchdb_handler.get_limits(structure)
+
+            limits_resources = self.prepare_structure_limits(structure, limits)
+            if not limits_resources:
                 return
 
-            resources = structure["resources"]
+            self.process_serverless_structure(structure, usages, limits_resources, rules)
 
-            # Remote database operation
-            limits = self.couchdb_handler.get_limits(structure)
-            limits_resources = limits["resources"]
+        except Exception as e:
+            log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), self.debug)
 
-            if not limits_resources:
-                log_warning("structure: {0} has no limits".format(structure["name"]), self.debug)
+    def prepare_structures(self, structures, rules, structures_usages, structures_limits):
+        """Carry out for several structures the steps of serverless that come before matching their usages and limits
+        with the rules, so that the rules can be evaluated for all of them at once. Only the structures whose usages
+        and limits were retrieved in bulk are prepared.
+
+        Args:
+            structures (list): The structures to be guarded in this epoch
+            rules (list): The rules
+            structures_usages (dict): The usages of the structures indexed by structure name
+            structures_limits (dict): The limits of the structures indexed by structure name
+
+        Returns:
+            (tuple) The list of tuples with the structure, usages, limits and rules data of each prepared structure,
+            and the list of structures that have to be guarded one by one
+        """
+        prepared_structures, remaining_structures = list(), list()
+        for structure in structures:
+            usages, limits = structures_usages.get(structure["name"]), structures_limits.get(structure["name"])
+            if usages is None or limits is None:
+                remaining_structures.append(structure)
+                continue
+
+            if not self.check_structure_is_guardable(structure):
+                continue
+
+            try:
+                if not self.check_structure_usages(structure, usages):
+                    continue
+                self.convert_structure_usages(usages)
+
+                limits_resources = self.prepare_structure_limits(structure, limits)
+                if not limits_resources:
+                    continue
+
+                data = self.get_rules_data(rules, usages, limits_resources, structure["resources"])
+                prepared_structures.append((structure, usages, limits_resources, data))
+
+            except Exception as e:
+                log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), self.debug)
+
+        return prepared_structures, remaining_structures
+
+    def process_prepared_structure(self, structure, usages, limits, rules, triggered_events):
+        with self.metrics.timer("structure_processing_seconds"):
+            try:
+                self.process_serverless_structure(structure, usages, limits, rules, triggered_events)
+            except Exception as e:
+                log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), self.debug)
+
+    def start_epoch_writes(self):
+        """Start collecting the limits and requests writes so that they are persisted at the end of the epoch with
+        bulk operations, instead of one remote operation per structure."""
+        with self.pending_writes_lock:
+            self.pending_limits = dict()
+            self.pending_requests = list()
+
+    def update_limit(self, limits):
+        with self.pending_writes_lock:
+            if self.pending_limits is not None:
+                self.pending_limits[limits["name"]] = limits
                 return
+        # Remote database operation
+        self.couchdb_handler.update_limit(limits)
 
-            # Adjust the structure limits according to the current value
-            limits["resources"] = self.adjust_container_state(resources, limits_resources, self.guardable_resources)
+    def add_requests(self, requests):
+        with self.pending_writes_lock:
+            if self.pending_requests is not None:
+                self.pending_requests += requests
+                return
+        # Remote database operation
+        self.couchdb_handler.add_requests(requests)
 
-            # Remote database operation
-            self.couchdb_handler.update_limit(limits)
+    def stop_epoch_writes(self):
+        """Stop collecting the limits and requests writes.
 
-            self.process_serverless_structure(structure, usages, limits_resources, rules)
+        Returns:
+            (tuple) The list of limits and the list of requests collected during the epoch
+        """
+        with self.pending_writes_lock:
+            limits, requests = self.pending_limits, self.pending_requests
+            self.pending_limits, self.pending_requests = None, None
+        return list(limits.values()) if limits else list(), requests if requests else list()
 
+    def flush_epoch_writes(self):
+        """Persist the limits and requests collected during the epoch and stop collecting them. Writes done from now
+        on (e.g., from structures that exceeded their deadline) are persisted right away."""
+        limits, requests = self.stop_epoch_writes()
+
+        try:
+            with self.metrics.timer("phase_duration_seconds", {"phase": "request_writes"}):
+                if limits and not self.couchdb_handler.update_limits(limits):
+                    # Remote database operation, the limits that couldn't be updated have already been reported
+                    log_error("Some of the {0} updated limits couldn't be persisted".format(len(limits)), self.debug)
+                if requests:
+                    # Remote database operation
+                    self.couchdb_handler.add_requests(requests)
+            log_info("Persisted {0} updated limits and {1} requests".format(len(limits), len(requests)), self.debug)
         except Exception as e:
-            log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), self.debug)
+            log_error("Error persisting the limits and requests of the epoch: {0}".format(str(e)), self.debug)
+
+    def get_epoch_state(self, structures):
+        """Retrieve the rules, and the usages and limits of the structures in bulk, for an epoch.
+
+        Args:
+            structures (list): The structures to be guarded in this epoch
+
+        Returns:
+            (tuple) The rules, and the usages and limits of the structures indexed by structure name
+        """
+        # Remote database operation, unless the databases are mirrored
+        with self.metrics.timer("phase_duration_seconds", {"phase": "rules_fetch"}):
+            rules = self.get_state_handler().get_rules()
+
+        # Remote database operation
+        with self.metrics.timer("phase_duration_seconds", {"phase": "usage_query"}):
+            structures_usages = self.get_structures_usages(structures)
 
-    def guard_structures(self, structures):
         # Remote database operation
-        rules = self.couchdb_handler.get_rules()
+        with self.metrics.timer("phase_duration_seconds", {"phase": "limits_fetch"}):
+            structures_limits = self.get_structures_limits(structures)
+
+        return rules, structures_usages, structures_limits
+
+    def guard_structures(self, structures):
+        # Remote database operations
+        rules, structures_usages, structures_limits = self.get_epoch_state(structures)
+
+        self.start_epoch_writes()
+
+        futures = list()
+        if self.vectorized_rules:
+            # Match the usages and limits of all the structures at once, then process the events of each one
+            prepared_structures, structures = self.prepare_structures(structures, rules, structures_usages, structures_limits)
+            with self.metrics.timer("phase_duration_seconds", {"phase": "rule_matching"}):
+                structures_events = self.match_structures_usages_and_limits(prepared_structures, rules)
+            for (structure, usages, limits, _), triggered_events in zip(prepared_structures, structures_events):
+                if triggered_events is None:
+                    continue
+                futures.append(self.worker_pool.submit(structure["name"], self.process_prepared_structure, structure,
+                                                       usages, limits, rules, triggered_events))
 
-        threads = []
         for structure in structures:
-            thread = Thread(name="process_structure_{0}".format(structure["name"]), target=self.serverless,
-                            args=(structure, rules,))
-            thread.start()
-            threads.append(thread)
+            futures.append(self.worker_pool.submit(structure["name"], self.serverless, structure, rules,
+                                                   structures_usages.get(structure["name"]),
+                                                   structures_limits.get(structure["name"])))
+
+        late_structures = self.worker_pool.join(futures, self.structure_deadline, self.debug)
+        if late_structures:
+            log_warning("{0} structures exceeded the deadline of {1} seconds: {2}".format(
+                len(late_structures), self.structure_deadline, str(late_structures)), self.debug)
+
+        self.flush_epoch_writes()
+
+        stats = self.worker_pool.get_stats()
+        log_info("Worker pool -> queue depth: {0}, running: {1}, task latency avg/max: {2:.3f}/{3:.3f} seconds".format(
+            stats["queue_depth"], stats["running"], stats["latency_avg"], stats["latency_max"]), self.debug)
+
+    def get_guard_structures_function(self):
+        """Get the function that guards the structures of an epoch according to the configured engine, either the
+        worker pool of threads, an asyncio event loop or a pool of processes.
+
+        Returns:
+            (function) The function that receives the structures to be guarded
+        """
+        if self.engine == "asyncio":
+            if self.async_engine is None:
+                try:
+                    # Imported here so that the asynchronous HTTP client is only needed if this engine is used
+                    from src.Guardian.AsyncGuardian import AsyncGuardianEngine
+                    self.async_engine = AsyncGuardianEngine(self)
+                except ImportError as e:
+                    log_error("Asyncio engine not available, using threads: {0}".format(str(e)), self.debug)
+                    return self.guard_structures
+            return self.async_engine.guard_structures
+        if self.engine == "processes":
+            if self.process_engine is None:
+                self.process_engine = ProcessGuardianEngine(self)
+            return self.process_engine.guard_structures
+        if self.process_engine is not None:
+            self.process_engine.shutdown()
+            self.process_engine = None
+        return self.guard_structures
+
+    def set_event_store(self, use_event_store):
+        """Create the in-memory event store, loading the events persisted in the database, or remove it and go back
+        to keeping the events in the database.
+
+        Args:
+            use_event_store (boolean): Whether the in-memory event store is used
+        """
+        if use_event_store and not self.event_store:
+            self.event_store = EventStore()
+            if self.sharding and not self.hash_ring:
+                # The structures owned by this instance are not known yet, their events are loaded once they are
+                return
+            try:
+                # Remote database operation
+                events = self.couchdb_handler.get_all_events()
+                self.event_store.load_events([e for e in events if self.is_owned_structure(e["structure"])])
+                self.last_events_snapshot = time.time()
+            except Exception as e:
+                log_warning("Couldn't load the persisted events into the event store: {0}".format(str(e)), self.debug)
+        elif not use_event_store and self.event_store:
+            # Persist the events so that they keep being used from the database
+            self.snapshot_events()
+            self.event_store = None
+
+    def set_couchdb_mirror(self, use_changes_feed):
+        """Start the in-memory mirror of the structures, limits and rules databases, kept up to date with their
+        changes feed, or stop it and go back to reading them from the database on every epoch.
+
+        Args:
+            use_changes_feed (boolean): Whether the databases are mirrored
+        """
+        if use_changes_feed and not self.couchdb_mirror:
+            self.couchdb_mirror = CouchDBMirror(debug=self.debug)
+            self.couchdb_mirror.start()
+        elif not use_changes_feed and self.couchdb_mirror:
+            self.couchdb_mirror.stop()
+            self.couchdb_mirror = None
+
+    def get_state_handler(self):
+        """Get the handler to read the structures, limits and rules from, which is the database mirror once it has
+        loaded all the documents, or the database otherwise."""
+        if self.couchdb_mirror and self.couchdb_mirror.is_synced():
+            return self.couchdb_mirror
+        return self.couchdb_handler
+
+    def update_shard_membership(self):
+        """Write the heartbeat of this instance and update the instances among which the structures are split, so
+        that the structures of the instances that stop beating are reassigned to the remaining ones."""
+        try:
+            # Remote database operations
+            beat_member(self.couchdb_handler, self.instance_name, SERVICE_NAME)
+            members = get_alive_members(self.couchdb_handler.get_services(), SERVICE_NAME, self.shard_timeout)
+        except Exception as e:
+            log_warning("Couldn't update the Guardian instances, keeping the previous ones: {0}".format(str(e)), self.debug)
+            return
+
+        if self.instance_name not in members:
+            members.append(self.instance_name)
+        if not self.hash_ring or self.hash_ring.members != sorted(members):
+            log_info("Structures are split among the Guardian instances {0}".format(sorted(members)), self.debug)
+            previous_ring = self.hash_ring
+            if self.event_store and previous_ring is not None:
+                # Persist the events of the structures owned so far, so that their new owners can load them
+                self.snapshot_events()
+            self.hash_ring = HashRing(members)
+            if self.event_store:
+                self.update_owned_events(previous_ring)
+
+    def update_owned_events(self, previous_ring):
+        """Keep in the event store only the events of the structures owned by this instance, loading the persisted
+        events of the structures that it has just been assigned, or of all its structures the first time they are split.
 
-        for process in threads:
-            process.join()
+        Args:
+            previous_ring (HashRing): The previous split of the structures, None if they were not split
+        """
+        # Local operation
+        self.event_store.delete_structures_events([name for name in self.event_store.get_structure_names()
+                                                   if not self.is_owned_structure(name)])
+        stored_structures = set(self.event_store.get_structure_names())
+
+        def is_newly_owned(structure_name):
+            if not self.is_owned_structure(structure_name) or structure_name in stored_structures:
+                return False
+            return previous_ring is None or previous_ring.get_owner(structure_name) != self.instance_name
+
+        try:
+            # Remote database operation
+            events = self.couchdb_handler.get_all_events()
+            self.event_store.load_events([e for e in events if is_newly_owned(e["structure"])])
+        except Exception as e:
+            log_warning("Couldn't load the persisted events of the newly assigned structures: {0}".format(str(e)), self.debug)
+
+    def schedule_structure(self, structure, usages, limits, reduced_events):
+        """Set when a structure has to be guarded again, which is in the next epoch unless its usages are stable and it
+        has no events.
+
+        Args:
+            structure (dict): The dictionary containing all of the structure resource information
+            usages (dict): The structure usages by metric
+            limits (dict): The structure limits by resource
+            reduced_events (dict): The current events of the structure reduced by resource
+        """
+        resources_usages = dict()
+        for resource in self.get_structure_guarded_resources(structure):
+            metric = translator_dict.get(resource)
+            if resource in limits and metric in usages:
+                resources_usages[resource] = (usages[metric], limits[resource]["lower"], limits[resource]["upper"])
+
+        stable = self.scheduler.is_stable(structure["name"], resources_usages) and not reduced_events
+        self.scheduler.reschedule(structure["name"], stable, self.max_guard_interval)
+
+    def get_due_structures(self, structures):
+        """Get the structures that have to be guarded in this epoch.
+
+        Args:
+            structures (list): All the structures to be guarded
+
+        Returns:
+            (list) The structures due in this epoch, all of them if the structures are not adaptively scheduled
+        """
+        if not self.adaptive_scheduling:
+            return structures
+        due_structures = self.scheduler.get_due_structures(structures)
+        log_info("{0} of {1} structures are due in this epoch".format(len(due_structures), len(structures)), self.debug)
+        return due_structures
+
+    def get_owned_structures(self, structures):
+        """Get the structures that are guarded by this instance.
+
+        Args:
+            structures (list): All the structures to be guarded
+
+        Returns:
+            (list) The structures assigned to this instance, all of them if the structures are not split
+        """
+        if not self.sharding or not self.hash_ring:
+            return structures
+        return [structure for structure in structures if self.is_owned_structure(structure["name"])]
+
+    def is_owned_structure(self, structure_name):
+        """Check whether a structure is guarded by this instance, which is always the case if structures are not split
+
+        Args:
+            structure_name (string): The name of the structure
+
+        Returns:
+            (boolean) Whether the structure is assigned to this instance
+        """
+        return not self.sharding or not self.hash_ring or self.hash_ring.get_owner(structure_name) == self.instance_name
+
+    def snapshot_events(self):
+        """Replace the events persisted in the database with the ones in the event store, so that they are visible
+        from outside the Guardian (e.g., the web interface) and survive restarts. If the structures are split among
+        several instances, only the events of the structures owned by this one are replaced."""
+        if self.sharding and not self.hash_ring:
+            log_warning("The structures owned by this instance are not known yet, not persisting the events", self.debug)
+            return
+        try:
+            # Remote database operations
+            persisted_events = self.couchdb_handler.get_all_events()
+            self.couchdb_handler.delete_events([e for e in persisted_events if self.is_owned_structure(e["structure"])])
+            events = [e for e in self.event_store.get_all_events() if self.is_owned_structure(e["structure"])]
+            if events:
+                self.couchdb_handler.add_events(events)
+            self.last_events_snapshot = time.time()
+            log_info("Persisted a snapshot of {0} events".format(len(events)), self.debug)
+        except Exception as e:
+            log_error("Error persisting the events snapshot: {0}".format(str(e)), self.debug)
+
+    def run_epoch(self, guard_structures, structures, t0):
+        """Guard the structures of an epoch and record how long it took, checking whether it took longer than the
+        time window.
+
+        Args:
+            guard_structures (function): The function that guards the structures, according to the configured engine
+            structures (list): The structures to be guarded in this epoch
+            t0 (float): The time at which the epoch processing started, including the retrieval of the structures
+        """
+        guard_structures(structures)
+        # Structures may not be guarded for several epochs if they are stable
+        state_timeout = self.event_timeout + self.max_guard_interval * self.window_difference
+        self.forecaster.expire(state_timeout)
+        self.pid_controllers.expire(state_timeout)
+        processing_time = time.time() - t0
+        self.metrics.observe("epoch_processing_seconds", processing_time)
+        if processing_time > self.window_difference:
+            self.metrics.inc("epochs_overrun_total")
+            log_warning("Epoch processing took {0:.2f} seconds, longer than the time window of {1} seconds".format(
+                processing_time, self.window_difference), self.debug)
+
+    def set_metrics_server(self, port):
+        """Start, stop or move the HTTP server that exposes the metrics, a port of 0 disables it.
+
+        Args:
+            port (integer): The port where the '/metrics' endpoint is served
+        """
+        if self.metrics_server and self.metrics_server.port != port:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if port and not self.metrics_server:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, port)
+                self.metrics_server.start()
+                log_info("Serving metrics on port {0}".format(port), self.debug)
+            except OSError as e:
+                log_error("Couldn't serve metrics on port {0}: {1}".format(port, str(e)), self.debug)
+                self.metrics_server = None
+
+    def set_ingestion_server(self, http_port, udp_port):
+        """Start, stop or move the server where the agents push their samples, ports of 0 disable it.
+
+        Args:
+            http_port (integer): The port of the HTTP '/api/put' endpoint
+            udp_port (integer): The port where the samples are received as UDP datagrams
+        """
+        server = self.ingestion_server
+        if server and (server.http_port != http_port or server.udp_port != udp_port):
+            server.stop()
+            self.ingestion_server = None
+        if (http_port or udp_port) and not self.ingestion_server:
+            try:
+                self.ingestion_server = UsageIngestionServer(self.usage_windows, http_port, udp_port)
+                self.ingestion_server.start()
+                log_info("Receiving pushed samples on HTTP port {0} and UDP port {1}".format(http_port, udp_port), self.debug)
+            except OSError as e:
+                log_error("Couldn't receive pushed samples: {0}".format(str(e)), self.debug)
+                self.ingestion_server = None
+
+    def send_metrics(self):
+        docs = self.metrics.get_opentsdb_documents({"service": SERVICE_NAME})
+        if docs:
+            # Remote database operation
+            success, info = self.opentsdb_handler.send_json_documents(docs)
+            if not success:
+                log_error("Couldn't send the metrics, error: {0}".format(str(info["error"])), self.debug)
 
     def invalid_conf(self, ):
         for res in self.guardable_resources:
@@ -823,13 +1658,90 @@ class Guardian:
         for key, num in [("WINDOW_TIMELAPSE", self.window_difference), ("WINDOW_DELAY", self.window_delay), ("EVENT_TIMEOUT", self.event_timeout)]:
             if num < 5:
                 return True, "Configuration item '{0}' with a value of '{1}' is likely invalid".format(key, num)
+
+        for key, num in [("MAX_WORKERS", self.max_workers), ("STRUCTURE_DEADLINE", self.structure_deadline),
+                         ("MAX_GUARD_INTERVAL", self.max_guard_interval)]:
+            if num < 1:
+                return True, "Configuration item '{0}' with a value of '{1}' is invalid".format(key, num)
+
+        if self.engine not in ["threads", "asyncio", "processes"]:
+            return True, "Engine '{0}' is invalid".format(self.engine)
+
+        for key, port in [("METRICS_PORT", self.metrics_port), ("INGESTION_HTTP_PORT", self.ingestion_http_port),
+                          ("INGESTION_UDP_PORT", self.ingestion_udp_port)]:
+            if not 0 <= port <= 65535:
+                return True, "Configuration item '{0}' with a value of '{1}' is invalid".format(key, port)
+
+        if self.async_concurrency < 1:
+            return True, "Configuration item 'ASYNC_CONCURRENCY' with a value of '{0}' is invalid".format(self.async_concurrency)
+
+        if self.process_workers < 0:
+            return True, "Configuration item 'PROCESS_WORKERS' with a value of '{0}' is invalid".format(self.process_workers)
+
+        if self.shard_timeout < self.window_difference:
+            return True, "Configuration item 'SHARD_TIMEOUT' with a value of '{0}' is shorter than the time window".format(self.shard_timeout)
+
+        for key, num in [("FORECAST_ALPHA", self.forecast_alpha), ("FORECAST_BETA", self.forecast_beta)]:
+            if not 0 < num <= 1:
+                return True, "Configuration item '{0}' with a value of '{1}' is invalid".format(key, num)
+
+        if self.forecast_horizon < 0:
+            return True, "Configuration item 'FORECAST_HORIZON' with a value of '{0}' is invalid".format(self.forecast_horizon)
+
+        if self.usage_query_chunk_size < 1:
+            return True, "Configuration item 'USAGE_QUERY_CHUNK_SIZE' with a value of '{0}' is invalid".format(self.usage_query_chunk_size)
         return False, ""
 
 
+    def set_config(self, myConfig):
+        """Read the service configuration.
+
+        Args:
+            myConfig (MyConfig): The service configuration, with its default values
+        """
+        self.debug = myConfig.get_value("DEBUG")
+        self.guardable_resources = myConfig.get_value("GUARDABLE_RESOURCES")
+        self.cpu_shares_per_watt = myConfig.get_value("CPU_SHARES_PER_WATT")
+        self.use_energy_model = myConfig.get_value("USE_ENERGY_MODEL")
+        self.energy_model_name = myConfig.get_value("ENERGY_MODEL_NAME")
+        self.window_difference = myConfig.get_value("WINDOW_TIMELAPSE")
+        self.window_delay = myConfig.get_value("WINDOW_DELAY")
+        self.structure_guarded = myConfig.get_value("STRUCTURE_GUARDED")
+        self.event_timeout = myConfig.get_value("EVENT_TIMEOUT")
+        self.usage_query_chunk_size = myConfig.get_value("USAGE_QUERY_CHUNK_SIZE")
+        self.max_workers = myConfig.get_value("MAX_WORKERS")
+        self.structure_deadline = myConfig.get_value("STRUCTURE_DEADLINE")
+        self.use_event_store = myConfig.get_value("USE_EVENT_STORE")
+        self.event_snapshot_period = myConfig.get_value("EVENT_SNAPSHOT_PERIOD")
+        self.engine = myConfig.get_value("ENGINE")
+        self.async_concurrency = myConfig.get_value("ASYNC_CONCURRENCY")
+        self.metrics_port = myConfig.get_value("METRICS_PORT")
+        self.push_metrics = myConfig.get_value("PUSH_METRICS")
+        self.vectorized_rules = myConfig.get_value("VECTORIZED_RULES")
+        self.forecast_alpha = myConfig.get_value("FORECAST_ALPHA")
+        self.forecast_beta = myConfig.get_value("FORECAST_BETA")
+        self.forecast_horizon = myConfig.get_value("FORECAST_HORIZON")
+        self.use_changes_feed = myConfig.get_value("USE_CHANGES_FEED")
+        self.sharding = myConfig.get_value("SHARDING")
+        self.shard_timeout = myConfig.get_value("SHARD_TIMEOUT")
+        self.adaptive_scheduling = myConfig.get_value("ADAPTIVE_SCHEDULING")
+        self.max_guard_interval = myConfig.get_value("MAX_GUARD_INTERVAL")
+        self.ingestion_http_port = myConfig.get_value("INGESTION_HTTP_PORT")
+        self.ingestion_udp_port = myConfig.get_value("INGESTION_UDP_PORT")
+        self.local_energy_model = myConfig.get_value("LOCAL_ENERGY_MODEL")
+        self.energy_models.refresh_period = myConfig.get_value("ENERGY_MODEL_REFRESH_PERIOD")
+        self.process_workers = myConfig.get_value("PROCESS_WORKERS")
+
     def guard(self, ):
         myConfig = MyConfig(CONFIG_DEFAULT_VALUES)
         logging.basicConfig(filename=SERVICE_NAME + '.log', level=logging.INFO)
 
+        # Create the indexes used to retrieve the structures and limits by name, if missing
+        try:
+            self.couchdb_handler.create_names_indexes()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log_warning("Couldn't create the indexes of the structures and limits databases: {0}".format(str(e)), True)
+
         while True:
             # Get service info
             service = get_service(self.couchdb_handler, SERVICE_NAME)
@@ -839,16 +1751,8 @@ class Guardian:
 
             # CONFIG
             myConfig.set_config(service["config"])
-            self.debug = myConfig.get_value("DEBUG")
+            self.set_config(myConfig)
             debug = self.debug
-            self.guardable_resources = myConfig.get_value("GUARDABLE_RESOURCES")
-            self.cpu_shares_per_watt = myConfig.get_value("CPU_SHARES_PER_WATT")
-            self.use_energy_model = myConfig.get_value("USE_ENERGY_MODEL")
-            self.energy_model_name = myConfig.get_value("ENERGY_MODEL_NAME")
-            self.window_difference = myConfig.get_value("WINDOW_TIMELAPSE")
-            self.window_delay = myConfig.get_value("WINDOW_DELAY")
-            self.structure_guarded = myConfig.get_value("STRUCTURE_GUARDED")
-            self.event_timeout = myConfig.get_value("EVENT_TIMEOUT")
             SERVICE_IS_ACTIVATED = myConfig.get_value("ACTIVE")
 
             t0 = start_epoch(self.debug)
@@ -860,6 +1764,9 @@ class Guardian:
             log_info("Event timeout -> {0}".format(self.event_timeout), debug)
             log_info("Resources guarded are -> {0}".format(self.guardable_resources), debug)
             log_info("Structure type guarded is -> {0}".format(self.structure_guarded), debug)
+            log_info("Engine is -> {0}".format(self.engine), debug)
+            if self.sharding:
+                log_info("Instance is -> {0}".format(self.instance_name), debug)
             if self.use_energy_model:
                 log_info("Energy model name is -> {0}".format(self.energy_model_name), debug)
             log_info(".............................................", debug)
@@ -875,13 +1782,36 @@ class Guardian:
                 end_epoch(self.debug, self.window_difference, t0)
                 continue
 
+            # Reuse the worker pool across epochs, it is only recreated if the number of workers changes
+            if self.worker_pool is None:
+                self.worker_pool = WorkerPool(self.max_workers, name="guardian_worker")
+            else:
+                self.worker_pool.resize(self.max_workers)
+
+            self.set_event_store(self.use_event_store)
+            self.set_couchdb_mirror(self.use_changes_feed)
+            self.set_metrics_server(self.metrics_port)
+            self.set_ingestion_server(self.ingestion_http_port, self.ingestion_udp_port)
+
             thread = None
             if SERVICE_IS_ACTIVATED:
-                # Remote database operation
-                structures = get_structures(self.couchdb_handler, debug, subtype=self.structure_guarded)
+                t_processing = time.time()
+                if self.sharding:
+                    self.update_shard_membership()
+                # Remote database operation, unless the databases are mirrored
+                with self.metrics.timer("phase_duration_seconds", {"phase": "structures_fetch"}):
+                    structures = get_structures(self.get_state_handler(), debug, subtype=self.structure_guarded)
                 if structures:
-                    log_info("{0} Structures to process, launching threads".format(len(structures)), debug)
-                    thread = Thread(name="guard_structures", target=self.guard_structures, args=(structures,))
+                    structures = self.get_due_structures(self.get_owned_structures(structures))
+                if structures:
+                    guard_structures = self.get_guard_structures_function()
+                    if guard_structures == self.guard_structures:
+                        log_info("{0} Structures to process, launching {1} workers".format(len(structures), self.max_workers), debug)
+                    elif self.process_engine is not None and guard_structures == self.process_engine.guard_structures:
+                        log_info("{0} Structures to process, evaluating them in {1} processes".format(len(structures), self.process_engine.get_num_workers()), debug)
+                    else:
+                        log_info("{0} Structures to process, running up to {1} concurrently on an event loop".format(len(structures), self.async_concurrency), debug)
+                    thread = Thread(name="guard_structures", target=self.run_epoch, args=(guard_structures, structures, t_processing))
                     thread.start()
                 else:
                     log_info("No structures to process", debug)
@@ -892,6 +1822,12 @@ class Guardian:
 
             wait_operation_thread(thread, debug)
 
+            if self.event_store and 0 < self.event_snapshot_period <= time.time() - self.last_events_snapshot:
+                self.snapshot_events()
+
+            if self.push_metrics:
+                self.send_metrics()
+
             end_epoch(t0, self.window_difference, t0)
 
 
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from src.Guardian.EventStore import EventStore
+from src.Guardian.Replay import generate_scenario
+from src.MyUtils.DataModel import Structure, Limits, Event
+
+
+def measure(build):
+    """Get the memory kept allocated by the object returned by 'build', in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def load_docs(docs, first_id=0):
+    # Same documents as retrieved from CouchDB, without objects shared between them
+    docs = json.loads(json.dumps(docs))
+    for i, doc in enumerate(docs):
+        doc["_id"] = "{0:032x}".format(first_id + i)
+        doc["_rev"] = "1-{0:032x}".format(first_id + i)
+    return docs
+
+
+def generate_events(num_structures, events_per_structure):
+    actions = [{"events": {"scale": {"up": 1}}}, {"events": {"scale": {"down": 1}}}]
+    events = list()
+    for i in range(num_structures):
+        for j in range(events_per_structure):
+            events.append(dict(name="CpuBottleneck" if j % 2 == 0 else "MemUnderuse", resource="cpu" if j % 2 == 0 else "mem",
+                               type="event", structure="node{0}".format(i), action=actions[j % 2],
+                               timestamp=1000000000 + j))
+    return json.loads(json.dumps(events))
+
+
+def run_benchmark(num_structures, events_per_structure):
+    """Compare the memory used by the structures, limits and events kept in memory by the Guardian as dictionaries
+    and as slotted documents
+
+    Args:
+        num_structures (integer): The number of containers
+        events_per_structure (integer): The number of events buffered for each container
+
+    Returns:
+        (dict) The bytes per structure of each kind of document, for both representations
+    """
+    scenario = generate_scenario(num_structures, 1)
+
+    # The slotted documents are built from freshly loaded ones so that the values they keep are measured too
+    def store_events():
+        store = EventStore(max_events=events_per_structure)
+        store.add_events(generate_events(num_structures, events_per_structure))
+        return store
+
+    results = dict()
+    results["structures"] = (measure(lambda: load_docs(scenario["structures"])),
+                             measure(lambda: [Structure.from_dict(s) for s in load_docs(scenario["structures"])]))
+    results["limits"] = (measure(lambda: load_docs(scenario["limits"], first_id=num_structures)),
+                         measure(lambda: [Limits.from_dict(l) for l in load_docs(scenario["limits"], first_id=num_structures)]))
+    results["events"] = (measure(lambda: generate_events(num_structures, events_per_structure)),
+                         measure(lambda: [Event.from_dict(e) for e in generate_events(num_structures, events_per_structure)]))
+    results["event_store"] = (None, measure(store_events))
+    return {kind: tuple(None if size is None else size / num_structures for size in sizes)
+            for kind, sizes in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory used by the Guardian in-memory documents")
+    parser.add_argument("--structures", type=int, default=10000, help="Number of containers")
+    parser.add_argument("--events", type=int, default=10, help="Number of events buffered for each container")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.structures, args.events)
+    print("Bytes per structure ({0} structures, {1} events each)".format(args.structures, args.events))
+    print("{0:<14}{1:>12}{2:>12}{3:>10}".format("", "dict", "slotted", "ratio"))
+    for kind, (dict_size, slotted_size) in results.items():
+        if dict_size is None:
+            print("{0:<14}{1:>12}{2:>12.0f}{3:>10}".format(kind, "-", slotted_size, "-"))
+        else:
+            print("{0:<14}{1:>12.0f}{2:>12.0f}{3:>10.2f}".format(kind, dict_size, slotted_size, slotted_size / dict_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from threading import Lock
+
+# Gains used for the rules that don't set them
+DEFAULT_GAINS = {"kp": 0.8, "ki": 0.1, "kd": 0.0}
+
+
+class PIDState:
+    __slots__ = ("integral", "last_error", "last_update")
+
+    def __init__(self):
+        self.integral = 0
+        self.last_error = None
+        self.last_update = None
+
+
+class PIDControllers:
+    """
+    In-memory state of the PID controllers used by the 'pid' rescale policy, one for every structure and resource.
+    Each controller aims at keeping the usage at the midpoint between the lower and upper limits, and it is stepped
+    every time a rule with this policy is activated, so the integral and derivative terms consider the previous
+    rescalings of the structure instead of sizing each one independently.
+    """
+
+    def __init__(self):
+        self.__states = dict()  # structure name -> resource -> PIDState
+        self.__lock = Lock()
+
+    def step(self, structure_name, resource, error, gains, timeout=None):
+        """Feed the current error of a structure resource to its controller and get the controller output
+
+        Args:
+            structure_name (string): The name of the structure
+            resource (string): The resource controlled (e.g., cpu)
+            error (float): The difference between the usage and the desired usage (setpoint)
+            gains (dict): The proportional, integral and derivative gains ('kp', 'ki' and 'kd')
+            timeout (integer): The state is reset if the controller has not been stepped within this timeout, in seconds
+
+        Returns:
+            (float) The controller output, in the same units as the error
+        """
+        now = time.time()
+        with self.__lock:
+            state = self.__states.setdefault(structure_name, dict()).setdefault(resource, PIDState())
+            if state.last_update is None or (timeout is not None and now - state.last_update > timeout):
+                state.integral, state.last_error = 0, None
+
+            # When the error changes its sign the accumulated error would push the resource in the wrong direction
+            # (windup), so start accumulating it again
+            if state.last_error is not None and error * state.last_error < 0:
+                state.integral = 0
+            state.integral += error
+            derivative = 0 if state.last_error is None else error - state.last_error
+            state.last_error = error
+            state.last_update = now
+
+        return gains["kp"] * error + gains["ki"] * state.integral + gains["kd"] * derivative
+
+    def reset(self, structure_name, resource):
+        with self.__lock:
+            self.__states.get(structure_name, dict()).pop(resource, None)
+
+    def expire(self, timeout):
+        """Remove the controllers that have not been stepped within the timeout, as their state is stale
+
+        Args:
+            timeout (integer): A timeout in seconds
+        """
+        oldest_timestamp = time.time() - timeout
+        with self.__lock:
+            for structure_name in list(self.__states.keys()):
+                structure_states = self.__states[structure_name]
+                for resource in list(structure_states.keys()):
+                    if structure_states[resource].last_update < oldest_timestamp:
+                        del structure_states[resource]
+                if not structure_states:
+                    del self.__states[structure_name]
+
+    def clear(self):
+        with self.__lock:
+            self.__states.clear()
@@ -0,0 +1,199 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.MyUtils.MyUtils import log_warning, log_error
+
+# Guardian attributes used to evaluate the structures, which are copied to the worker processes
+EVALUATION_CONFIG = ["debug", "guardable_resources", "vectorized_rules"]
+
+# Guardian of each worker process, only used to evaluate structures
+_process_guardian = None
+
+
+def init_worker(config):
+    global _process_guardian
+    # Imported here as the Guardian module imports this one
+    from src.Guardian.Guardian import Guardian
+    _process_guardian = Guardian()
+    for attribute, value in config.items():
+        setattr(_process_guardian, attribute, value)
+
+
+def evaluate_structures(rules, structures_data):
+    """Adjust the limits of several structures and match their usages and limits with the rules, in a worker process
+
+    Args:
+        rules (list): The rules
+        structures_data (list): Tuples with the index, the structure, the usages and the limits of each structure
+
+    Returns:
+        (tuple) The list of tuples with the index, the adjusted limits resources and the triggered events of each
+        structure that could be evaluated, and the list of limits documents that have changed
+    """
+    guardian = _process_guardian
+    structures = [structure for _, structure, _, _ in structures_data]
+    indexes = {structure["name"]: index for index, structure, _, _ in structures_data}
+    usages = {structure["name"]: structure_usages for _, structure, structure_usages, _ in structures_data}
+    limits = {structure["name"]: structure_limits for _, structure, _, structure_limits in structures_data}
+
+    # Changed limits are collected instead of persisted, so that they are persisted by the parent process
+    guardian.start_epoch_writes()
+    prepared_structures, _ = guardian.prepare_structures(structures, rules, usages, limits)
+    if guardian.vectorized_rules:
+        structures_events = guardian.match_structures_usages_and_limits(prepared_structures, rules)
+    else:
+        structures_events = list()
+        for structure, structure_usages, limits_resources, _ in prepared_structures:
+            try:
+                structures_events.append(guardian.match_usages_and_limits(structure["name"], rules, structure_usages,
+                                                                          limits_resources, structure["resources"]))
+            except Exception as e:
+                log_error("Error with structure {0}: {1}".format(structure["name"], str(e)), guardian.debug)
+                structures_events.append(None)
+    changed_limits, _ = guardian.stop_epoch_writes()
+
+    results = list()
+    for (structure, _, limits_resources, _), triggered_events in zip(prepared_structures, structures_events):
+        if triggered_events is not None:
+            results.append((indexes[structure["name"]], limits_resources, triggered_events))
+    return results, changed_limits
+
+
+class ProcessGuardianEngine:
+    """
+    Engine that guards the structures of a Guardian epoch using several processes to take the CPU-bound steps
+    (i.e., limits adjustment and matching the usages and limits with the rules) out of the Global Interpreter Lock.
+    The parent process retrieves the usages and limits in bulk, the structures are partitioned across the worker
+    processes, and the events and changed limits they return are processed by the parent process, which keeps the
+    state that persists across epochs (e.g., events, forecasts) and persists all the writes in bulk at the end of
+    the epoch. Structures whose usages or limits couldn't be retrieved in bulk are guarded as in the threads engine.
+    """
+
+    def __init__(self, guardian):
+        self.guardian = guardian
+        self.executor = None
+        self.executor_config = None
+        self.process_futures = list()
+
+    def get_num_workers(self):
+        return self.guardian.process_workers if self.guardian.process_workers > 0 else os.cpu_count()
+
+    def get_executor(self):
+        # The worker processes are kept across epochs, they are only recreated if their configuration changes
+        config = {attribute: getattr(self.guardian, attribute) for attribute in EVALUATION_CONFIG}
+        config["NO_METRIC_DATA_DEFAULT_VALUE"] = self.guardian.NO_METRIC_DATA_DEFAULT_VALUE
+        if self.executor is None or config != self.executor_config[0] or self.get_num_workers() != self.executor_config[1]:
+            self.shutdown()
+            self.executor = ProcessPoolExecutor(max_workers=self.get_num_workers(), initializer=init_worker,
+                                                initargs=(config,))
+            self.executor_config = (config, self.get_num_workers())
+        return self.executor
+
+    def shutdown(self):
+        if self.executor is not None:
+            # The pending evaluations are cancelled one by one, as shutdown() only cancels them from Python 3.9 onwards
+            for process_future in self.process_futures:
+                process_future.cancel()
+            self.process_futures = list()
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    @staticmethod
+    def get_compact_structure(structure):
+        # Only the values needed to evaluate the structure are sent to the worker processes
+        return {key: structure[key] for key in ["name", "subtype", "guard", "resources"] if key in structure}
+
+    def split_structures(self, structures, structures_usages, structures_limits):
+        """Partition the structures whose usages and limits have been retrieved in bulk into chunks, several per
+        worker process so that the work is balanced even if some chunks take longer.
+
+        Returns:
+            (tuple) The list of chunks, the list of structures in the chunks, which are referred to by their index,
+            and the list of structures that have to be guarded one by one
+        """
+        structures_data, chunked_structures, remaining_structures = list(), list(), list()
+        for structure in structures:
+            usages, limits = structures_usages.get(structure["name"]), structures_limits.get(structure["name"])
+            if usages is None or limits is None:
+                remaining_structures.append(structure)
+            else:
+                structures_data.append((len(chunked_structures), self.get_compact_structure(structure), usages, limits))
+                chunked_structures.append(structure)
+
+        num_chunks = max(1, min(len(structures_data), self.get_num_workers() * 4))
+        chunks = [structures_data[i::num_chunks] for i in range(num_chunks)]
+        return [chunk for chunk in chunks if chunk], chunked_structures, remaining_structures
+
+    def guard_structures(self, structures):
+        guardian = self.guardian
+        rules, structures_usages, structures_limits = guardian.get_epoch_state(structures)
+
+        guardian.start_epoch_writes()
+
+        chunks, chunked_structures, remaining_structures = self.split_structures(structures, structures_usages,
+                                                                                 structures_limits)
+        futures = list()
+        with guardian.metrics.timer("phase_duration_seconds", {"phase": "rule_matching"}):
+            executor = self.get_executor()
+            process_futures = [executor.submit(evaluate_structures, rules, chunk) for chunk in chunks]
+            self.process_futures = process_futures
+            for process_future in as_completed(process_futures):
+                try:
+                    results, changed_limits = process_future.result()
+                except Exception as e:
+                    log_error("Error evaluating structures in a worker process: {0}".format(str(e)), guardian.debug)
+                    continue
+
+                # Local operations, the limits are persisted at the end of the epoch
+                for limits in changed_limits:
+                    guardian.update_limit(limits)
+
+                # Process the events of each structure, which involves the state kept by this process
+                for index, limits_resources, triggered_events in results:
+                    structure = chunked_structures[index]
+                    # Events are timestamped by the process that keeps them, as the clocks of the worker processes
+                    # may differ (e.g., when replaying)
+                    for event in triggered_events:
+                        event["timestamp"] = int(time.time())
+                    futures.append(guardian.worker_pool.submit(structure["name"], guardian.process_prepared_structure,
+                                                               structure, structures_usages[structure["name"]],
+                                                               limits_resources, rules, triggered_events))
+
+        for structure in remaining_structures:
+            futures.append(guardian.worker_pool.submit(structure["name"], guardian.serverless, structure, rules,
+                                                       structures_usages.get(structure["name"]),
+                                                       structures_limits.get(structure["name"])))
+
+        late_structures = guardian.worker_pool.join(futures, guardian.structure_deadline, guardian.debug)
+        if late_structures:
+            log_warning("{0} structures exceeded the deadline of {1} seconds: {2}".format(
+                len(late_structures), guardian.structure_deadline, str(late_structures)), guardian.debug)
+
+        guardian.flush_epoch_writes()
@@ -0,0 +1,461 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import print_function
+
+import argparse
+import bisect
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+import src.Guardian.Guardian as guardian_module
+import src.Guardian.EventStore as event_store_module
+import src.Guardian.ProcessGuardian as process_guardian_module
+import src.StateDatabase.opentsdb as opentsdb_module
+from src.Guardian.Guardian import Guardian, CONFIG_DEFAULT_VALUES
+from src.MyUtils.MyUtils import MyConfig, get_structures
+from src.MyUtils.WorkerPool import WorkerPool
+from src.StateDatabase.opentsdb import OpenTSDBServer
+
+SCENARIO_FILES = ["structures", "limits", "rules", "usages", "config"]
+
+# The Guardian is replayed without output, unless the scenario configuration says otherwise
+REPLAY_CONFIG_DEFAULT_VALUES = dict(CONFIG_DEFAULT_VALUES, DEBUG=False)
+
+
+class VirtualClock:
+    """Clock that replaces the 'time' module of the Guardian modules during a replay, so that events, requests and
+    usage windows are computed at the recorded times, while any other use of 'time' is left untouched."""
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def set(self, now):
+        self.now = now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    @contextmanager
+    def patch(self, modules=(guardian_module, event_store_module, process_guardian_module, opentsdb_module)):
+        for module in modules:
+            module.time = self
+        try:
+            yield self
+        finally:
+            for module in modules:
+                module.time = time
+
+
+class InMemoryCouchDBServer:
+    """
+    Stand-in for the CouchDBServer class that keeps the documents in memory. Only the operations used by the Guardian
+    are implemented. Documents are copied when stored and retrieved, as it would happen with a remote database.
+    """
+
+    def __init__(self, structures=None, limits=None, rules=None):
+        self.server = "memory"
+        self.__next_id = 0
+        self.structures = [self.__new_doc(d) for d in structures or []]
+        self.limits = dict()
+        for limit in limits or []:
+            self.limits.setdefault(limit["name"], self.__new_doc(limit))
+        self.rules = [self.__new_doc(d) for d in rules or []]
+        self.events = dict()
+        self.requests = list()
+
+    def __new_doc(self, doc):
+        doc = copy.deepcopy(doc)
+        self.__next_id += 1
+        doc.setdefault("_id", "doc{0}".format(self.__next_id))
+        doc["_rev"] = "1"
+        return doc
+
+    # STRUCTURES #
+    def get_structures(self, subtype=None):
+        return [copy.deepcopy(s) for s in self.structures if subtype is None or s["subtype"] == subtype]
+
+    # EVENTS #
+    def add_events(self, events):
+        for event in events:
+            self.events.setdefault(event["structure"], list()).append(self.__new_doc(event))
+
+    def get_events(self, structure):
+        return copy.deepcopy(self.events.get(structure["name"], list()))
+
+    def get_all_events(self):
+        return [copy.deepcopy(event) for events in self.events.values() for event in events]
+
+    def delete_events(self, events):
+        ids = set(event["_id"] for event in events)
+        for structure in set(event["structure"] for event in events):
+            self.events[structure] = [e for e in self.events.get(structure, list()) if e["_id"] not in ids]
+
+    def delete_num_events_by_structure(self, structure, event_name, event_num):
+        events = [e for e in self.events.get(structure["name"], list()) if e["name"] == event_name]
+        self.delete_events(events[0:event_num])
+
+    # LIMITS #
+    def get_limits(self, structure):
+        if structure["name"] not in self.limits:
+            raise ValueError("Structure with name {0} has no limits".format(structure["name"]))
+        return copy.deepcopy(self.limits[structure["name"]])
+
+    def get_limits_by_names(self, structure_names):
+        return [copy.deepcopy(self.limits[name]) for name in structure_names if name in self.limits]
+
+    def update_limit(self, limit):
+        limit = copy.deepcopy(limit)
+        limit["_rev"] = str(int(limit.get("_rev", "0")) + 1)
+        self.limits[limit["name"]] = limit
+        return True
+
+    def update_limits(self, limits):
+        for limit in limits:
+            self.update_limit(limit)
+        return True
+
+    # REQUESTS #
+    def add_requests(self, reqs):
+        self.requests += [self.__new_doc(r) for r in reqs]
+
+    def get_requests(self, structure=None):
+        return [copy.deepcopy(r) for r in self.requests if structure is None or r["structure"] == structure["name"]]
+
+    def pop_requests(self):
+        requests, self.requests = self.requests, list()
+        return requests
+
+    # RULES #
+    def get_rules(self):
+        return copy.deepcopy(self.rules)
+
+
+class InMemoryOpenTSDBServer(OpenTSDBServer):
+    """
+    Stand-in for the OpenTSDBServer class that answers the queries from recorded time series. Only the features of
+    the query API used by the Guardian are implemented: tags and 'literal_or' filters, average downsampling and the
+    'zimsum' aggregation.
+    """
+
+    def __init__(self, series):
+        """
+        Args:
+            series (list): The recorded time series, in the same format as returned by the OpenTSDB query API,
+            i.e., dictionaries with the 'metric', 'tags' and 'dps' keys
+        """
+        self.server = "memory"
+        self.series = dict()
+        for serie in series:
+            points = sorted((int(ts), value) for ts, value in serie["dps"].items())
+            for tagk, tagv in serie["tags"].items():
+                self.series[(serie["metric"], tagk, tagv)] = ([p[0] for p in points], [p[1] for p in points])
+
+    def close_connection(self):
+        pass
+
+    def send_json_documents(self, json_documents):
+        return True, {}
+
+    def __downsample(self, key, start, end, interval):
+        if key not in self.series:
+            return dict()
+        timestamps, values = self.series[key]
+        i, j = bisect.bisect_left(timestamps, start), bisect.bisect_right(timestamps, end)
+        buckets = dict()
+        for ts, value in zip(timestamps[i:j], values[i:j]):
+            buckets.setdefault(ts - ts % interval, list()).append(value)
+        return {bucket: sum(points) / len(points) for bucket, points in buckets.items()}
+
+    def get_points(self, query, tries=3):
+        result = list()
+        for subquery in query["queries"]:
+            metric = subquery["metric"]
+            interval = int(subquery["downsample"].split("s-")[0])
+            if "filters" in subquery:
+                structures_filter = subquery["filters"][0]
+                tagk, tag_values = structures_filter["tagk"], structures_filter["filter"].split("|")
+                group_by = structures_filter.get("groupBy", False)
+            else:
+                (tagk, tag_value), = subquery["tags"].items()
+                tag_values, group_by = [tag_value], False
+
+            groups = dict()
+            for tag_value in tag_values:
+                dps = self.__downsample((metric, tagk, tag_value), query["start"], query["end"], interval)
+                if dps:
+                    group = groups.setdefault(tag_value if group_by else tuple(tag_values), dict())
+                    for bucket, value in dps.items():
+                        group[bucket] = group.get(bucket, 0) + value
+
+            for group, dps in groups.items():
+                tags = {tagk: group} if group_by else {}
+                result.append(dict(metric=metric, tags=tags, dps={str(ts): dps[ts] for ts in sorted(dps)}))
+        return result
+
+
+def load_scenario(scenario_path):
+    """Load a scenario from a directory with the 'structures.json', 'limits.json', 'rules.json', 'usages.json' and,
+    optionally, 'config.json' files.
+
+    Args:
+        scenario_path (string): The path of the scenario directory
+
+    Returns:
+        (dict) The scenario documents indexed by file name
+    """
+    scenario = dict()
+    for name in SCENARIO_FILES:
+        file_path = os.path.join(scenario_path, name + ".json")
+        if os.path.exists(file_path):
+            with open(file_path, "r") as f:
+                scenario[name] = json.load(f)
+        elif name == "config":
+            scenario[name] = dict()
+        else:
+            raise ValueError("Scenario file {0} is missing".format(file_path))
+    return scenario
+
+
+def save_scenario(scenario, scenario_path):
+    os.makedirs(scenario_path, exist_ok=True)
+    for name in SCENARIO_FILES:
+        with open(os.path.join(scenario_path, name + ".json"), "w") as f:
+            json.dump(scenario[name], f)
+
+
+def generate_scenario(num_structures, num_epochs, window=10, seed=0):
+    """Generate a synthetic scenario of containers guarded on CPU and memory, with the default rules and usages that
+    randomly move between underuse and bottlenecks.
+
+    Args:
+        num_structures (integer): The number of containers
+        num_epochs (integer): The number of epochs covered by the usage series
+        window (integer): The time window of each epoch, in seconds
+        seed (integer): The seed of the random generator, so that scenarios can be regenerated
+
+    Returns:
+        (dict) The scenario documents
+    """
+    import conf.StateDatabase.rules as default_rules
+
+    rnd = random.Random(seed)
+    rules = [copy.deepcopy(r) for r in [default_rules.cpu_exceeded_upper, default_rules.cpu_dropped_lower,
+                                        default_rules.CpuRescaleUp, default_rules.CpuRescaleDown,
+                                        default_rules.mem_exceeded_upper, default_rules.mem_dropped_lower,
+                                        default_rules.MemRescaleUp, default_rules.MemRescaleDown]]
+    structures, limits, usages = list(), list(), list()
+    start = 1000000000
+    for i in range(num_structures):
+        name = "node{0}".format(i)
+        structures.append(dict(type="structure", subtype="container", name=name, guard=True, host="host{0}".format(i // 32),
+                               host_rescaler_ip="host{0}".format(i // 32), host_rescaler_port="8000",
+                               resources=dict(cpu=dict(max=400, min=50, current=200, guard=True),
+                                              mem=dict(max=8192, min=256, current=4096, guard=True))))
+        limits.append(dict(type="limit", name=name, resources=dict(cpu=dict(upper=150, lower=100, boundary=25),
+                                                                   mem=dict(upper=3072, lower=2048, boundary=512))))
+        series = {"proc.cpu.user": dict(), "proc.cpu.kernel": dict(), "proc.mem.resident": dict()}
+        level = rnd.random()
+        for ts in range(start, start + num_epochs * window, 5):
+            level = min(1.0, max(0.05, level + rnd.uniform(-0.1, 0.1)))
+            series["proc.cpu.user"][str(ts)] = round(level * 180, 2)
+            series["proc.cpu.kernel"][str(ts)] = round(level * 20, 2)
+            series["proc.mem.resident"][str(ts)] = round(level * 4000, 2)
+        for metric, dps in series.items():
+            usages.append(dict(metric=metric, tags=dict(host=name), dps=dps))
+
+    config = dict(WINDOW_TIMELAPSE=window, WINDOW_DELAY=10, EVENT_TIMEOUT=60, GUARDABLE_RESOURCES=["cpu", "mem"])
+    return dict(structures=structures, limits=limits, rules=rules, usages=usages, config=config)
+
+
+def get_decisions_digest(epochs_decisions):
+    """Hash the decisions taken in each epoch so that replays can be compared across versions. The decisions are
+    canonicalized (sorted and without database identifiers) as their order depends on the concurrency."""
+    digest = hashlib.sha256()
+    for epoch_decisions in epochs_decisions:
+        for kind in sorted(epoch_decisions):
+            docs = [{k: v for k, v in doc.items() if k not in ["_id", "_rev"]} for doc in epoch_decisions[kind]]
+            for line in sorted(json.dumps(doc, sort_keys=True) for doc in docs):
+                digest.update(kind.encode())
+                digest.update(line.encode())
+        digest.update(b"epoch")
+    return digest.hexdigest()
+
+
+class GuardianReplay:
+    """
+    Replay of a scenario through the Guardian, with the databases replaced by in-memory stand-ins and the time by a
+    virtual clock, so that the decisions are deterministic. The Scaler is not simulated, the requests generated in
+    each epoch are just collected and removed.
+    """
+
+    def __init__(self, scenario, config=None):
+        self.couchdb = InMemoryCouchDBServer(scenario["structures"], scenario["limits"], scenario["rules"])
+        self.opentsdb = InMemoryOpenTSDBServer(scenario["usages"])
+
+        self.guardian = Guardian()
+        self.guardian.couchdb_handler = self.couchdb
+        self.guardian.opentsdb_handler = self.opentsdb
+
+        self.config = MyConfig(REPLAY_CONFIG_DEFAULT_VALUES)
+        self.config.set_config(dict(scenario.get("config", dict()), **(config or dict())))
+        self.guardian.set_config(self.config)
+        invalid, message = self.guardian.invalid_conf()
+        if invalid:
+            raise ValueError(message)
+        if self.guardian.engine not in ["threads", "processes"]:
+            raise ValueError("Only the 'threads' and 'processes' engines can be replayed, as the asyncio engine needs HTTP servers")
+
+        timestamps = [int(ts) for serie in scenario["usages"] for ts in serie["dps"]]
+        window = self.guardian.window_difference
+        # The first epoch is the first one with a full time window of data
+        self.start = min(timestamps) + window + self.guardian.window_delay if timestamps else 0
+        self.num_epochs = max(0, (max(timestamps) + self.guardian.window_delay - self.start) // window + 1) if timestamps else 0
+        self.clock = VirtualClock(self.start)
+
+    def run(self, num_epochs=None):
+        """Replay the scenario.
+
+        Args:
+            num_epochs (integer): The number of epochs to replay, by default those covered by the usage series
+
+        Returns:
+            (dict) The report with the decisions per second, the epoch latencies, the counts of events and requests,
+            the generated requests and the digest of all the decisions
+        """
+        guardian = self.guardian
+        num_epochs = self.num_epochs if num_epochs is None else num_epochs
+        guardian.worker_pool = WorkerPool(guardian.max_workers, name="replay_worker")
+        guard_structures = guardian.get_guard_structures_function()
+        epochs_decisions, latencies, all_requests = list(), list(), list()
+        num_decisions, num_events = 0, 0
+        try:
+            with self.clock.patch():
+                guardian.set_event_store(guardian.use_event_store)
+                for epoch in range(num_epochs):
+                    self.clock.set(self.start + epoch * guardian.window_difference)
+                    structures = get_structures(self.couchdb, guardian.debug, subtype=guardian.structure_guarded)
+                    if structures:
+                        structures = guardian.get_due_structures(structures)
+                    events_before = guardian.metrics.counters.get("events_total", {}).get(tuple(), 0)
+
+                    t0 = time.perf_counter()
+                    if structures:
+                        guard_structures(structures)
+                    latencies.append(time.perf_counter() - t0)
+
+                    requests = self.couchdb.pop_requests()
+                    all_requests += requests
+                    num_decisions += len(structures or [])
+                    num_events += guardian.metrics.counters.get("events_total", {}).get(tuple(), 0) - events_before
+                    events = guardian.event_store.get_all_events() if guardian.event_store else self.couchdb.get_all_events()
+                    epochs_decisions.append(dict(requests=requests, events=events,
+                                                 limits=list(copy.deepcopy(self.couchdb.limits).values())))
+        finally:
+            guardian.worker_pool.shutdown()
+            if guardian.process_engine is not None:
+                guardian.process_engine.shutdown()
+
+        total_time = sum(latencies)
+        sorted_latencies = sorted(latencies)
+        return dict(
+            epochs=num_epochs,
+            decisions=num_decisions,
+            decisions_per_second=num_decisions / total_time if total_time > 0 else 0,
+            epoch_latency=dict(
+                avg=total_time / num_epochs if num_epochs else 0,
+                p50=sorted_latencies[len(sorted_latencies) // 2] if latencies else 0,
+                p95=sorted_latencies[int(len(sorted_latencies) * 0.95)] if latencies else 0,
+                max=sorted_latencies[-1] if latencies else 0),
+            events=num_events,
+            requests=all_requests,
+            digest=get_decisions_digest(epochs_decisions))
+
+
+def parse_config_overrides(items):
+    config = dict()
+    for item in items or []:
+        key, value = item.split("=", 1)
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded scenario through the Guardian, without databases")
+    parser.add_argument("scenario", help="Directory with the scenario files")
+    parser.add_argument("--epochs", type=int, default=None, help="Number of epochs to replay")
+    parser.add_argument("--config", nargs="*", metavar="KEY=VALUE", help="Guardian configuration overrides")
+    parser.add_argument("--generate", type=int, metavar="STRUCTURES", default=None,
+                        help="Generate a synthetic scenario with this number of structures in the scenario directory")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic scenario")
+    parser.add_argument("--expected-digest", default=None, help="Fail if the decisions digest differs from this one")
+    parser.add_argument("--requests", default=None, help="File where the generated requests are saved")
+    args = parser.parse_args()
+    logging.basicConfig(filename="guardian_replay.log", level=logging.INFO)
+
+    if args.generate is not None:
+        save_scenario(generate_scenario(args.generate, args.epochs or 30, seed=args.seed), args.scenario)
+        print("Generated a scenario with {0} structures in {1}".format(args.generate, args.scenario))
+
+    replay = GuardianReplay(load_scenario(args.scenario), parse_config_overrides(args.config))
+    report = replay.run(args.epochs)
+
+    if args.requests:
+        with open(args.requests, "w") as f:
+            json.dump(report["requests"], f, indent=2)
+
+    latency = report["epoch_latency"]
+    print("Epochs:               {0}".format(report["epochs"]))
+    print("Decisions:            {0} ({1:.1f} decisions/s)".format(report["decisions"], report["decisions_per_second"]))
+    print("Epoch latency (s):    avg {0:.3f}, p50 {1:.3f}, p95 {2:.3f}, max {3:.3f}".format(
+        latency["avg"], latency["p50"], latency["p95"], latency["max"]))
+    print("Events:               {0}".format(report["events"]))
+    print("Requests:             {0}".format(len(report["requests"])))
+    print("Decisions digest:     {0}".format(report["digest"]))
+
+    if args.expected_digest and args.expected_digest != report["digest"]:
+        print("Decisions differ from the expected ones")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import operator
+
+import numpy as np
+
+# Integers beyond this value can't be exactly represented as 64-bit floats, so they are not compared as arrays
+MAX_EXACT_INTEGER = 2 ** 53
+
+ARRAY_COMPARISONS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+def _is_number(value):
+    return type(value) is float or (type(value) is int and abs(value) <= MAX_EXACT_INTEGER)
+
+
+def _parse_operand(operand):
+    """Parse a comparison operand, which can be either a number or a variable with a plain path (e.g.,
+    {"var": "cpu.structure.cpu.usage"}).
+
+    Returns:
+        (tuple) ('var', path keys) or ('value', number), or None if the operand can't be vectorized
+    """
+    if _is_number(operand):
+        return "value", operand
+    if isinstance(operand, dict) and len(operand) == 1 and "var" in operand:
+        var_name = operand["var"]
+        if isinstance(var_name, (list, tuple)):
+            # Variables with a default value are not supported
+            if len(var_name) != 1:
+                return None
+            var_name = var_name[0]
+        if isinstance(var_name, str) and var_name:
+            return "var", tuple(var_name.split("."))
+    return None
+
+
+def _parse_comparison(logic):
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return None
+    op, values = next(iter(logic.items()))
+    if op not in ARRAY_COMPARISONS or not isinstance(values, (list, tuple)) or len(values) != 2:
+        return None
+    left, right = _parse_operand(values[0]), _parse_operand(values[1])
+    if left is None or right is None:
+        return None
+    return op, left, right
+
+
+def _get_value(data, keys):
+    for key in keys:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+class VectorizedRule:
+    """
+    Rule made only of numeric comparisons between variables and constants, joined by 'and' (e.g., the default
+    'cpu_exceeded_upper' rule), that can be evaluated for many structures at once with array operations.
+    """
+
+    def __init__(self, comparisons):
+        self.comparisons = comparisons
+        self.variables = list()
+        for _, left, right in comparisons:
+            for kind, value in (left, right):
+                if kind == "var" and value not in self.variables:
+                    self.variables.append(value)
+
+    def evaluate(self, structures_data):
+        """Evaluate the rule for the data of several structures.
+
+        Args:
+            structures_data (list): The data dictionaries of the structures, as used to evaluate the JsonLogic rules
+
+        Returns:
+            (tuple) An array with the result of the rule for each structure, and an array stating for which
+            structures the result is valid. The rule can't be evaluated as an array for structures whose
+            variables are missing or aren't numbers, as the JsonLogic comparison semantics then differ
+        """
+        num_structures = len(structures_data)
+        evaluable = np.ones(num_structures, dtype=bool)
+        columns = dict()
+        for keys in self.variables:
+            column = np.empty(num_structures, dtype=np.float64)
+            for i, data in enumerate(structures_data):
+                value = _get_value(data, keys)
+                if _is_number(value):
+                    column[i] = value
+                else:
+                    column[i] = np.nan
+                    evaluable[i] = False
+            columns[keys] = column
+
+        results = np.ones(num_structures, dtype=bool)
+        for op, (left_kind, left), (right_kind, right) in self.comparisons:
+            left_values = columns[left] if left_kind == "var" else left
+            right_values = columns[right] if right_kind == "var" else right
+            results &= ARRAY_COMPARISONS[op](left_values, right_values)
+
+        return results & evaluable, evaluable
+
+
+def vectorize_rule(rule):
+    """Get the vectorized version of a rule, if it is made only of numeric comparisons joined by 'and'.
+
+    Args:
+        rule (dict): The rule document
+
+    Returns:
+        (VectorizedRule) The vectorized rule, or None if the rule has to be evaluated with JsonLogic
+    """
+    logic = rule.get("rule")
+    if isinstance(logic, dict) and len(logic) == 1 and "and" in logic:
+        subrules = logic["and"]
+        if not isinstance(subrules, (list, tuple)) or not subrules:
+            return None
+    else:
+        subrules = [logic]
+
+    comparisons = list()
+    for subrule in subrules:
+        comparison = _parse_comparison(subrule)
+        if comparison is None:
+            return None
+        comparisons.append(comparison)
+    return VectorizedRule(comparisons)
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import heapq
+from threading import Lock
+
+
+class StructureScheduler:
+    """
+    Scheduler of the epochs in which each structure is guarded. Structures whose usages stay well inside their limits
+    and barely change are considered stable, and their guarding interval is doubled every time they are found stable,
+    up to a maximum. Any other structure, as well as the new ones, are guarded on every epoch. The structures are kept
+    in a priority queue by the epoch in which they are due next.
+    """
+
+    def __init__(self, stable_margin=0.25, stable_change=0.1):
+        self.stable_margin = stable_margin
+        self.stable_change = stable_change
+        self.epoch = 0
+        self.__queue = list()  # (due epoch, structure name), including outdated entries that are skipped when popped
+        self.__due_epochs = dict()  # structure name -> due epoch
+        self.__intervals = dict()  # structure name -> current interval in epochs
+        self.__last_usages = dict()  # structure name -> resource -> usage
+        self.__lock = Lock()
+
+    def __push(self, structure_name, due_epoch):
+        self.__due_epochs[structure_name] = due_epoch
+        heapq.heappush(self.__queue, (due_epoch, structure_name))
+
+    def get_due_structures(self, structures):
+        """Start a new epoch and get the structures that have to be guarded in it
+
+        Args:
+            structures (list): All the structures that can be guarded
+
+        Returns:
+            (list) The structures due in this epoch, keeping their order
+        """
+        with self.__lock:
+            self.epoch += 1
+            names = set(structure["name"] for structure in structures)
+
+            # Forget the structures that are no longer guarded, their outdated entries are skipped when popped
+            for structure_name in list(self.__due_epochs.keys()):
+                if structure_name not in names:
+                    del self.__due_epochs[structure_name]
+                    self.__intervals.pop(structure_name, None)
+                    self.__last_usages.pop(structure_name, None)
+
+            due_names = set()
+            while self.__queue and self.__queue[0][0] <= self.epoch:
+                due_epoch, structure_name = heapq.heappop(self.__queue)
+                if self.__due_epochs.get(structure_name) == due_epoch:
+                    due_names.add(structure_name)
+
+            if len(self.__queue) > 2 * len(self.__due_epochs):
+                self.__queue = [(e, n) for n, e in self.__due_epochs.items() if n not in due_names]
+                heapq.heapify(self.__queue)
+
+            due_structures = list()
+            for structure in structures:
+                if structure["name"] in due_names or structure["name"] not in self.__due_epochs:
+                    due_structures.append(structure)
+                    # Guard it again in the next epoch unless it is rescheduled once guarded
+                    self.__push(structure["name"], self.epoch + 1)
+            return due_structures
+
+    def is_stable(self, structure_name, resources_usages):
+        """Check whether the usages of a structure are stable, that is, they are far enough from both limits and have
+        changed little since the last time. The usages are kept to be compared with the next ones.
+
+        Args:
+            structure_name (string): The name of the structure
+            resources_usages (dict): The usage, lower and upper limit values of each guarded resource
+
+        Returns:
+            (boolean) Whether the structure is stable
+        """
+        with self.__lock:
+            last_usages = self.__last_usages.get(structure_name, dict())
+            self.__last_usages[structure_name] = {resource: values[0] for resource, values in resources_usages.items()}
+
+        if not resources_usages:
+            return False
+
+        for resource, (usage, lower, upper) in resources_usages.items():
+            limits_range = upper - lower
+            if limits_range <= 0 or resource not in last_usages:
+                return False
+            if min(usage - lower, upper - usage) < self.stable_margin * limits_range:
+                return False
+            if abs(usage - last_usages[resource]) > self.stable_change * limits_range:
+                return False
+        return True
+
+    def reschedule(self, structure_name, stable, max_interval):
+        """Set the next epoch in which a structure is guarded, doubling its interval if it is stable
+
+        Args:
+            structure_name (string): The name of the structure
+            stable (boolean): Whether the structure is stable
+            max_interval (integer): The maximum number of epochs between guarding a structure
+        """
+        with self.__lock:
+            if structure_name not in self.__due_epochs:
+                return
+            interval = min(self.__intervals.get(structure_name, 1) * 2, max_interval) if stable else 1
+            self.__intervals[structure_name] = interval
+            self.__push(structure_name, self.epoch + interval)
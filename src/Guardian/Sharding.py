@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import bisect
+import hashlib
+import time
+
+
+def get_hash(key):
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """
+    Consistent hashing ring used to split the structures between the instances of a service. Every member is placed
+    on the ring several times (virtual nodes) so that the structures are evenly split, and when a member joins or
+    leaves only the structures of its part of the ring are reassigned.
+    """
+
+    def __init__(self, members, virtual_nodes=100):
+        self.members = sorted(members)
+        self.virtual_nodes = virtual_nodes
+        self.__hashes = list()
+        self.__owners = list()
+        points = list()
+        for member in self.members:
+            for i in range(virtual_nodes):
+                points.append((get_hash("{0}#{1}".format(member, i)), member))
+        points.sort()
+        for point_hash, member in points:
+            self.__hashes.append(point_hash)
+            self.__owners.append(member)
+
+    def get_owner(self, key):
+        """Get the member that owns a key, that is, the first member found clockwise from the key hash
+
+        Args:
+            key (string): The key (e.g., a structure name)
+
+        Returns:
+            (string) The owner member, or None if the ring has no members
+        """
+        if not self.__hashes:
+            return None
+        index = bisect.bisect(self.__hashes, get_hash(key)) % len(self.__hashes)
+        return self.__owners[index]
+
+
+def get_alive_members(services, group_name, timeout):
+    """Get the members of a group of service instances whose heartbeat is recent enough
+
+    Args:
+        services (list): The 'service' documents
+        group_name (string): The name of the service (e.g., guardian) whose instances are looked for
+        timeout (integer): Maximum time in seconds since the last heartbeat of a member to consider it alive
+
+    Returns:
+        (list) The sorted names of the alive members
+    """
+    oldest_heartbeat = time.time() - timeout
+    members = list()
+    for service in services:
+        if service.get("member_of") != group_name:
+            continue
+        heartbeat = service.get("heartbeat")
+        if isinstance(heartbeat, (int, float)) and heartbeat >= oldest_heartbeat:
+            members.append(service["name"])
+    return sorted(members)
+
+
+def beat_member(db_handler, member_name, group_name):
+    """Write the heartbeat of a member of a group of service instances, registering it if it is not yet
+
+    Args:
+        db_handler (CouchDBServer): The handler of the 'services' database
+        member_name (string): The name of this instance (e.g., guardian@host0)
+        group_name (string): The name of the service (e.g., guardian)
+    """
+    try:
+        service = db_handler.get_service(member_name)
+    except ValueError:
+        service = dict(name=member_name, type="service", member_of=group_name, config=dict())
+    service["heartbeat_human"] = time.strftime("%D %H:%M:%S", time.localtime())
+    service["heartbeat"] = time.time()
+    if "_id" in service:
+        db_handler.update_service(service)
+    else:
+        db_handler.add_service(service)
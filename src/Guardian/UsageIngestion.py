@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import gzip
+import json
+import socket
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+from src.StateDatabase.opentsdb import OpenTSDBServer
+
+
+class UsageWindows:
+    """
+    In-memory sliding windows of the metric samples pushed by the agents, kept for every structure (i.e., every value
+    of the tags that identify structures) and metric. The usages are computed as OpenTSDB does for the Guardian
+    queries, downsampling every series with the average and adding up the series of a structure, so that they can be
+    used in place of the ones retrieved from OpenTSDB but without any delay.
+    """
+
+    def __init__(self, tags=("host", "structure"), max_age=60, downsample=5):
+        self.tags = tags
+        self.max_age = max_age
+        self.downsample = downsample
+        self.__windows = dict()  # (tag, structure name) -> metric -> deque of (timestamp, series, value)
+        self.__lock = Lock()
+
+    def add_samples(self, samples):
+        """Add samples in the OpenTSDB format, that is, dictionaries with the 'metric', 'timestamp' (in seconds or
+        milliseconds), 'value' and 'tags' keys. Samples without any of the tags that identify structures are ignored.
+
+        Args:
+            samples (list): The samples
+        """
+        with self.__lock:
+            for sample in samples:
+                timestamp = float(sample["timestamp"])
+                if timestamp > 1e10:
+                    timestamp /= 1000
+                tags = sample.get("tags", dict())
+                series = tuple(sorted(tags.items()))
+                for tag in self.tags:
+                    if tag in tags:
+                        window = self.__windows.setdefault((tag, tags[tag]), dict()).setdefault(sample["metric"], deque())
+                        window.append((timestamp, series, float(sample["value"])))
+
+    def expire(self):
+        """Remove the samples older than the maximum age, and the structures that have no samples left"""
+        oldest_timestamp = time.time() - self.max_age
+        with self.__lock:
+            for key in list(self.__windows.keys()):
+                metrics = self.__windows[key]
+                for metric in list(metrics.keys()):
+                    window = metrics[metric]
+                    while window and window[0][0] < oldest_timestamp:
+                        window.popleft()
+                    if not window:
+                        del metrics[metric]
+                if not metrics:
+                    del self.__windows[key]
+
+    def has_samples(self, tag, structure_name, metrics=None):
+        """Check whether a structure has pushed samples, of all the given metrics if any"""
+        with self.__lock:
+            structure_metrics = self.__windows.get((tag, structure_name))
+            if not structure_metrics:
+                return False
+            return metrics is None or all(metric in structure_metrics for metric in metrics)
+
+    def __get_dps(self, window, start, end):
+        # Average the values of each series by downsampling interval, then add up the series
+        buckets = dict()
+        for timestamp, series, value in window:
+            if start <= timestamp <= end:
+                bucket = int(timestamp // self.downsample) * self.downsample
+                buckets.setdefault(bucket, dict()).setdefault(series, list()).append(value)
+        return {bucket: sum(sum(values) / len(values) for values in series_values.values())
+                for bucket, series_values in buckets.items()}
+
+    def get_usages(self, tag, structure_names, window_difference, retrieve_metrics, generate_metrics):
+        """Get the usages of several structures in the last time window, with the same output as
+        OpenTSDBServer.get_structures_timeseries.
+
+        Args:
+            tag (string): The tag that identifies the structures (e.g., 'host' for containers)
+            structure_names (list): The names of the structures
+            window_difference (integer): The length in seconds of the time window
+            retrieve_metrics (list): The metrics pushed by the agents
+            generate_metrics (dict): The metrics to generate from the pushed ones
+
+        Returns:
+            (dict) A dictionary with the final usage values of each structure, indexed by structure name
+        """
+        end = time.time()
+        start = end - window_difference
+        result = list()
+        with self.__lock:
+            for name in structure_names:
+                metrics = self.__windows.get((tag, name), dict())
+                for metric in retrieve_metrics:
+                    if metric in metrics:
+                        result.append(dict(metric=metric, tags={tag: name}, dps=self.__get_dps(metrics[metric], start, end)))
+        return OpenTSDBServer.parse_structures_result(tag, structure_names, result, retrieve_metrics, generate_metrics)
+
+
+def parse_put_line(line):
+    """Parse a sample in the OpenTSDB telnet line format: put <metric> <timestamp> <value> <tagk=tagv> ..."""
+    fields = line.split()
+    if len(fields) < 4 or fields[0] != "put":
+        raise ValueError("Invalid line '{0}'".format(line))
+    tags = dict(field.split("=", 1) for field in fields[4:])
+    return dict(metric=fields[1], timestamp=float(fields[2]), value=float(fields[3]), tags=tags)
+
+
+class UsageIngestionServer:
+    """
+    Server where the agents push their samples, either to the HTTP '/api/put' endpoint with the same JSON format as
+    OpenTSDB (optionally gzipped) or as UDP datagrams with one sample per line in the OpenTSDB telnet format. A port
+    of 0 disables the corresponding server.
+    """
+
+    def __init__(self, windows, http_port=0, udp_port=0, address="0.0.0.0"):
+        self.windows = windows
+        self.http_port = http_port
+        self.udp_port = udp_port
+        self.http_server = None
+        self.udp_socket = None
+        self.threads = list()
+        usage_windows = windows
+
+        class IngestionRequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?")[0] != "/api/put":
+                    self.send_error(404)
+                    return
+                try:
+                    body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        body = gzip.decompress(body)
+                    samples = json.loads(body)
+                    usage_windows.add_samples(samples if isinstance(samples, list) else [samples])
+                except (ValueError, KeyError, TypeError, OSError) as e:
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                # Avoid logging every push
+                pass
+
+        if http_port:
+            self.http_server = ThreadingHTTPServer((address, http_port), IngestionRequestHandler)
+            self.http_server.daemon_threads = True
+            self.threads.append(Thread(name="ingestion_http_server", target=self.http_server.serve_forever, daemon=True))
+        if udp_port:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_socket.bind((address, udp_port))
+            self.threads.append(Thread(name="ingestion_udp_server", target=self.__receive_datagrams, daemon=True))
+
+    def __receive_datagrams(self):
+        while True:
+            try:
+                data = self.udp_socket.recv(65535)
+            except OSError:
+                # The socket has been closed
+                return
+            samples = list()
+            for line in data.decode(errors="ignore").splitlines():
+                try:
+                    samples.append(parse_put_line(line))
+                except ValueError:
+                    continue
+            self.windows.add_samples(samples)
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        if self.http_server:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+        if self.udp_socket:
+            self.udp_socket.close()
@@ -0,0 +1,225 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import asyncio
+import copy
+import socket
+import threading
+import time
+from unittest import TestCase
+
+from src.test.documents.rules import cpu_exceeded_upper, cpu_dropped_lower, CpuRescaleUp, CpuRescaleDown
+from src.Guardian import Guardian
+from src.Guardian import AsyncGuardian
+from src.Guardian.AsyncGuardian import AsyncGuardianEngine
+from src.StateDatabase.async_opentsdb import AsyncOpenTSDBServer
+
+
+class CouchDBStub:
+    def __init__(self):
+        self.events = list()
+        self.requests = list()
+        self.limits = dict()
+
+    def add_events(self, events):
+        self.events += copy.deepcopy(events)
+
+    def get_events(self, structure):
+        return [event for event in self.events if event["structure"] == structure["name"]]
+
+    def delete_events(self, events):
+        for event in events:
+            self.events.remove(event)
+
+    def delete_num_events_by_structure(self, structure, event_name, event_num):
+        events = [event for event in self.get_events(structure) if event["name"] == event_name]
+        self.delete_events(events[0:event_num])
+
+    def update_limits(self, limits):
+        for limit in limits:
+            self.limits[limit["name"]] = copy.deepcopy(limit)
+
+    def add_requests(self, requests):
+        self.requests += copy.deepcopy(requests)
+
+
+class AsyncCouchDBStub:
+    def __init__(self, couchdb):
+        self.couchdb = couchdb
+
+    def __getattr__(self, name):
+        method = getattr(self.couchdb, name)
+
+        async def async_method(*args):
+            return method(*args)
+        return async_method
+
+
+class AsyncResponseStub:
+    def __init__(self, status, text):
+        self.status, self.__text = status, text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def text(self):
+        return self.__text
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise ValueError("HTTP error {0}".format(self.status))
+
+
+class AsyncSessionStub:
+    def __init__(self, status, text):
+        self.status, self.text = status, text
+
+    def post(self, url, data=None, headers=None):
+        return AsyncResponseStub(self.status, self.text)
+
+
+class AsyncGuardianEngineTest(TestCase):
+
+    def setUp(self):
+        self.guardian = Guardian.Guardian()
+        self.guardian.debug = False
+        self.guardian.guardable_resources = ["cpu"]
+        self.guardian.event_timeout = 1000
+        self.guardian.use_energy_model = False
+        self.guardian.forecast_alpha = 0.5
+        self.guardian.forecast_beta = 0.3
+        self.guardian.forecast_horizon = 3
+        self.guardian.adaptive_scheduling = False
+
+    def test_same_decisions_as_threads_engine(self):
+        def get_structure(name, current):
+            return {"name": name, "host": "host0", "host_rescaler_ip": "host0", "host_rescaler_port": 8000, "subtype": "container", "guard": True,
+                    "resources": {"cpu": {"guard": True, "current": current, "max": 400, "min": 50}}}
+
+        def get_limits(name):
+            return {"name": name, "type": "limit", "resources": {"cpu": {"upper": 120, "lower": 80, "boundary": 20}}}
+
+        rules = list()
+        for rule in [cpu_exceeded_upper, cpu_dropped_lower, CpuRescaleUp, CpuRescaleDown]:
+            rule = copy.deepcopy(rule)
+            rule["active"] = True
+            if rule["generates"] == "requests":
+                rule["rescale_policy"] = "amount" if rule["name"] == "CpuRescaleUp" else "fit_to_usage"
+                rule["rescale_type"] = "up" if rule["name"] == "CpuRescaleUp" else "down"
+            rules.append(rule)
+
+        # One structure over its upper limit, one under its lower limit and one with an invalid limits chain
+        structures = [get_structure("node0", 140), get_structure("node1", 140), get_structure("node2", 100)]
+        usages = {"node0": {"structure.cpu.usage": 130, "structure.cpu.user": 100, "structure.cpu.kernel": 30},
+                  "node1": {"structure.cpu.usage": 20, "structure.cpu.user": 15, "structure.cpu.kernel": 5},
+                  "node2": {"structure.cpu.usage": 90, "structure.cpu.user": 80, "structure.cpu.kernel": 10}}
+
+        def run_threads_engine():
+            couchdb = CouchDBStub()
+            self.guardian.couchdb_handler = couchdb
+            for _ in range(8):
+                self.guardian.start_epoch_writes()
+                for structure in structures:
+                    self.guardian.serverless(structure, rules, usages[structure["name"]], get_limits(structure["name"]))
+                self.guardian.flush_epoch_writes()
+            return couchdb
+
+        def run_asyncio_engine():
+            async def run_epoch():
+                semaphore = asyncio.Semaphore(2)
+                self.guardian.start_epoch_writes()
+                await asyncio.gather(*[engine.serverless(structure, rules, usages[structure["name"]],
+                                                         get_limits(structure["name"]), semaphore)
+                                       for structure in structures])
+                await engine.flush_epoch_writes()
+
+            couchdb = CouchDBStub()
+            engine = AsyncGuardianEngine(self.guardian)
+            engine.couchdb = AsyncCouchDBStub(couchdb)
+            for _ in range(8):
+                asyncio.run(run_epoch())
+            return couchdb
+
+        def strip(documents):
+            return sorted([{k: v for k, v in doc.items() if k != "timestamp"} for doc in documents], key=str)
+
+        threads_results = run_threads_engine()
+        asyncio_results = run_asyncio_engine()
+
+        TestCase.assertEqual(self, first=["node0", "node1", "node2"],
+                             second=sorted(set(r["structure"] for r in threads_results.requests)))
+        TestCase.assertEqual(self, first=strip(threads_results.requests), second=strip(asyncio_results.requests))
+        TestCase.assertEqual(self, first=strip(threads_results.events), second=strip(asyncio_results.events))
+        TestCase.assertEqual(self, first=threads_results.limits, second=asyncio_results.limits)
+
+    def test_database_names_and_timeout(self):
+        # Server that accepts the connections and reads the requests, but never replies
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        server.settimeout(5)
+        received = list()
+
+        def serve():
+            connection, _ = server.accept()
+            received.append(connection.recv(4096).decode())
+            time.sleep(2)
+            connection.close()
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+
+        self.guardian.async_concurrency = 10
+        self.guardian.couchdb_handler.server = "http://127.0.0.1:{0}".format(server.getsockname()[1])
+        self.guardian.couchdb_handler.set_database_name("rules", "rules-test")
+        request_timeout = AsyncGuardian.REQUEST_TIMEOUT
+        AsyncGuardian.REQUEST_TIMEOUT = 0.2
+        try:
+            t0 = time.time()
+            with self.assertRaises(asyncio.TimeoutError):
+                AsyncGuardianEngine(self.guardian).guard_structures([])
+            self.assertLess(time.time() - t0, 1.5)
+        finally:
+            AsyncGuardian.REQUEST_TIMEOUT = request_timeout
+            thread.join()
+            server.close()
+
+        # The database set in the synchronous client is used
+        self.assertTrue(received[0].startswith("GET /rules-test/_all_docs"))
+
+    def test_opentsdb_errors(self):
+        # Unknown structures have no points, while any other error is raised
+        opentsdb = AsyncOpenTSDBServer("http://opentsdb", AsyncSessionStub(400, '{"error": {"message": "No such name for \'tagv\': node9"}}'))
+        TestCase.assertEqual(self, first={}, second=asyncio.run(opentsdb.get_points({})))
+        opentsdb = AsyncOpenTSDBServer("http://opentsdb", AsyncSessionStub(400, '{"error": {"message": "Invalid query"}}'))
+        with self.assertRaises(ValueError):
+            asyncio.run(opentsdb.get_points({}))
+        opentsdb = AsyncOpenTSDBServer("http://opentsdb", AsyncSessionStub(500, ""))
+        with self.assertRaises(ValueError):
+            asyncio.run(opentsdb.get_points({}))
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from unittest import TestCase
+
+from src.Guardian.EventStore import EventStore
+from src.Guardian.Guardian import Guardian
+
+
+def generate_event(structure_name, resource, direction, timestamp):
+    name = resource.title() + ("Bottleneck" if direction == "up" else "Underuse")
+    return {"name": name, "resource": resource, "type": "event", "structure": structure_name,
+            "action": {"events": {"scale": {direction: 1}}}, "timestamp": timestamp}
+
+
+class EventStoreTest(TestCase):
+
+    def test_reduced_events_match_guardian(self):
+        timeout = 20
+        now = int(time.time())
+        events = list()
+        for i in range(5):
+            events.append(generate_event("node0", "cpu", "up", now - timeout - 10 + i))
+            events.append(generate_event("node0", "cpu", "down", now - i))
+            events.append(generate_event("node0", "mem", "up", now - i))
+            events.append(generate_event("node1", "cpu", "up", now - i))
+        events.sort(key=lambda e: e["timestamp"])
+
+        store = EventStore()
+        store.add_events(events)
+
+        valid, _ = Guardian.sort_events([e for e in events if e["structure"] == "node0"], timeout)
+        TestCase.assertEqual(self, first=Guardian.reduce_structure_events(valid),
+                             second=store.get_reduced_events("node0", timeout))
+
+        # The expired events have been removed
+        TestCase.assertEqual(self, first=10, second=len(store.get_events({"name": "node0"})))
+
+    def test_delete_num_events(self):
+        now = int(time.time())
+        store = EventStore()
+        store.add_events([generate_event("node0", "cpu", "up", now - 3 + i) for i in range(3)])
+        store.add_events([generate_event("node0", "cpu", "down", now)])
+
+        store.delete_num_events_by_structure({"name": "node0"}, "CpuBottleneck", 2)
+        TestCase.assertEqual(self, first={"cpu": {"events": {"scale": {"down": 1, "up": 1}}}},
+                             second=store.get_reduced_events("node0", 100))
+
+        # Removing more events than stored just empties the buffer
+        store.delete_num_events_by_structure({"name": "node0"}, "CpuBottleneck", 5)
+        store.delete_num_events_by_structure({"name": "node0"}, "CpuUnderuse", 1)
+        TestCase.assertEqual(self, first={}, second=store.get_reduced_events("node0", 100))
+
+    def test_load_events(self):
+        now = int(time.time())
+        persisted = [dict(generate_event("node0", "cpu", "up", now), _id="id0", _rev="1-a")]
+        store = EventStore()
+        store.load_events(persisted)
+        event = store.get_all_events()[0]
+        self.assertNotIn("_id", event)
+        self.assertNotIn("_rev", event)
+        TestCase.assertEqual(self, first={"cpu": {"events": {"scale": {"down": 0, "up": 1}}}},
+                             second=store.get_reduced_events("node0", 100))
+
+    def test_max_events(self):
+        now = int(time.time())
+        store = EventStore(max_events=3)
+        store.add_events([generate_event("node0", "cpu", "up", now) for _ in range(5)])
+        TestCase.assertEqual(self, first={"cpu": {"events": {"scale": {"down": 0, "up": 3}}}},
+                             second=store.get_reduced_events("node0", 100))
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+
+from src.Guardian.Forecaster import HoltEstimator, UsageForecaster
+
+
+class ForecasterTest(TestCase):
+
+    def test_linear_trend(self):
+        estimator = HoltEstimator(3)
+        for value in [100, 110]:
+            estimator.update(value, 0.5, 0.3)
+            TestCase.assertEqual(self, first=None, second=estimator.forecast(1))
+
+        # A perfectly linear series is forecast exactly, whatever the smoothing factors
+        for value in [120, 130, 140, 150]:
+            estimator.update(value, 0.5, 0.3)
+        TestCase.assertEqual(self, first=150, second=estimator.forecast(0))
+        TestCase.assertEqual(self, first=180, second=estimator.forecast(3))
+
+    def test_smoothing(self):
+        estimator = HoltEstimator(2)
+        estimator.update(100, 0.5, 0.5)
+        estimator.update(100, 0.5, 0.5)
+
+        # level = 0.5 * 200 + 0.5 * 100 = 150, trend = 0.5 * 50 + 0.5 * 0 = 25
+        estimator.update(200, 0.5, 0.5)
+        TestCase.assertEqual(self, first=150, second=estimator.forecast(0))
+        TestCase.assertEqual(self, first=200, second=estimator.forecast(2))
+
+    def test_usage_forecaster(self):
+        forecaster = UsageForecaster(warmup_samples=2)
+        for usage in [50, 60, 70]:
+            forecaster.update("node0", {"structure.cpu.usage": usage, "structure.mem.usage": 0}, 0.5, 0.3, 0)
+
+        TestCase.assertEqual(self, first=90, second=forecaster.forecast("node0", "structure.cpu.usage", 2))
+        # Metrics without data are not forecast, nor unknown structures
+        TestCase.assertEqual(self, first=None, second=forecaster.forecast("node0", "structure.mem.usage", 2))
+        TestCase.assertEqual(self, first=None, second=forecaster.forecast("node1", "structure.cpu.usage", 2))
+
+        forecaster.expire(1000)
+        TestCase.assertEqual(self, first=90, second=forecaster.forecast("node0", "structure.cpu.usage", 2))
+        forecaster.expire(-1)
+        TestCase.assertEqual(self, first=None, second=forecaster.forecast("node0", "structure.cpu.usage", 2))
@@ -24,6 +24,7 @@
 # along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
 
 
+import copy
 import random
 import unittest
 import time
@@ -344,6 +345,71 @@ class GuardianTest(TestCase):
                                                                                current_resource_usage),
                              second=-550)
 
+    def test_get_amount_from_pid(self):
+        self.guardian.debug = False
+        self.guardian.pid_controllers.clear()
+        structure = {"name": "node0", "resources": {"cpu": {"current": 200, "max": 400, "min": 50}}}
+        limits = {"cpu": {"upper": 150, "lower": 100, "boundary": 50}}
+        rule_up = {"resource": "cpu", "rescale_type": "up", "kp": 1, "ki": 0.5, "kd": 0}
+        rule_down = {"resource": "cpu", "rescale_type": "down"}
+
+        # Usage 45 over the midpoint (125): 1 * 45 + 0.5 * 45
+        usages = {"structure.cpu.usage": 170}
+        TestCase.assertEqual(self, first=67.5,
+                             second=self.guardian.get_amount_from_pid(structure, rule_up, limits, usages))
+        # A second bottleneck rescales more, as the error is accumulated: 1 * 45 + 0.5 * 90
+        TestCase.assertEqual(self, first=90,
+                             second=self.guardian.get_amount_from_pid(structure, rule_up, limits, usages))
+
+        # The amount never goes against the rescale type
+        usages = {"structure.cpu.usage": 120}
+        TestCase.assertEqual(self, first=0,
+                             second=self.guardian.get_amount_from_pid(structure, rule_up, limits, usages))
+
+        # Default gains: 0.8 * -50 + 0.1 * -50
+        self.guardian.pid_controllers.clear()
+        usages = {"structure.cpu.usage": 75}
+        TestCase.assertAlmostEqual(self, first=-45,
+                                   second=self.guardian.get_amount_from_pid(structure, rule_down, limits, usages))
+
+    def test_get_amount_from_forecast(self):
+        self.guardian.debug = False
+        self.guardian.forecast_horizon = 2
+        structure = {"name": "node0", "resources": {"cpu": {"current": 200, "max": 400, "min": 50}}}
+        limits = {"cpu": {"upper": 150, "lower": 100, "boundary": 50}}
+        rule_up = {"resource": "cpu", "rescale_type": "up", "amount": 20}
+        rule_down = {"resource": "cpu", "rescale_type": "down"}
+
+        # Without enough usage samples, the current usage is used: 180 + 25 + 50 = 255
+        usages = {"structure.cpu.usage": 180}
+        TestCase.assertEqual(self, first=55,
+                             second=self.guardian.get_amount_from_forecast(structure, rule_up, limits, usages))
+
+        # Usage grows 20 per epoch, the forecast at 2 epochs ahead is 220 so the limit is set to 295
+        for usage in [140, 160, 180]:
+            self.guardian.forecaster.update("node0", {"structure.cpu.usage": usage}, 0.5, 0.3)
+        TestCase.assertEqual(self, first=95,
+                             second=self.guardian.get_amount_from_forecast(structure, rule_up, limits, usages))
+
+        # Scale ups are never smaller than the rule amount
+        usages = {"structure.cpu.usage": 100}
+        self.guardian.forecaster.clear()
+        TestCase.assertEqual(self, first=20,
+                             second=self.guardian.get_amount_from_forecast(structure, rule_up, limits, usages))
+
+        # Scale downs never go below the current usage even if it is forecast to drop: 100 + 25 + 50 = 175
+        for usage in [160, 130, 100]:
+            self.guardian.forecaster.update("node0", {"structure.cpu.usage": usage}, 0.5, 0.3)
+        TestCase.assertEqual(self, first=-25,
+                             second=self.guardian.get_amount_from_forecast(structure, rule_down, limits, usages))
+
+        # Scale downs never increase the limit even if the usage is forecast to rise
+        self.guardian.forecaster.clear()
+        for usage in [140, 160, 180]:
+            self.guardian.forecaster.update("node0", {"structure.cpu.usage": usage}, 0.5, 0.3)
+        TestCase.assertEqual(self, first=0,
+                             second=self.guardian.get_amount_from_forecast(structure, rule_down, limits, usages))
+
     def test_match_usages_and_limits(self):
         def assert_event_equals(rule, ev):
             event_expected_name = generate_event_name(rule["action"]["events"], rule["resource"])
@@ -469,6 +535,192 @@ class GuardianTest(TestCase):
 
             TestCase.assertEqual(self, first=expected_events_to_remove, second=events_to_remove)
 
+    def test_get_structures_usages(self):
+        def get_points(query):
+            queries.append(query)
+            if "filters" in query["queries"][0]:
+                names = query["queries"][0]["filters"][0]["filter"].split("|")
+            else:
+                names = [query["queries"][0]["tags"]["host"]]
+            result = list()
+            for name in names:
+                if name != "node2":
+                    result.append({"metric": "proc.cpu.user", "tags": {"host": name}, "dps": {"1": 10, "2": 30}})
+                    result.append({"metric": "proc.cpu.kernel", "tags": {"host": name}, "dps": {"1": 5}})
+            return result
+
+        def get_structure(name, guard=True):
+            return {"name": name, "subtype": "container", "guard": guard, "resources": {"cpu": {"guard": True}}}
+
+        queries = list()
+        self.guardian.opentsdb_handler.get_points = get_points
+        self.guardian.guardable_resources = ["cpu"]
+        self.guardian.window_difference = 10
+        self.guardian.window_delay = 10
+        self.guardian.usage_query_chunk_size = 2
+        self.guardian.debug = False
+
+        structures = [get_structure("node0"), get_structure("node1"), get_structure("node2"), get_structure("node3", guard=False)]
+        usages = self.guardian.get_structures_usages(structures)
+
+        # The three guarded structures are retrieved with two grouped queries, the one without time series is left
+        # out so that its usages are retrieved with a query of its own
+        TestCase.assertEqual(self, first=2, second=len(queries))
+        TestCase.assertEqual(self, first=["node0", "node1"], second=sorted(usages.keys()))
+        TestCase.assertEqual(self, first={"structure.cpu.usage": 25, "structure.cpu.user": 20, "structure.cpu.kernel": 5},
+                             second=usages["node0"])
+
+        queries.clear()
+        self.guardian.guard_structure(structures[2], [], usages.get("node2"), {"name": "node2", "resources": {}})
+        TestCase.assertEqual(self, first=1, second=len(queries))
+        TestCase.assertEqual(self, first={"host": "node2"}, second=queries[0]["queries"][0]["tags"])
+
+    def test_disk_and_net_guarding(self):
+        import conf.StateDatabase.rules as default_rules
+
+        def get_points(query):
+            result = list()
+            for name in query["queries"][0]["filters"][0]["filter"].split("|"):
+                result.append({"metric": "proc.cpu.user", "tags": {"host": name}, "dps": {"1": 140}})
+                result.append({"metric": "proc.cpu.kernel", "tags": {"host": name}, "dps": {"1": 20}})
+                result.append({"metric": "proc.disk.reads.mb", "tags": {"host": name}, "dps": {"1": 60}})
+                result.append({"metric": "proc.disk.writes.mb", "tags": {"host": name}, "dps": {"1": 90}})
+            return result
+
+        self.guardian.opentsdb_handler.get_points = get_points
+        self.guardian.guardable_resources = ["cpu", "disk", "net"]
+        self.guardian.window_difference = 10
+        self.guardian.window_delay = 10
+        self.guardian.usage_query_chunk_size = 10
+        self.guardian.debug = False
+
+        # Only the resources guarded by each structure are retrieved, net is guardable but no structure has it
+        structures = [{"name": "node0", "subtype": "container", "guard": True,
+                       "resources": {"cpu": {"guard": True, "max": 400, "min": 50, "current": 200},
+                                     "disk": {"guard": True, "max": 200, "min": 10, "current": 100}}},
+                      {"name": "node1", "subtype": "container", "guard": True,
+                       "resources": {"cpu": {"guard": True, "max": 400, "min": 50, "current": 200}}}]
+        usages = self.guardian.get_structures_usages(structures)
+        # Only the writes are limited and guarded, the reads are not added up
+        TestCase.assertEqual(self, first=90, second=usages["node0"]["structure.disk.usage"])
+        TestCase.assertEqual(self, first=False, second="structure.disk.usage" in usages["node1"])
+
+        # Limits are only adjusted for the guarded resources
+        self.guardian.update_limit = lambda limits: None
+        limits = {"name": "node0", "resources": {"cpu": {"upper": 150, "lower": 100, "boundary": 25},
+                                                 "disk": {"upper": 40, "lower": 20, "boundary": 20}}}
+        limits_resources = self.guardian.prepare_structure_limits(structures[0], limits)
+        TestCase.assertEqual(self, first={"upper": 80, "lower": 60, "boundary": 20}, second=limits_resources["disk"])
+        limits = {"name": "node1", "resources": {"cpu": {"upper": 175, "lower": 150, "boundary": 25}}}
+        self.guardian.prepare_structure_limits(structures[1], limits)
+
+        # A disk bottleneck is detected, while the structure without disk is only checked for CPU
+        rules = [copy.deepcopy(r) for r in [default_rules.disk_exceeded_upper, default_rules.disk_dropped_lower,
+                                             default_rules.cpu_exceeded_upper, default_rules.cpu_dropped_lower]]
+        events = self.guardian.match_usages_and_limits("node0", rules, usages["node0"], limits_resources,
+                                                       structures[0]["resources"])
+        TestCase.assertEqual(self, first=["DiskBottleneck"], second=[e["name"] for e in events])
+        events = self.guardian.match_usages_and_limits("node1", rules, usages["node1"], limits["resources"],
+                                                       structures[1]["resources"])
+        TestCase.assertEqual(self, first=[], second=events)
+
+    def test_net_usage_units(self):
+        self.guardian.debug = False
+
+        # The network usage is reported in MB/s but limited in Mbit/s, missing data is left untouched
+        usages = {"structure.cpu.usage": 100, "structure.net.usage": 12.5}
+        self.guardian.convert_structure_usages(usages)
+        TestCase.assertEqual(self, first={"structure.cpu.usage": 100, "structure.net.usage": 100}, second=usages)
+        usages = {"structure.cpu.usage": 100, "structure.net.usage": self.guardian.NO_METRIC_DATA_DEFAULT_VALUE}
+        self.guardian.convert_structure_usages(usages)
+        TestCase.assertEqual(self, first=self.guardian.NO_METRIC_DATA_DEFAULT_VALUE,
+                             second=usages["structure.net.usage"])
+
+    def test_epoch_writes(self):
+        calls = list()
+        self.guardian.couchdb_handler.update_limit = lambda limit: calls.append(("update_limit", limit))
+        self.guardian.couchdb_handler.update_limits = lambda limits: calls.append(("update_limits", limits))
+        self.guardian.couchdb_handler.add_requests = lambda reqs: calls.append(("add_requests", reqs))
+        self.guardian.debug = False
+
+        # During the epoch the writes are collected and persisted at the end with bulk operations
+        self.guardian.start_epoch_writes()
+        self.guardian.update_limit({"name": "node0", "resources": {"cpu": {"upper": 100}}})
+        self.guardian.update_limit({"name": "node0", "resources": {"cpu": {"upper": 110}}})
+        self.guardian.update_limit({"name": "node1", "resources": {"cpu": {"upper": 120}}})
+        self.guardian.add_requests([{"structure": "node0"}])
+        self.guardian.add_requests([{"structure": "node1"}])
+        TestCase.assertEqual(self, first=[], second=calls)
+
+        self.guardian.flush_epoch_writes()
+        TestCase.assertEqual(self, first=["update_limits", "add_requests"], second=[c[0] for c in calls])
+        TestCase.assertEqual(self, first=[110, 120], second=[l["resources"]["cpu"]["upper"] for l in calls[0][1]])
+        TestCase.assertEqual(self, first=2, second=len(calls[1][1]))
+
+        # Outside of an epoch the writes are persisted right away
+        self.guardian.add_requests([{"structure": "node2"}])
+        TestCase.assertEqual(self, first=("add_requests", [{"structure": "node2"}]), second=calls[-1])
+
+    def test_get_structures_limits(self):
+        def get_limits_by_names(names):
+            queried_names.append(names)
+            return [{"name": name, "resources": {"cpu": {"upper": 100}}} for name in names if name != "node1"]
+
+        queried_names = list()
+        self.guardian.couchdb_handler.get_limits_by_names = get_limits_by_names
+        self.guardian.debug = False
+
+        structures = [{"name": "node0", "guard": True}, {"name": "node1", "guard": True}, {"name": "node2", "guard": False}]
+        limits = self.guardian.get_structures_limits(structures)
+        TestCase.assertEqual(self, first=[["node0", "node1"]], second=queried_names)
+        TestCase.assertEqual(self, first=["node0"], second=list(limits.keys()))
+
+
+    def test_match_structures_usages_and_limits(self):
+        def get_structure(i):
+            return {"name": "node{0}".format(i), "subtype": "container", "guard": True,
+                    "resources": {"cpu": {"guard": True, "current": random.choice([100, 150, 200]), "max": 200, "min": 50},
+                                  "mem": {"guard": i % 2 == 0, "current": 4096, "max": 8192, "min": 256}}}
+
+        def get_usages():
+            return {"structure.cpu.usage": random.choice([0, 40, 90, 130, 180]), "structure.cpu.user": 10,
+                    "structure.cpu.kernel": 5, "structure.mem.usage": random.choice([0, 1000, 3900])}
+
+        limits = {"cpu": {"upper": 120, "lower": 80, "boundary": 20}, "mem": {"upper": 3500, "lower": 2000, "boundary": 500}}
+        # The last rule can't be vectorized, so it is evaluated structure by structure
+        cpu_usage_low = {"name": "cpu_usage_low", "resource": "cpu", "generates": "events", "active": True,
+                         "action": {"events": {"scale": {"down": 1}}},
+                         "rule": {"<": [{"/": [{"var": "cpu.structure.cpu.usage"}, {"var": "cpu.structure.cpu.current"}]}, 0.4]}}
+        rules = [cpu_exceeded_upper, cpu_dropped_lower, mem_exceeded_upper, mem_dropped_lower, CpuRescaleUp, cpu_usage_low]
+        self.guardian.guardable_resources = ["cpu", "mem"]
+        self.guardian.debug = False
+
+        random.seed(2)
+        structures = [(get_structure(i), get_usages()) for i in range(100)]
+
+        expected_events = list()
+        for structure, usages in structures:
+            structure = copy.deepcopy(structure)
+            try:
+                expected_events.append(self.guardian.match_usages_and_limits(structure["name"], rules, usages,
+                                                                             copy.deepcopy(limits), structure["resources"]))
+            except Exception:
+                # The structure would be skipped, e.g., guarded resources without usages can't be compared
+                expected_events.append(None)
+
+        prepared_structures = list()
+        for structure, usages in structures:
+            structure, structure_limits = copy.deepcopy(structure), copy.deepcopy(limits)
+            data = self.guardian.get_rules_data(rules, usages, structure_limits, structure["resources"])
+            prepared_structures.append((structure, usages, structure_limits, data))
+        structures_events = self.guardian.match_structures_usages_and_limits(prepared_structures, rules)
+
+        def strip(events):
+            return None if events is None else [(e["name"], e["structure"], e["action"]) for e in events]
+
+        TestCase.assertEqual(self, first=[strip(e) for e in expected_events], second=[strip(e) for e in structures_events])
+        TestCase.assertEqual(self, first=True, second=sum(len(e) for e in structures_events if e) > 0)
+
 
 class GuardianServelerssIntegrationTest(TestCase):
 
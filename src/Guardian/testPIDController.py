@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from unittest import TestCase
+
+from src.Guardian.PIDController import PIDControllers
+
+
+class PIDControllersTest(TestCase):
+
+    def test_step(self):
+        controllers = PIDControllers()
+        gains = {"kp": 0.5, "ki": 0.25, "kd": 1}
+
+        # First step, no derivative term: 0.5 * 40 + 0.25 * 40
+        TestCase.assertEqual(self, first=30, second=controllers.step("node0", "cpu", 40, gains))
+        # The error is accumulated: 0.5 * 20 + 0.25 * 60 + (20 - 40)
+        TestCase.assertEqual(self, first=5, second=controllers.step("node0", "cpu", 20, gains))
+        # Other resources and structures have their own controller
+        TestCase.assertEqual(self, first=30, second=controllers.step("node0", "mem", 40, gains))
+        TestCase.assertEqual(self, first=30, second=controllers.step("node1", "cpu", 40, gains))
+
+        # The accumulated error is discarded when the error changes its sign: 0.5 * -20 + 0.25 * -20 + (-20 - 20)
+        TestCase.assertEqual(self, first=-55, second=controllers.step("node0", "cpu", -20, gains))
+
+        controllers.reset("node0", "cpu")
+        TestCase.assertEqual(self, first=30, second=controllers.step("node0", "cpu", 40, gains))
+
+    def test_expire(self):
+        controllers = PIDControllers()
+        gains = {"kp": 1, "ki": 1, "kd": 0}
+        controllers.step("node0", "cpu", 10, gains)
+        time.sleep(0.01)
+        controllers.expire(0)
+        TestCase.assertEqual(self, first=20, second=controllers.step("node0", "cpu", 10, gains))
+
+        # Stepping with a timeout resets the stale state too
+        time.sleep(0.01)
+        TestCase.assertEqual(self, first=20, second=controllers.step("node0", "cpu", 10, gains, timeout=0))
@@ -0,0 +1,47 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from src.Guardian.ProcessGuardian import ProcessGuardianEngine
+
+
+class ProcessGuardianTest(TestCase):
+
+    def test_shutdown(self):
+        engine = ProcessGuardianEngine(None)
+        engine.executor = ProcessPoolExecutor(max_workers=1)
+        engine.process_futures = [engine.executor.submit(time.sleep, 0.5) for _ in range(4)]
+
+        # The evaluations that haven't started are cancelled without waiting for the running ones
+        futures = engine.process_futures
+        t0 = time.time()
+        engine.shutdown()
+        self.assertLess(time.time() - t0, 0.4)
+        self.assertTrue(all(future.cancelled() for future in futures[2:]))
+        TestCase.assertEqual(self, first=None, second=engine.executor)
+        TestCase.assertEqual(self, first=[], second=engine.process_futures)
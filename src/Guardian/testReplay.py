@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+
+from src.Guardian.Replay import GuardianReplay, InMemoryOpenTSDBServer, generate_scenario
+
+
+class GuardianReplayTest(TestCase):
+
+    def test_get_points(self):
+        opentsdb = InMemoryOpenTSDBServer([
+            {"metric": "proc.cpu.user", "tags": {"host": "node0"}, "dps": {"100": 10, "102": 20, "105": 30, "120": 50}},
+            {"metric": "proc.cpu.user", "tags": {"host": "node1"}, "dps": {"100": 1, "105": 3}}])
+
+        # Single structure query
+        usages = opentsdb.get_structure_timeseries({"host": "node0"}, 10, 0, ["proc.cpu.user"],
+                                                   {"structure.cpu.user": ["proc.cpu.user"]})
+        TestCase.assertEqual(self, first={"structure.cpu.user": 0}, second=usages)
+        result = opentsdb.get_points({"start": 100, "end": 110, "queries": [
+            {"aggregator": "zimsum", "metric": "proc.cpu.user", "tags": {"host": "node0"}, "downsample": "5s-avg"}]})
+        TestCase.assertEqual(self, first=[{"metric": "proc.cpu.user", "tags": {}, "dps": {"100": 15.0, "105": 30.0}}],
+                             second=result)
+
+        # Grouped query
+        result = opentsdb.get_points({"start": 100, "end": 110, "queries": [
+            {"aggregator": "zimsum", "metric": "proc.cpu.user", "downsample": "5s-avg",
+             "filters": [{"type": "literal_or", "tagk": "host", "filter": "node0|node1|node2", "groupBy": True}]}]})
+        TestCase.assertEqual(self, first=[{"metric": "proc.cpu.user", "tags": {"host": "node0"}, "dps": {"100": 15.0, "105": 30.0}},
+                                          {"metric": "proc.cpu.user", "tags": {"host": "node1"}, "dps": {"100": 1.0, "105": 3.0}}],
+                             second=result)
+
+    def test_replay(self):
+        scenario = generate_scenario(20, 12, seed=3)
+        report = GuardianReplay(scenario).run()
+        # The first epoch needs a full time window of data and a delay of 10 seconds
+        TestCase.assertEqual(self, first=11, second=report["epochs"])
+        TestCase.assertEqual(self, first=220, second=report["decisions"])
+        TestCase.assertEqual(self, first=True, second=len(report["requests"]) > 0)
+
+        # Decisions are deterministic and don't depend on how the structures are processed
+        for config in [dict(), dict(MAX_WORKERS=1), dict(VECTORIZED_RULES=True), dict(USE_EVENT_STORE=True),
+                       dict(ENGINE="processes", PROCESS_WORKERS=2), dict(ENGINE="processes", VECTORIZED_RULES=True)]:
+            other_report = GuardianReplay(scenario, config).run()
+            TestCase.assertEqual(self, first=report["digest"], second=other_report["digest"])
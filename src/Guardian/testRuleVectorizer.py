@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+from unittest import TestCase
+
+from src.test.documents.rules import cpu_exceeded_upper, cpu_dropped_lower, mem_exceeded_upper, mem_dropped_lower, \
+    energy_exceeded_upper, energy_dropped_lower, CpuRescaleUp
+from src.Guardian.RuleVectorizer import vectorize_rule
+from src.MyUtils.RuleCompiler import evaluate_rule
+
+
+class RuleVectorizerTest(TestCase):
+
+    def test_vectorize_rule(self):
+        for rule in [cpu_exceeded_upper, cpu_dropped_lower, mem_exceeded_upper, mem_dropped_lower,
+                     energy_exceeded_upper, energy_dropped_lower, CpuRescaleUp]:
+            TestCase.assertNotEqual(self, first=None, second=vectorize_rule(rule))
+
+        # Rules with other operations than comparisons are left to JsonLogic
+        rule = {"rule": {"and": [{"<": [{"/": [{"var": "cpu.structure.cpu.usage"}, {"var": "cpu.structure.cpu.current"}]}, 0.4]}]}}
+        TestCase.assertEqual(self, first=None, second=vectorize_rule(rule))
+        rule = {"rule": {"or": [{">": [{"var": "cpu.structure.cpu.usage"}, 0]}]}}
+        TestCase.assertEqual(self, first=None, second=vectorize_rule(rule))
+        rule = {"rule": {">": [{"var": ["cpu.structure.cpu.usage", 0]}, 0]}}
+        TestCase.assertEqual(self, first=None, second=vectorize_rule(rule))
+
+    def test_evaluate(self):
+        def get_data():
+            return {"cpu": {"structure": {"cpu": {"usage": random.choice([0, 50, 100.5, 150, 200]),
+                                                  "current": random.choice([100, 150, 200]),
+                                                  "max": random.choice([150, 200]), "min": 50}},
+                            "limits": {"cpu": {"upper": random.choice([100, 120, 150]),
+                                               "lower": random.choice([50, 80, 100]), "boundary": 20}}}}
+
+        random.seed(1)
+        structures_data = [get_data() for _ in range(200)]
+
+        # Missing and non-numeric values can't be compared as arrays
+        del structures_data[0]["cpu"]["structure"]["cpu"]["usage"]
+        structures_data[1]["cpu"]["limits"]["cpu"]["upper"] = "120"
+        structures_data[1]["cpu"]["limits"]["cpu"]["lower"] = None
+        structures_data[2] = dict()
+
+        for rule in [cpu_exceeded_upper, cpu_dropped_lower]:
+            results, evaluable = vectorize_rule(rule).evaluate(structures_data)
+            TestCase.assertEqual(self, first=[False, False, False], second=[bool(e) for e in evaluable[0:3]])
+            TestCase.assertEqual(self, first=[True] * 197, second=[bool(e) for e in evaluable[3:]])
+            for i in range(3, len(structures_data)):
+                TestCase.assertEqual(self, first=bool(evaluate_rule(rule, structures_data[i])), second=bool(results[i]))
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+
+from src.Guardian.Scheduler import StructureScheduler
+
+
+class StructureSchedulerTest(TestCase):
+
+    def test_schedule(self):
+        scheduler = StructureScheduler()
+        structures = [{"name": "stable"}, {"name": "hot"}]
+        stable_usages = {"cpu": (150, 100, 200)}
+        hot_usages = {"cpu": (190, 100, 200)}
+
+        guarded_epochs = {"stable": list(), "hot": list()}
+        for epoch in range(1, 21):
+            for structure in scheduler.get_due_structures(structures):
+                guarded_epochs[structure["name"]].append(epoch)
+                usages = stable_usages if structure["name"] == "stable" else hot_usages
+                stable = scheduler.is_stable(structure["name"], usages)
+                scheduler.reschedule(structure["name"], stable, 4)
+
+        # A structure close to its upper limit is guarded on every epoch
+        TestCase.assertEqual(self, first=list(range(1, 21)), second=guarded_epochs["hot"])
+        # A stable structure doubles its interval up to the maximum
+        TestCase.assertEqual(self, first=[1, 2, 4, 8, 12, 16, 20], second=guarded_epochs["stable"])
+
+    def test_is_stable(self):
+        scheduler = StructureScheduler(stable_margin=0.25, stable_change=0.1)
+        # Unknown previous usages
+        self.assertFalse(scheduler.is_stable("node0", {"cpu": (150, 100, 200)}))
+        self.assertTrue(scheduler.is_stable("node0", {"cpu": (155, 100, 200)}))
+        # Changed too much
+        self.assertFalse(scheduler.is_stable("node0", {"cpu": (135, 100, 200)}))
+        # Too close to the lower limit
+        self.assertFalse(scheduler.is_stable("node0", {"cpu": (120, 100, 200)}))
+        self.assertFalse(scheduler.is_stable("node0", dict()))
+
+    def test_structures_changes(self):
+        scheduler = StructureScheduler()
+        node0, node1, node2 = {"name": "node0"}, {"name": "node1"}, {"name": "node2"}
+        TestCase.assertEqual(self, first=[node0, node1], second=scheduler.get_due_structures([node0, node1]))
+        scheduler.reschedule("node0", True, 8)
+        scheduler.reschedule("node1", True, 8)
+
+        # New structures are due right away
+        TestCase.assertEqual(self, first=[node2], second=scheduler.get_due_structures([node0, node1, node2]))
+
+        # Structures that are not rescheduled after being guarded (e.g., on an error) are due in the next epoch
+        TestCase.assertEqual(self, first=[node1, node2], second=scheduler.get_due_structures([node1, node2]))
+
+        # Structures that are guarded again after being removed are due right away
+        TestCase.assertEqual(self, first=[node0, node1, node2], second=scheduler.get_due_structures([node0, node1, node2]))
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from unittest import TestCase
+
+from src.Guardian.Guardian import Guardian
+from src.Guardian.Sharding import HashRing, get_alive_members, beat_member
+
+
+class ServicesStub:
+    def __init__(self):
+        self.services = dict()
+
+    def get_service(self, service_name):
+        if service_name not in self.services:
+            raise ValueError("Document with name {0} not found in database {1}".format(service_name, "services"))
+        return dict(self.services[service_name])
+
+    def add_service(self, service):
+        self.services[service["name"]] = dict(service, _id=service["name"])
+
+    def update_service(self, service):
+        self.services[service["name"]] = service
+
+    def get_services(self):
+        return list(self.services.values())
+
+
+class SharedDatabaseStub(ServicesStub):
+    def __init__(self):
+        super().__init__()
+        self.events, self.next_id = dict(), 0
+        self.add_service({"name": "guardian", "type": "service", "heartbeat": time.time(), "config": {}})
+
+    def get_all_events(self):
+        return [dict(event) for event in self.events.values()]
+
+    def add_events(self, events):
+        for event in events:
+            self.next_id += 1
+            self.events[str(self.next_id)] = dict(event, _id=str(self.next_id))
+
+    def delete_events(self, events):
+        for event in events:
+            self.events.pop(event["_id"], None)
+
+
+class ShardingTest(TestCase):
+
+    def test_hash_ring(self):
+        names = ["node{0}".format(i) for i in range(3000)]
+        members = ["guardian@host{0}".format(i) for i in range(3)]
+        ring = HashRing(members)
+
+        owners = {name: ring.get_owner(name) for name in names}
+        for member in members:
+            # Every member gets roughly a third of the structures
+            owned = sum(1 for owner in owners.values() if owner == member)
+            self.assertTrue(700 < owned < 1300, "{0} owns {1} structures".format(member, owned))
+
+        # The ownership only depends on the members, not on the order in which they are given
+        TestCase.assertEqual(self, first=owners,
+                             second={name: HashRing(list(reversed(members))).get_owner(name) for name in names})
+
+        # When a member leaves, only its structures are reassigned
+        smaller_ring = HashRing(members[:2])
+        for name in names:
+            if owners[name] != members[2]:
+                TestCase.assertEqual(self, first=owners[name], second=smaller_ring.get_owner(name))
+            else:
+                self.assertIn(smaller_ring.get_owner(name), members[:2])
+
+        TestCase.assertEqual(self, first=None, second=HashRing([]).get_owner("node0"))
+
+    def test_membership(self):
+        services = ServicesStub()
+        services.add_service({"name": "guardian", "type": "service", "heartbeat": time.time(), "config": {}})
+        beat_member(services, "guardian@host0", "guardian")
+        beat_member(services, "guardian@host1", "guardian")
+        beat_member(services, "guardian@host1", "guardian")
+        services.add_service({"name": "guardian@host2", "type": "service", "member_of": "guardian",
+                              "heartbeat": time.time() - 100, "config": {}})
+
+        TestCase.assertEqual(self, first=4, second=len(services.get_services()))
+        TestCase.assertEqual(self, first=["guardian@host0", "guardian@host1"],
+                             second=get_alive_members(services.get_services(), "guardian", 30))
+        TestCase.assertEqual(self, first=["guardian@host0", "guardian@host1", "guardian@host2"],
+                             second=get_alive_members(services.get_services(), "guardian", 300))
+
+    def test_sharded_events(self):
+        database = SharedDatabaseStub()
+        names = ["node{0}".format(i) for i in range(20)]
+
+        def get_guardian(instance_name):
+            guardian = Guardian()
+            guardian.couchdb_handler = database
+            guardian.instance_name, guardian.sharding, guardian.shard_timeout, guardian.debug = instance_name, True, 30, False
+            guardian.set_event_store(True)
+            return guardian
+
+        def get_event(name):
+            return {"type": "event", "name": "CpuBottleneck", "resource": "cpu", "structure": name,
+                    "action": {"events": {"scale": {"up": 1}}}, "timestamp": time.time()}
+
+        guardians = [get_guardian("guardian@host0"), get_guardian("guardian@host1")]
+        for guardian in guardians + guardians:
+            guardian.update_shard_membership()
+
+        # Each instance only replaces the persisted events of its own structures
+        for guardian in guardians:
+            guardian.event_store.add_events([get_event(name) for name in names if guardian.is_owned_structure(name)])
+            guardian.snapshot_events()
+        TestCase.assertEqual(self, first=sorted(names), second=sorted(e["structure"] for e in database.get_all_events()))
+
+        # A restarted instance only loads the events of its own structures once the structures are split, without
+        # replacing the persisted events of the other instances
+        restarted = get_guardian("guardian@host1")
+        TestCase.assertEqual(self, first=[], second=restarted.event_store.get_structure_names())
+        restarted.snapshot_events()
+        restarted.update_shard_membership()
+        TestCase.assertEqual(self, first=sorted(name for name in names if guardians[1].is_owned_structure(name)),
+                             second=sorted(restarted.event_store.get_structure_names()))
+        TestCase.assertEqual(self, first=20, second=len(database.get_all_events()))
+
+        # When an instance stops, the remaining one loads the events of the structures it is assigned
+        database.services["guardian@host1"]["heartbeat"] = time.time() - 100
+        guardians[0].update_shard_membership()
+        TestCase.assertEqual(self, first=sorted(names), second=sorted(guardians[0].event_store.get_structure_names()))
+        TestCase.assertEqual(self, first=20, second=len(guardians[0].event_store.get_all_events()))
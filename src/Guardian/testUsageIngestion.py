@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import gzip
+import json
+import socket
+import time
+import urllib.request
+from unittest import TestCase
+
+from src.Guardian.Guardian import GUARDIAN_CONTAINER_METRICS, Guardian
+from src.Guardian.UsageIngestion import UsageWindows, UsageIngestionServer, parse_put_line
+
+RETRIEVE_METRICS = ["proc.cpu.user", "proc.cpu.kernel"]
+GENERATE_METRICS = {key: GUARDIAN_CONTAINER_METRICS[key] for key in ["structure.cpu.usage", "structure.cpu.user"]}
+
+
+def get_free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class UsageIngestionTest(TestCase):
+
+    def wait_until(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.02)
+        self.fail("Condition not met in time")
+
+    def test_usage_windows(self):
+        windows = UsageWindows(tags=("host",), max_age=20, downsample=5)
+        now = int(time.time()) // 5 * 5
+        samples = list()
+        for i in range(10):
+            # Two processes of the same container, in the same downsampling interval
+            samples.append(dict(metric="proc.cpu.user", timestamp=now - 5, value=40 + i, tags=dict(host="node0", pid="1")))
+            samples.append(dict(metric="proc.cpu.user", timestamp=(now - 10) * 1000, value=20, tags=dict(host="node0", pid="2")))
+        samples.append(dict(metric="proc.cpu.kernel", timestamp=now - 5, value=10, tags=dict(host="node0", pid="1")))
+        # Too old for the window, and without the tag of the structures
+        samples.append(dict(metric="proc.cpu.user", timestamp=now - 100, value=1000, tags=dict(host="node0", pid="1")))
+        samples.append(dict(metric="proc.cpu.user", timestamp=now, value=1000, tags=dict(pid="1")))
+        windows.add_samples(samples)
+
+        self.assertTrue(windows.has_samples("host", "node0"))
+        self.assertFalse(windows.has_samples("host", "node1"))
+        self.assertTrue(windows.has_samples("host", "node0", ["proc.cpu.user", "proc.cpu.kernel"]))
+        self.assertFalse(windows.has_samples("host", "node0", ["proc.cpu.user", "proc.mem.resident"]))
+
+        # The series are averaged by interval: 44.5 and 20, then the intervals are averaged: 32.25
+        usages = windows.get_usages("host", ["node0", "node1"], 30, RETRIEVE_METRICS, GENERATE_METRICS)
+        TestCase.assertEqual(self, first={"structure.cpu.usage": 42.25, "structure.cpu.user": 32.25}, second=usages["node0"])
+        TestCase.assertEqual(self, first={"structure.cpu.usage": 0, "structure.cpu.user": 0}, second=usages["node1"])
+
+        windows.max_age = 1
+        windows.expire()
+        self.assertFalse(windows.has_samples("host", "node0"))
+
+    def test_partially_pushed_usages(self):
+        def get_points(query):
+            queried.extend(query["queries"][0]["filters"][0]["filter"].split("|"))
+            return [{"metric": "proc.mem.resident", "tags": {"host": "node0"}, "dps": {"1": 2048}},
+                    {"metric": "proc.cpu.user", "tags": {"host": "node0"}, "dps": {"1": 100}}]
+
+        guardian = Guardian()
+        guardian.debug = False
+        guardian.guardable_resources = ["cpu", "mem"]
+        guardian.window_difference, guardian.window_delay, guardian.usage_query_chunk_size = 30, 10, 10
+        guardian.ingestion_server = object()
+        guardian.opentsdb_handler.get_points = get_points
+        queried = list()
+
+        # The agent of node0 only pushes the CPU metrics, while the one of node1 pushes all of them
+        now = time.time()
+        samples = list()
+        for metric, value in [("proc.cpu.user", 150), ("proc.cpu.kernel", 10), ("proc.mem.resident", 1024)]:
+            samples.append(dict(metric=metric, timestamp=now - 1, value=value, tags=dict(host="node1")))
+            if not metric.startswith("proc.mem"):
+                samples.append(dict(metric=metric, timestamp=now - 1, value=value, tags=dict(host="node0")))
+        guardian.usage_windows.add_samples(samples)
+
+        structures = [{"name": name, "subtype": "container", "guard": True,
+                       "resources": {"cpu": {"guard": True}, "mem": {"guard": True}}} for name in ["node0", "node1"]]
+        usages = guardian.get_structures_usages(structures)
+
+        # The memory of node0 is not taken as zero, all its usages are retrieved from OpenTSDB
+        TestCase.assertEqual(self, first=["node0"], second=queried)
+        TestCase.assertEqual(self, first=2048, second=usages["node0"]["structure.mem.usage"])
+        TestCase.assertEqual(self, first=1024, second=usages["node1"]["structure.mem.usage"])
+        TestCase.assertEqual(self, first=160, second=usages["node1"]["structure.cpu.usage"])
+
+    def test_parse_put_line(self):
+        TestCase.assertEqual(self, first=dict(metric="proc.cpu.user", timestamp=100, value=50.5, tags=dict(host="node0", pid="1")),
+                             second=parse_put_line("put proc.cpu.user 100 50.5 host=node0 pid=1"))
+        with self.assertRaises(ValueError):
+            parse_put_line("proc.cpu.user 100 50.5 host=node0")
+
+    def test_ingestion_server(self):
+        windows = UsageWindows(tags=("host",))
+        http_port, udp_port = get_free_port(), get_free_port(socket.SOCK_DGRAM)
+        server = UsageIngestionServer(windows, http_port, udp_port, address="127.0.0.1")
+        server.start()
+        try:
+            samples = [dict(metric="proc.cpu.user", timestamp=int(time.time()), value=50, tags=dict(host="node0"))]
+            request = urllib.request.Request("http://127.0.0.1:{0}/api/put".format(http_port),
+                                             data=gzip.compress(json.dumps(samples).encode()),
+                                             headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+            with urllib.request.urlopen(request) as r:
+                TestCase.assertEqual(self, first=204, second=r.status)
+            self.assertTrue(windows.has_samples("host", "node0"))
+
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.sendto("put proc.cpu.user {0} 30 host=node1\ninvalid\n".format(int(time.time())).encode(),
+                         ("127.0.0.1", udp_port))
+            self.wait_until(lambda: windows.has_samples("host", "node1"))
+        finally:
+            server.stop()
@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+class CoreAllocator:
+    """
+    Allocator of the CPU shares of a host among its containers. The free shares of the cores are indexed with a
+    tournament tree (an array-backed max-heap layout over the cores in index order), so that looking for the first
+    core with enough free shares or for the one with the largest free shares, as well as updating a core after an
+    allocation or a release, take O(log cores) instead of scanning and sorting the whole core mapping. The shares
+    allocated to each container are also kept by container.
+
+    The allocator works directly on the 'core_usage_mapping' of the host document, which is always kept up to date, so
+    that the document can be persisted right away after any allocation or release.
+    """
+
+    def __init__(self, core_usage_mapping, max_shares):
+        self.core_usage_mapping = core_usage_mapping
+        self.cores = [str(i) for i in range(int(max_shares / 100))]
+        self.positions = {core: i for i, core in enumerate(self.cores)}
+
+        # Cores not yet accounted in the mapping are fully free
+        for core in self.cores:
+            if core not in self.core_usage_mapping:
+                self.core_usage_mapping[core] = {"free": 100}
+
+        self.size = 1
+        while self.size < len(self.cores):
+            self.size *= 2
+        self.tree = [-1] * (2 * self.size)
+        for i, core in enumerate(self.cores):
+            self.tree[self.size + i] = self.core_usage_mapping[core]["free"]
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+        self.allocations = dict()
+        for core, usages in self.core_usage_mapping.items():
+            for container, shares in usages.items():
+                if container != "free" and shares > 0:
+                    self.allocations.setdefault(container, dict())[core] = shares
+
+    @classmethod
+    def from_host(cls, host):
+        return cls(host["resources"]["cpu"]["core_usage_mapping"], host["resources"]["cpu"]["max"])
+
+    def to_core_usage_mapping(self):
+        return self.core_usage_mapping
+
+    def get_free_shares(self, core):
+        return self.core_usage_mapping[core]["free"]
+
+    def get_container_shares(self, container, core):
+        return self.allocations.get(container, {}).get(core, 0)
+
+    def get_container_cores(self, container):
+        return [core for core in self.cores if core in self.allocations.get(container, {})]
+
+    def __update_index(self, core):
+        if core not in self.positions:
+            return
+        node = self.size + self.positions[core]
+        self.tree[node] = self.core_usage_mapping[core]["free"]
+        node //= 2
+        while node >= 1:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def __move_shares(self, container, core, shares):
+        # Positive shares are assigned to the container and negative ones are released from it
+        usages = self.core_usage_mapping[core]
+        usages["free"] -= shares
+        usages[container] = usages.get(container, 0) + shares
+
+        container_allocation = self.allocations.setdefault(container, dict())
+        if usages[container] > 0:
+            container_allocation[core] = usages[container]
+        else:
+            container_allocation.pop(core, None)
+            if not container_allocation:
+                del self.allocations[container]
+        self.__update_index(core)
+
+    def find_first_fit(self, shares):
+        """Look for the core with the lowest index that has at least 'shares' free shares
+
+        Returns:
+            (str) The core or None if no core has enough free shares
+        """
+        if self.tree[1] < shares:
+            return None
+        node = 1
+        while node < self.size:
+            node = 2 * node if self.tree[2 * node] >= shares else 2 * node + 1
+        return self.cores[node - self.size]
+
+    def find_largest(self):
+        """Look for the core with the largest free shares, choosing the one with the lowest index in case of a tie
+
+        Returns:
+            (str) The core or None if no core has free shares
+        """
+        if self.tree[1] <= 0:
+            return None
+        node = 1
+        while node < self.size:
+            node = 2 * node if self.tree[2 * node] == self.tree[node] else 2 * node + 1
+        return self.cores[node - self.size]
+
+    def allocate(self, container, shares, current_cores=None):
+        """Allocate CPU shares to a container
+
+        First, the free shares of the cores already used by the container are taken so that no additional cores are
+        added unnecessarily, next a single core with enough free shares is looked for and, finally, as many cores as
+        needed are added, starting with the ones with the largest free shares to avoid too much spread.
+
+        Args:
+            container (str): The name of the container
+            shares (int): The shares to allocate
+            current_cores (list): The cores currently used by the container, in order
+
+        Returns:
+            (tuple) The shares actually allocated, which may be less than the requested ones if the host does not
+            have enough free shares, and the new list of cores used by the container
+        """
+        current_cores = list(current_cores) if current_cores else list()
+        used_cores = list(current_cores)
+        pending_shares = shares
+
+        for core in current_cores:
+            free_shares = self.get_free_shares(core)
+            if free_shares > 0:
+                if free_shares > pending_shares:
+                    self.__move_shares(container, core, pending_shares)
+                    pending_shares = 0
+                    break
+                else:
+                    self.__move_shares(container, core, free_shares)
+                    pending_shares -= free_shares
+
+        if pending_shares > 0:
+            core = self.find_first_fit(pending_shares)
+            if core is not None:
+                self.__move_shares(container, core, pending_shares)
+                pending_shares = 0
+                used_cores.append(core)
+
+        while pending_shares > 0:
+            core = self.find_largest()
+            if core is None:
+                break
+            assigned_shares = min(self.get_free_shares(core), pending_shares)
+            self.__move_shares(container, core, assigned_shares)
+            pending_shares -= assigned_shares
+            used_cores.append(core)
+
+        return shares - pending_shares, used_cores
+
+    def release(self, container, shares, current_cores=None):
+        """Release CPU shares from a container, starting with the cores where it has less shares allocated so that as
+        many cores as possible are freed
+
+        Args:
+            container (str): The name of the container
+            shares (int): The shares to release
+            current_cores (list): The cores currently used by the container, in order
+
+        Returns:
+            (list) The new list of cores used by the container
+
+        Raises:
+            ValueError: If the container does not have enough allocated shares
+        """
+        if current_cores is None:
+            current_cores = self.get_container_cores(container)
+        used_cores = list(current_cores)
+        pending_shares = shares
+
+        for core in sorted(current_cores, key=lambda c: self.get_container_shares(container, c)):
+            allocated_shares = self.get_container_shares(container, core)
+            if allocated_shares <= pending_shares:
+                # Remove this core altogether and, if shares remain to be freed, continue
+                self.__move_shares(container, core, -allocated_shares)
+                pending_shares -= allocated_shares
+                used_cores.remove(core)
+                if pending_shares == 0:
+                    break
+            else:
+                self.__move_shares(container, core, -pending_shares)
+                pending_shares = 0
+                break
+
+        if pending_shares > 0:
+            raise ValueError("Error in setting cpu, couldn't free the resources properly")
+
+        return used_cores
+
+    def release_all(self, container):
+        """Release all the CPU shares of a container
+
+        Returns:
+            (int) The released shares
+        """
+        freed_shares = 0
+        for core, shares in list(self.allocations.get(container, {}).items()):
+            self.__move_shares(container, core, -shares)
+            freed_shares += shares
+        return freed_shares
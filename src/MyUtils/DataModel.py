@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import copy
+import sys
+
+_MISSING = object()
+
+
+def copy_value(value):
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+
+class SlottedDocument:
+    """
+    Compact in-memory representation of a database document, with one slot per known field instead of a dictionary.
+    String values of the known fields are interned, as the same ones (e.g., 'container', 'cpu' or host names) are
+    repeated across many documents. Unknown fields are kept apart so that converting a document back to a
+    dictionary gives the original one, and documents are always converted at the database boundary.
+    """
+    __slots__ = ("extra",)
+    FIELDS = ()
+    RESOURCES_FIELD = None
+
+    @classmethod
+    def from_dict(cls, doc):
+        obj = cls.__new__(cls)
+        extra = None
+        for key, value in doc.items():
+            if key == cls.RESOURCES_FIELD:
+                value = {sys.intern(name): Resource.from_dict(resource) for name, resource in value.items()}
+            elif key not in cls.FIELDS:
+                if extra is None:
+                    extra = dict()
+                extra[key] = value
+                continue
+            elif isinstance(value, str):
+                value = sys.intern(value)
+            setattr(obj, key, value)
+        obj.extra = extra
+        return obj
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key, default)
+        return self.extra.get(key, default) if self.extra else default
+
+    def to_dict(self):
+        doc = dict()
+        for key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                continue
+            if key == self.RESOURCES_FIELD:
+                doc[key] = {name: resource.to_dict() for name, resource in value.items()}
+            else:
+                doc[key] = copy_value(value)
+        if self.extra:
+            for key, value in self.extra.items():
+                doc[key] = copy_value(value)
+        return doc
+
+
+class Resource(SlottedDocument):
+    """A resource of a structure (current, max, min...) or of its limits (upper, lower, boundary)"""
+    FIELDS = ("current", "max", "min", "usage", "guard", "upper", "lower", "boundary")
+    __slots__ = FIELDS
+
+
+class Structure(SlottedDocument):
+    FIELDS = ("_id", "_rev", "type", "subtype", "name", "guard", "guard_policy", "host", "host_rescaler_ip",
+              "host_rescaler_port", "resources")
+    __slots__ = FIELDS
+    RESOURCES_FIELD = "resources"
+
+
+class Limits(SlottedDocument):
+    FIELDS = ("_id", "_rev", "type", "name", "resources")
+    __slots__ = FIELDS
+    RESOURCES_FIELD = "resources"
+
+
+class Event(SlottedDocument):
+    FIELDS = ("_id", "_rev", "type", "name", "resource", "structure", "action", "timestamp")
+    __slots__ = FIELDS
+
+
+class Request(SlottedDocument):
+    FIELDS = ("_id", "_rev", "type", "resource", "amount", "structure", "action", "timestamp", "structure_type",
+              "host", "host_rescaler_ip", "host_rescaler_port", "for_energy")
+    __slots__ = FIELDS
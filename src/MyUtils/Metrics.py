@@ -0,0 +1,205 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import bisect
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Cumulative histogram of the observations of a single series, as defined by Prometheus."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.bucket_counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of the histograms and counters of a service. Each metric may have several series, one per
+    combination of labels (e.g., one per phase of an epoch). The metrics can be rendered in the Prometheus text format
+    or converted to OpenTSDB documents.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.histograms = dict()
+        self.counters = dict()
+        self.descriptions = dict()
+        self.last_pushed = dict()
+        self.lock = Lock()
+
+    def describe(self, name, description):
+        self.descriptions[name] = description
+
+    @staticmethod
+    def __get_series_key(labels):
+        return tuple(sorted(labels.items())) if labels else tuple()
+
+    def observe(self, name, value, labels=None):
+        key = self.__get_series_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, dict())
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def inc(self, name, value=1, labels=None):
+        key = self.__get_series_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, dict())
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, labels=None):
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - t0, labels)
+
+    @staticmethod
+    def __format_labels(key, extra=None):
+        labels = list(key)
+        if extra:
+            labels.append(extra)
+        if not labels:
+            return ""
+        return "{" + ",".join('{0}="{1}"'.format(label, value) for label, value in labels) + "}"
+
+    def render(self):
+        """Render all the metrics in the Prometheus text exposition format.
+
+        Returns:
+            (string) The metrics, one sample per line
+        """
+        lines = list()
+        with self.lock:
+            for name in sorted(self.histograms):
+                full_name = "{0}_{1}".format(self.prefix, name)
+                if name in self.descriptions:
+                    lines.append("# HELP {0} {1}".format(full_name, self.descriptions[name]))
+                lines.append("# TYPE {0} histogram".format(full_name))
+                for key, histogram in sorted(self.histograms[name].items()):
+                    cumulative_count = 0
+                    for bucket, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                        cumulative_count += bucket_count
+                        lines.append("{0}_bucket{1} {2}".format(
+                            full_name, self.__format_labels(key, ("le", str(bucket))), cumulative_count))
+                    lines.append("{0}_bucket{1} {2}".format(
+                        full_name, self.__format_labels(key, ("le", "+Inf")), histogram.count))
+                    lines.append("{0}_sum{1} {2}".format(full_name, self.__format_labels(key), histogram.sum))
+                    lines.append("{0}_count{1} {2}".format(full_name, self.__format_labels(key), histogram.count))
+
+            for name in sorted(self.counters):
+                full_name = "{0}_{1}".format(self.prefix, name)
+                if name in self.descriptions:
+                    lines.append("# HELP {0} {1}".format(full_name, self.descriptions[name]))
+                lines.append("# TYPE {0} counter".format(full_name))
+                for key, value in sorted(self.counters[name].items()):
+                    lines.append("{0}{1} {2}".format(full_name, self.__format_labels(key), value))
+
+        return "\n".join(lines) + "\n"
+
+    def get_opentsdb_documents(self, tags=None):
+        """Convert the metrics to OpenTSDB documents. Histograms are sent as the average of the values observed since
+        the previous conversion, so that each point represents a single epoch, while counters are sent as their
+        total value.
+
+        Args:
+            tags (dict): Tags added to all the documents (e.g., the service name)
+
+        Returns:
+            (list) The documents to be sent to OpenTSDB
+        """
+        timestamp = int(time.time())
+        docs = list()
+        with self.lock:
+            for name, series in self.histograms.items():
+                for key, histogram in series.items():
+                    last_count, last_sum = self.last_pushed.get((name, key), (0, 0))
+                    self.last_pushed[(name, key)] = (histogram.count, histogram.sum)
+                    if histogram.count == last_count:
+                        continue
+                    value = (histogram.sum - last_sum) / (histogram.count - last_count)
+                    docs.append(dict(metric="{0}.{1}".format(self.prefix, name).replace("_", "."), value=value,
+                                     timestamp=timestamp, tags=dict(tags or {}, **dict(key))))
+
+            for name, series in self.counters.items():
+                for key, value in series.items():
+                    docs.append(dict(metric="{0}.{1}".format(self.prefix, name).replace("_", "."), value=value,
+                                     timestamp=timestamp, tags=dict(tags or {}, **dict(key))))
+        return docs
+
+
+class MetricsServer:
+    """Lightweight HTTP server that exposes the metrics of a registry on the '/metrics' endpoint."""
+
+    def __init__(self, registry, port, address="0.0.0.0"):
+        registry_to_render = registry
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_to_render.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Avoid logging every scrape
+                pass
+
+        self.port = port
+        self.server = ThreadingHTTPServer((address, port), MetricsRequestHandler)
+        self.server.daemon_threads = True
+        self.thread = Thread(name="metrics_server", target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
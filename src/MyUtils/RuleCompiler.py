@@ -0,0 +1,259 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import print_function
+
+import time
+from threading import Lock
+
+import json_logic
+from json_logic import jsonLogic, is_logic
+
+NUMERIC_TYPES = (int, float)
+
+
+def _get_values(logic, operator):
+    values = logic[operator]
+    # Unary operators may be written without the list, e.g., {"var": "x"} instead of {"var": ["x"]}
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    return values
+
+
+def _interpreted(logic):
+    def evaluate(data):
+        return jsonLogic(logic, data)
+    return evaluate
+
+
+def _compile_var(values):
+    if not values or any(isinstance(v, (dict, list, tuple)) for v in values):
+        # Variable names computed from other operations are left to the interpreter
+        return None
+
+    var_name = values[0]
+    default = values[1] if len(values) > 1 else None
+    if var_name is None or var_name == '':
+        return lambda data: data
+
+    keys = str(var_name).split('.')
+
+    def get_var(data):
+        try:
+            for key in keys:
+                try:
+                    data = data[key]
+                except TypeError:
+                    data = data[int(key)]
+        except (KeyError, TypeError, ValueError):
+            return default
+        return data
+    return get_var
+
+
+FAST_COMPARISONS = {
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+
+
+def _compile_comparison(operator, arguments):
+    operation = json_logic.operations[operator]
+    if len(arguments) != 2:
+        return lambda data: operation(*[f(data) for f in arguments])
+
+    left, right = arguments
+    fast_operation = FAST_COMPARISONS[operator]
+
+    def compare(data):
+        a, b = left(data), right(data)
+        # Fast path for plain numbers, otherwise rely on the JsonLogic type coercion
+        if type(a) in NUMERIC_TYPES and type(b) in NUMERIC_TYPES:
+            return fast_operation(a, b)
+        return operation(a, b)
+    return compare
+
+
+def compile_logic(logic):
+    """Compile a JsonLogic rule into a Python closure that evaluates it with the same semantics as the 'jsonLogic'
+    interpreter. The rule tree is walked only once, so that repeated evaluations avoid dispatching on the operator
+    names. Operators that are not supported by the compiler (e.g., scoped operations such as 'map' or custom
+    operations) fall back to the interpreter for their subtree.
+
+    Args:
+        logic (dict): The JsonLogic rule
+
+    Returns:
+        (function) A closure that takes the data dictionary and returns the rule result
+    """
+    if isinstance(logic, (list, tuple)):
+        fns = [compile_logic(sublogic) for sublogic in logic]
+        return lambda data: [f(data) for f in fns]
+
+    if not is_logic(logic):
+        return lambda data: logic
+
+    operator = str(next(iter(logic.keys())))
+    values = _get_values(logic, operator)
+
+    if operator == "and" or operator == "or":
+        fns = [compile_logic(v) for v in values]
+        stop_on_truthy = operator == "or"
+
+        def logical(data):
+            current = False
+            for f in fns:
+                current = f(data)
+                if bool(current) == stop_on_truthy:
+                    return current
+            return current
+        return logical
+
+    if operator == "if" or operator == "?:":
+        fns = [compile_logic(v) for v in values]
+
+        def conditional(data):
+            for i in range(0, len(fns) - 1, 2):
+                if fns[i](data):
+                    return fns[i + 1](data)
+            if len(fns) % 2:
+                return fns[-1](data)
+            return None
+        return conditional
+
+    if operator == "var":
+        fn = _compile_var(values)
+        return fn if fn else _interpreted(logic)
+
+    if operator in FAST_COMPARISONS:
+        return _compile_comparison(operator, [compile_logic(v) for v in values])
+
+    if operator in ("!", "!!", "+", "-", "*", "/", "%", "min", "max", "in", "cat"):
+        operation = json_logic.operations[operator]
+        fns = [compile_logic(v) for v in values]
+        return lambda data: operation(*[f(data) for f in fns])
+
+    # Unknown or unsupported operator, use the interpreter
+    return _interpreted(logic)
+
+
+class RuleCompiler:
+    """
+    Cache of compiled rules, each rule document is compiled the first time it is evaluated and recompiled only when its
+    revision changes.
+    """
+
+    def __init__(self):
+        self.__compiled_rules = dict()
+        self.__lock = Lock()
+
+    def get_compiled_rule(self, rule):
+        """Get the compiled closure of a rule document, compiling it if needed. Rules without an '_id' and a '_rev'
+        can't be safely cached, so they are compiled every time.
+
+        Args:
+            rule (dict): A rule document as stored in the 'rules' database
+
+        Returns:
+            (function) The closure that evaluates the rule
+        """
+        rule_id, rule_rev = rule.get("_id"), rule.get("_rev")
+        if rule_id is None or rule_rev is None:
+            return compile_logic(rule["rule"])
+
+        cached = self.__compiled_rules.get(rule_id)
+        if cached and cached[0] == rule_rev:
+            return cached[1]
+
+        compiled = compile_logic(rule["rule"])
+        with self.__lock:
+            self.__compiled_rules[rule_id] = (rule_rev, compiled)
+        return compiled
+
+    def evaluate(self, rule, data):
+        return self.get_compiled_rule(rule)(data or {})
+
+    def clear(self):
+        with self.__lock:
+            self.__compiled_rules.clear()
+
+
+rule_compiler = RuleCompiler()
+
+
+def evaluate_rule(rule, data):
+    """Evaluate a rule document against the data using the shared compiled rules cache."""
+    return rule_compiler.evaluate(rule, data)
+
+
+def benchmark(rules, data, iterations=10000):
+    """Compare the evaluation time of the compiled rules against the 'jsonLogic' interpreter.
+
+    Args:
+        rules (list): The rule documents to evaluate
+        data (dict): The data used to evaluate the rules
+        iterations (integer): The number of times every rule is evaluated
+
+    Returns:
+        (tuple[float,float]) The time in seconds spent by the interpreter and by the compiled rules
+    """
+    compiler = RuleCompiler()
+    for rule in rules:
+        if compiler.evaluate(rule, data) != jsonLogic(rule["rule"], data):
+            raise ValueError("Compiled rule {0} gives a different result than the interpreter".format(rule["name"]))
+
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        for rule in rules:
+            jsonLogic(rule["rule"], data)
+    t1 = time.perf_counter()
+    for _ in range(iterations):
+        for rule in rules:
+            compiler.evaluate(rule, data)
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1
+
+
+if __name__ == "__main__":
+    import conf.StateDatabase.rules as default_rules
+
+    rules = [dict(r, _rev="1") for r in [default_rules.cpu_exceeded_upper, default_rules.cpu_dropped_lower,
+                                         default_rules.mem_exceeded_upper, default_rules.mem_dropped_lower,
+                                         default_rules.cpu_usage_low, default_rules.cpu_usage_high]]
+    data = {"cpu": {"structure": {"cpu": {"usage": 120, "current": 200, "max": 300, "min": 50}},
+                    "limits": {"cpu": {"upper": 150, "lower": 100, "boundary": 25}}},
+            "mem": {"structure": {"mem": {"usage": 1024, "current": 4096, "max": 8192, "min": 256}},
+                    "limits": {"mem": {"upper": 3072, "lower": 2048, "boundary": 1024}}}}
+    iterations = 20000
+    interpreted_time, compiled_time = benchmark(rules, data, iterations)
+    evaluations = iterations * len(rules)
+    print("jsonLogic interpreter: {0:.3f} s ({1:.2f} us/rule)".format(interpreted_time, 1e6 * interpreted_time / evaluations))
+    print("Compiled rules:        {0:.3f} s ({1:.2f} us/rule)".format(compiled_time, 1e6 * compiled_time / evaluations))
+    print("Speedup: {0:.1f}x".format(interpreted_time / compiled_time))
@@ -0,0 +1,163 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import print_function
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+
+from src.MyUtils.MyUtils import log_warning
+
+
+class WorkerPool:
+    """
+    Persistent and bounded pool of worker threads, meant to be reused across the epochs of a service instead of
+    spawning a thread per operation. It keeps counters of the queue depth and of the latency of the tasks.
+    """
+    __POLL_INTERVAL = 0.1
+
+    def __init__(self, max_workers, name="worker"):
+        self.max_workers = max_workers
+        self.name = name
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.__lock = Lock()
+        self.__submitted, self.__started, self.__completed, self.__failed, self.__timed_out = 0, 0, 0, 0, 0
+        self.__cancelled = 0
+        self.__latency_sum, self.__latency_max = 0.0, 0.0
+
+    def resize(self, max_workers):
+        """Replace the pool with a new one if the number of workers has changed. Tasks already submitted to the old
+        pool are left to finish."""
+        if max_workers != self.max_workers:
+            old_executor = self.__executor
+            self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.name)
+            self.max_workers = max_workers
+            old_executor.shutdown(wait=False)
+
+    def shutdown(self, wait_tasks=True):
+        self.__executor.shutdown(wait=wait_tasks)
+
+    def __run_task(self, task_info, fn, args):
+        task_info["start"] = time.monotonic()
+        with self.__lock:
+            self.__started += 1
+        failed = False
+        try:
+            return fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            latency = time.monotonic() - task_info["start"]
+            with self.__lock:
+                self.__completed += 1
+                self.__latency_sum += latency
+                self.__latency_max = max(self.__latency_max, latency)
+                if failed:
+                    self.__failed += 1
+
+    def submit(self, name, fn, *args):
+        """Submit a task to the pool
+
+        Args:
+            name (string): A name that identifies the task (e.g., the structure name), used for logging purposes
+            fn (function): The function to run
+            args: The arguments for the function
+
+        Returns:
+            (Future) The future of the submitted task
+        """
+        task_info = {"name": name, "start": None}
+        with self.__lock:
+            self.__submitted += 1
+        future = self.__executor.submit(self.__run_task, task_info, fn, args)
+        future.task_info = task_info
+        return future
+
+    def join(self, futures, deadline, debug):
+        """Wait for the tasks to finish, but do not wait for the tasks that have been running for longer than the
+        deadline, so that a single slow task doesn't delay the whole join. Such tasks are left running in the
+        background and are reported. If no task starts or finishes for longer than the deadline (e.g., all the workers
+        are busy with late tasks of a previous join), the tasks that have not started yet are cancelled and reported
+        too, so that the join never blocks forever.
+
+        Args:
+            futures (list): The futures of the tasks to wait for
+            deadline (float): The maximum time in seconds a single task is waited for once it has started
+            debug (boolean): Whether to print the warnings
+
+        Returns:
+            (list) The names of the tasks that exceeded the deadline
+        """
+        late_tasks = list()
+        pending = set(futures)
+        last_progress = time.monotonic()
+        started = sum(1 for future in pending if future.task_info["start"] is not None)
+        while pending:
+            done, pending = wait(pending, timeout=self.__POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            now_started = sum(1 for future in pending if future.task_info["start"] is not None)
+            if done or now_started > started:
+                last_progress = now
+            started = now_started
+
+            stalled = now - last_progress > deadline
+            for future in list(pending):
+                start = future.task_info["start"]
+                if start is None and stalled and future.cancel():
+                    with self.__lock:
+                        self.__cancelled += 1
+                    log_warning("Task {0} couldn't start within the deadline of {1} seconds, cancelled".format(
+                        future.task_info["name"], deadline), debug)
+                elif start is not None and now - start > deadline:
+                    log_warning("Task {0} exceeded the deadline of {1} seconds, not waiting for it".format(
+                        future.task_info["name"], deadline), debug)
+                else:
+                    continue
+                pending.remove(future)
+                late_tasks.append(future.task_info["name"])
+
+        with self.__lock:
+            self.__timed_out += len(late_tasks)
+        return late_tasks
+
+    def get_stats(self):
+        """Get the counters of the pool
+
+        Returns:
+            (dict) The queue depth, the number of running, completed, failed and timed out tasks and the average and
+            maximum latency in seconds of the completed tasks
+        """
+        with self.__lock:
+            return dict(
+                queue_depth=self.__submitted - self.__started - self.__cancelled,
+                running=self.__started - self.__completed,
+                completed=self.__completed,
+                failed=self.__failed,
+                timed_out=self.__timed_out,
+                latency_avg=self.__latency_sum / self.__completed if self.__completed else 0.0,
+                latency_max=self.__latency_max)
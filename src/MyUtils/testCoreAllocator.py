@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import random
+from unittest import TestCase
+
+from src.MyUtils.CoreAllocator import CoreAllocator
+
+
+def sorted_allocate(core_map, num_cores, cont_name, shares, cpu_list):
+    # Previous allocation of the Scaler, scanning and sorting the whole core mapping
+    host_cpu_list = [str(i) for i in range(num_cores)]
+    for core in host_cpu_list:
+        core_map[core].setdefault(cont_name, 0)
+    used_cores = list(cpu_list)
+    needed_shares = shares
+    for core in cpu_list:
+        if core_map[core]["free"] > 0:
+            if core_map[core]["free"] > needed_shares:
+                core_map[core]["free"] -= needed_shares
+                core_map[core][cont_name] += needed_shares
+                needed_shares = 0
+                break
+            else:
+                core_map[core][cont_name] += core_map[core]["free"]
+                needed_shares -= core_map[core]["free"]
+                core_map[core]["free"] = 0
+    if needed_shares > 0:
+        for core in host_cpu_list:
+            if core_map[core]["free"] >= needed_shares:
+                core_map[core]["free"] -= needed_shares
+                core_map[core][cont_name] += needed_shares
+                needed_shares = 0
+                used_cores.append(core)
+                break
+    if needed_shares > 0:
+        for core in sorted(host_cpu_list, key=lambda c: core_map[c]["free"], reverse=True):
+            if core_map[core]["free"] > 0 and needed_shares > 0:
+                taken = min(core_map[core]["free"], needed_shares)
+                core_map[core]["free"] -= taken
+                core_map[core][cont_name] += taken
+                needed_shares -= taken
+                used_cores.append(core)
+    return shares - needed_shares, used_cores
+
+
+def sorted_release(core_map, cont_name, shares, cpu_list):
+    # Previous release of the Scaler, sorting the cores of the container by allocated shares
+    used_cores = list(cpu_list)
+    for core in sorted(cpu_list, key=lambda c: core_map[c].get(cont_name, 0)):
+        allocated = core_map[core].get(cont_name, 0)
+        if allocated <= shares:
+            core_map[core]["free"] += allocated
+            core_map[core][cont_name] = 0
+            shares -= allocated
+            used_cores.remove(core)
+            if shares == 0:
+                break
+        else:
+            core_map[core]["free"] += shares
+            core_map[core][cont_name] -= shares
+            shares = 0
+            break
+    return used_cores
+
+
+def without_zeros(core_map):
+    return {core: {k: v for k, v in usages.items() if k == "free" or v != 0} for core, usages in core_map.items()}
+
+
+class CoreAllocatorTest(TestCase):
+
+    def test_allocate_and_release(self):
+        core_map = {"0": {"node0": 100, "free": 0}, "1": {"node1": 60, "free": 40}, "2": {"free": 100}}
+        allocator = CoreAllocator(core_map, 400)
+
+        # Missing cores are added as free ones
+        TestCase.assertEqual(self, first={"free": 100}, second=core_map["3"])
+        TestCase.assertEqual(self, first="1", second=allocator.find_first_fit(30))
+        TestCase.assertEqual(self, first="2", second=allocator.find_largest())
+
+        # Current cores are filled first, then a single core is looked for
+        TestCase.assertEqual(self, first=(40, ["1"]), second=allocator.allocate("node1", 40, ["1"]))
+        TestCase.assertEqual(self, first=(80, ["0", "2"]), second=allocator.allocate("node0", 80, ["0"]))
+
+        # Finally, the cores with the largest free shares are added
+        TestCase.assertEqual(self, first=(120, ["3", "2"]), second=allocator.allocate("node2", 120))
+        TestCase.assertEqual(self, first={"node0": 80, "node2": 20, "free": 0}, second=core_map["2"])
+
+        # Not enough free shares
+        TestCase.assertEqual(self, first=(0, []), second=allocator.allocate("node3", 10))
+
+        # The less allocated cores are released first
+        TestCase.assertEqual(self, first=["0"], second=allocator.release("node0", 80, ["0", "2"]))
+        TestCase.assertEqual(self, first=["0"], second=allocator.get_container_cores("node0"))
+        with self.assertRaises(ValueError):
+            allocator.release("node3", 10, [])
+
+        TestCase.assertEqual(self, first=120, second=allocator.release_all("node2"))
+        TestCase.assertEqual(self, first=[], second=allocator.get_container_cores("node2"))
+        TestCase.assertEqual(self, first="2", second=allocator.find_largest())
+
+    def test_same_as_sorted_allocation(self):
+        rand = random.Random(0)
+        num_cores = 24
+        containers = ["node{0}".format(i) for i in range(10)]
+        core_map = {str(i): {"free": 100} for i in range(num_cores)}
+        expected_map = copy.deepcopy(core_map)
+        cpu_lists = {c: [] for c in containers}
+        allocator = CoreAllocator(core_map, num_cores * 100)
+
+        for _ in range(2000):
+            container = rand.choice(containers)
+            cpu_list = cpu_lists[container]
+            allocated = sum(allocator.get_container_shares(container, core) for core in cpu_list)
+            if allocated > 0 and rand.random() < 0.5:
+                shares = rand.randint(1, allocated)
+                cpu_lists[container] = allocator.release(container, shares, cpu_list)
+                expected_cores = sorted_release(expected_map, container, shares, cpu_list)
+                TestCase.assertEqual(self, first=expected_cores, second=cpu_lists[container])
+            else:
+                shares = rand.randint(1, 250)
+                result = allocator.allocate(container, shares, cpu_list)
+                TestCase.assertEqual(self, first=sorted_allocate(expected_map, num_cores, container, shares, cpu_list), second=result)
+                cpu_lists[container] = result[1]
+            TestCase.assertEqual(self, first=without_zeros(expected_map), second=without_zeros(core_map))
+
+        # The allocator built from the resulting mapping has the same state
+        rebuilt = CoreAllocator(copy.deepcopy(core_map), num_cores * 100)
+        TestCase.assertEqual(self, first=allocator.allocations, second=rebuilt.allocations)
+        TestCase.assertEqual(self, first=allocator.tree, second=rebuilt.tree)
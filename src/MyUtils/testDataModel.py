@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+
+from src.MyUtils.DataModel import Structure, Limits, Event, Resource
+
+
+class DataModelTest(TestCase):
+
+    def test_structure_round_trip(self):
+        structure = {"_id": "s0", "_rev": "1-a", "type": "structure", "subtype": "host", "name": "host0",
+                     "host": "host0", "resources": {"cpu": {"max": 800, "free": 200,
+                                                            "core_usage_mapping": {"0": {"node0": 100, "free": 0}}},
+                                                    "mem": {"max": 8192, "free": 4096}},
+                     "extra_field": ["a", "b"]}
+        doc = Structure.from_dict(structure)
+        TestCase.assertEqual(self, first=structure, second=doc.to_dict())
+        TestCase.assertEqual(self, first=800, second=doc.resources["cpu"].max)
+        TestCase.assertEqual(self, first=["a", "b"], second=doc.get("extra_field"))
+        TestCase.assertEqual(self, first=None, second=doc.get("guard"))
+
+        # Returned dictionaries are copies
+        copied = doc.to_dict()
+        copied["resources"]["cpu"]["core_usage_mapping"]["0"]["free"] = 100
+        copied["extra_field"].append("c")
+        TestCase.assertEqual(self, first=structure, second=doc.to_dict())
+
+    def test_limits_and_events(self):
+        limits = {"type": "limit", "name": "node0", "resources": {"cpu": {"upper": 150, "lower": 100, "boundary": 25}}}
+        TestCase.assertEqual(self, first=limits, second=Limits.from_dict(limits).to_dict())
+
+        event = {"name": "CpuBottleneck", "resource": "cpu", "type": "event", "structure": "node0",
+                 "action": {"events": {"scale": {"up": 1}}}, "timestamp": 1000}
+        doc = Event.from_dict(event)
+        TestCase.assertEqual(self, first=event, second=doc.to_dict())
+        TestCase.assertEqual(self, first=1000, second=doc.timestamp)
+
+    def test_no_dict(self):
+        with self.assertRaises(AttributeError):
+            Resource.from_dict({"max": 1}).unknown = 1
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import socket
+import urllib.request
+from unittest import TestCase
+
+from src.MyUtils.Metrics import MetricsRegistry, MetricsServer
+
+
+class MetricsTest(TestCase):
+
+    def test_render(self):
+        metrics = MetricsRegistry("guardian")
+        metrics.describe("phase_duration_seconds", "Duration of each phase of an epoch")
+        metrics.observe("phase_duration_seconds", 0.02, {"phase": "usage_query"})
+        metrics.observe("phase_duration_seconds", 3, {"phase": "usage_query"})
+        metrics.inc("requests_total", 2)
+
+        lines = metrics.render().splitlines()
+        TestCase.assertEqual(self, first="# HELP guardian_phase_duration_seconds Duration of each phase of an epoch",
+                             second=lines[0])
+        TestCase.assertEqual(self, first="# TYPE guardian_phase_duration_seconds histogram", second=lines[1])
+        self.assertIn('guardian_phase_duration_seconds_bucket{phase="usage_query",le="0.01"} 0', lines)
+        self.assertIn('guardian_phase_duration_seconds_bucket{phase="usage_query",le="0.025"} 1', lines)
+        self.assertIn('guardian_phase_duration_seconds_bucket{phase="usage_query",le="5"} 2', lines)
+        self.assertIn('guardian_phase_duration_seconds_bucket{phase="usage_query",le="+Inf"} 2', lines)
+        self.assertIn('guardian_phase_duration_seconds_count{phase="usage_query"} 2', lines)
+        self.assertIn('# TYPE guardian_requests_total counter', lines)
+        self.assertIn('guardian_requests_total 2', lines)
+
+    def test_get_opentsdb_documents(self):
+        metrics = MetricsRegistry("guardian")
+        metrics.observe("structure_phase_duration_seconds", 1, {"phase": "event_io"})
+        metrics.observe("structure_phase_duration_seconds", 3, {"phase": "event_io"})
+        metrics.inc("events_total", 5)
+
+        docs = metrics.get_opentsdb_documents({"service": "guardian"})
+        TestCase.assertEqual(self, first=[("guardian.structure.phase.duration.seconds", 2.0, {"service": "guardian", "phase": "event_io"}),
+                                          ("guardian.events.total", 5, {"service": "guardian"})],
+                             second=[(d["metric"], d["value"], d["tags"]) for d in docs])
+
+        # Histograms are averaged over the values observed since the previous conversion
+        metrics.observe("structure_phase_duration_seconds", 6, {"phase": "event_io"})
+        docs = metrics.get_opentsdb_documents({"service": "guardian"})
+        TestCase.assertEqual(self, first=6.0, second=docs[0]["value"])
+
+        # Histograms without new values are not sent
+        docs = metrics.get_opentsdb_documents({"service": "guardian"})
+        TestCase.assertEqual(self, first=["guardian.events.total"], second=[d["metric"] for d in docs])
+
+    def test_metrics_server(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+
+        metrics = MetricsRegistry("guardian")
+        metrics.inc("requests_total")
+        server = MetricsServer(metrics, port, address="127.0.0.1")
+        server.start()
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:{0}/metrics".format(port)) as r:
+                TestCase.assertEqual(self, first=200, second=r.status)
+                self.assertIn("guardian_requests_total 1", r.read().decode())
+        finally:
+            server.stop()
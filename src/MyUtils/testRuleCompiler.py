@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+
+from json_logic import jsonLogic
+
+from src.MyUtils.RuleCompiler import compile_logic, RuleCompiler
+from src.test.documents.rules import cpu_exceeded_upper, cpu_dropped_lower, mem_exceeded_upper, mem_dropped_lower, \
+    CpuRescaleUp, CpuRescaleDown, energy_exceeded_upper
+
+
+class RuleCompilerTest(TestCase):
+
+    def test_compiled_rules_match_interpreter(self):
+        rules = [cpu_exceeded_upper, cpu_dropped_lower, mem_exceeded_upper, mem_dropped_lower, energy_exceeded_upper]
+        for usage in [0, 50, 100, 150, 199.5, 250, "120", None]:
+            data = {"cpu": {"structure": {"cpu": {"usage": usage, "current": 200, "max": 300, "min": 50}},
+                            "limits": {"cpu": {"upper": 150, "lower": 100}}},
+                    "mem": {"structure": {"mem": {"usage": usage, "current": 200, "max": 300, "min": 50}},
+                            "limits": {"mem": {"upper": 150, "lower": 100}}},
+                    "energy": {"structure": {"energy": {"usage": usage, "max": 120}}}}
+            for rule in rules:
+                TestCase.assertEqual(self, first=jsonLogic(rule["rule"], data), second=compile_logic(rule["rule"])(data))
+
+        for up, down in [(0, 0), (2, 0), (3, 6), (0, 7)]:
+            events = {"events": {"scale": {"up": up, "down": down}}}
+            for rule in [CpuRescaleUp, CpuRescaleDown]:
+                TestCase.assertEqual(self, first=jsonLogic(rule["rule"], events), second=compile_logic(rule["rule"])(events))
+
+    def test_operators(self):
+        data = {"a": 4, "b": [1, 2, 3], "c": {"d": "text"}}
+        for logic in [{"if": [{">": [{"var": "a"}, 3]}, "big", "small"]},
+                      {"or": [{"var": "missing_key"}, {"var": ["missing_key", 7]}]},
+                      {"-": [{"var": "a"}]},
+                      {"/": [{"*": [{"var": "a"}, 3]}, 2]},
+                      {"<": [1, {"var": "a"}, 5]},
+                      {"in": [2, {"var": "b"}]},
+                      {"var": "b.1"},
+                      {"var": ""},
+                      {"!": [{"var": "c.d"}]},
+                      # Not supported by the compiler, should fall back to the interpreter
+                      {"map": [{"var": "b"}, {"*": [{"var": ""}, 2]}]},
+                      {"missing": ["a", "z"]}]:
+            TestCase.assertEqual(self, first=jsonLogic(logic, data), second=compile_logic(logic)(data))
+
+    def test_cache_by_revision(self):
+        compiler = RuleCompiler()
+        rule = {"_id": "rule", "_rev": "1", "rule": {">": [{"var": "x"}, 1]}}
+        compiled = compiler.get_compiled_rule(rule)
+        self.assertIs(compiled, compiler.get_compiled_rule(dict(rule)))
+        self.assertTrue(compiler.evaluate(rule, {"x": 2}))
+
+        # A new revision of the rule has to be compiled again
+        rule = {"_id": "rule", "_rev": "2", "rule": {"<": [{"var": "x"}, 1]}}
+        self.assertIsNot(compiled, compiler.get_compiled_rule(rule))
+        self.assertFalse(compiler.evaluate(rule, {"x": 2}))
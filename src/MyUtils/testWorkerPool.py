@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from unittest import TestCase
+
+from src.MyUtils.WorkerPool import WorkerPool
+
+
+class WorkerPoolTest(TestCase):
+
+    def test_join_and_stats(self):
+        pool = WorkerPool(2, name="test_worker")
+        results = list()
+        futures = [pool.submit(str(i), results.append, i) for i in range(10)]
+        TestCase.assertEqual(self, first=[], second=pool.join(futures, 5, False))
+        TestCase.assertEqual(self, first=list(range(10)), second=sorted(results))
+
+        stats = pool.get_stats()
+        TestCase.assertEqual(self, first=0, second=stats["queue_depth"])
+        TestCase.assertEqual(self, first=10, second=stats["completed"])
+        TestCase.assertEqual(self, first=0, second=stats["failed"])
+        pool.shutdown()
+
+    def test_deadline(self):
+        pool = WorkerPool(2, name="test_worker")
+        futures = [pool.submit("slow", time.sleep, 2), pool.submit("fast", time.sleep, 0)]
+        t0 = time.time()
+        TestCase.assertEqual(self, first=["slow"], second=pool.join(futures, 0.3, False))
+        self.assertLess(time.time() - t0, 1.5)
+        TestCase.assertEqual(self, first=1, second=pool.get_stats()["timed_out"])
+        pool.shutdown()
+
+    def test_stalled_pool(self):
+        pool = WorkerPool(1, name="test_worker")
+        pool.join([pool.submit("stuck", time.sleep, 2)], 0.1, False)
+
+        # The only worker is busy with a late task of a previous join, so the queued task is cancelled
+        results = list()
+        future = pool.submit("queued", results.append, 1)
+        t0 = time.time()
+        TestCase.assertEqual(self, first=["queued"], second=pool.join([future], 0.3, False))
+        self.assertLess(time.time() - t0, 1.5)
+        self.assertTrue(future.cancelled())
+        TestCase.assertEqual(self, first=0, second=pool.get_stats()["queue_depth"])
+        pool.shutdown()
+        TestCase.assertEqual(self, first=[], second=results)
+
+    def test_resize(self):
+        pool = WorkerPool(2, name="test_worker")
+        pool.resize(4)
+        TestCase.assertEqual(self, first=4, second=pool.max_workers)
+        future = pool.submit("task", sum, [1, 2])
+        pool.join([future], 5, False)
+        TestCase.assertEqual(self, first=3, second=future.result())
+        pool.shutdown()
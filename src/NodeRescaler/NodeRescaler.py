@@ -121,6 +121,22 @@ def set_container_resources(container_name):
         abort(400)
 
 
+@node_rescaler.route("/containers", methods=['PUT'])
+@initialize_ContainerEngine
+def set_containers_resources():
+    # Set the resources of several containers in a single call, the results are reported per container and, unlike
+    # when setting the resources of a single container, the resulting resources are not retrieved again
+    containers_resources = request.json
+    if not isinstance(containers_resources, dict):
+        return abort(400)
+
+    results = dict()
+    for container_name, resources in containers_resources.items():
+        success, applied_config = node_resource_manager.set_node_resources(container_name, resources)
+        results[container_name] = {"success": success, "resources": applied_config}
+    return Response(json.dumps(results), status=201, mimetype='application/json')
+
+
 @node_rescaler.route("/container/<container_name>", methods=['GET'])
 @initialize_ContainerEngine
 def get_container_resources(container_name):
@@ -23,6 +23,7 @@
 # You should have received a copy of the GNU General Public License
 # along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
 
+import logging
 import os
 
 import urllib3
@@ -74,7 +75,7 @@ class LXDContainerManager:
         if not devices:
             return True, []
         else:
-            return cgroups_get_node_disks(container.name, devices)
+            return cgroups_get_node_disks(container.name, devices, self.container_engine)
 
     def get_node_networks(self, container):
         networks = container.state().network
@@ -152,21 +153,22 @@ class LXDContainerManager:
                 mem_success, mem_resources = get_node_mem(node_name, self.container_engine)
                 node_dict[DICT_MEM_LABEL] = mem_resources
 
-                # disk_success, disk_resources = self.get_node_disks(container)  # LXD Dependent
-                # if type(disk_resources) == list and len(disk_resources) > 0:
-                #     node_dict[DICT_DISK_LABEL] = disk_resources[0]
-                # elif disk_resources:
-                #     node_dict[DICT_DISK_LABEL] = disk_resources
-                # else:
-                #     node_dict[DICT_DISK_LABEL] = []
-                # # TODO support multiple disks
-                #
-                # net_success, net_resources = self.get_node_networks(container)  # LXD Dependent
-                # if net_resources:
-                #     node_dict[DICT_NET_LABEL] = net_resources[0]
-                # else:
-                #     node_dict[DICT_NET_LABEL] = []
-                # # TODO support multiple networks
+                # Only the first disk and network are reported and can be rescaled, if the tools used to get their
+                # limits (e.g., tc) are not available the rest of the resources are still reported
+                # TODO support multiple disks and networks
+                try:
+                    disk_success, disk_resources = self.get_node_disks(container)  # LXD Dependent
+                    if disk_success and disk_resources:
+                        node_dict[DICT_DISK_LABEL] = disk_resources[0]
+                except OSError as e:
+                    logging.error("Couldn't get the disks of container {0}: {1}".format(node_name, str(e)))
+
+                try:
+                    net_success, net_resources = self.get_node_networks(container)  # LXD Dependent
+                    if net_success and net_resources:
+                        node_dict[DICT_NET_LABEL] = net_resources[0]
+                except OSError as e:
+                    logging.error("Couldn't get the networks of container {0}: {1}".format(node_name, str(e)))
 
                 return node_dict
             else:
@@ -337,44 +337,25 @@ def set_node_disk(container_id, disk_resource, container_engine):
     major = disk_resource["major"]
     minor = disk_resource["minor"]
 
-    if DISK_WRITE_LIMIT_LABEL in disk_resource:
-        limit_write = disk_resource[DISK_WRITE_LIMIT_LABEL]
+    # The limits are given in MB/s, as reported by get_node_disks, and are applied to the same files they are read
+    # from, so that the limits read afterwards are the ones set
+    limit_files = [(DISK_READ_LIMIT_LABEL, "blkio.throttle.read_bps_device"),
+                   (DISK_WRITE_LIMIT_LABEL, "blkio.throttle.write_bps_device")]
+    for label, cgroup_file in limit_files:
+        if label not in disk_resource:
+            continue
         try:
-            # TODO FIX the path issue
-            # TODO and use function to differentiate between container engines
-            # set_bandwidth_script_path = "/".join([os.getcwd(), "NodeRescaler"])
-            set_bandwidth_script_path = "/".join([os.getcwd()])
-            set_disk_bandwidth = subprocess.Popen(
-                ["/bin/bash", "{0}/set_bandwidth.sh".format(set_bandwidth_script_path), container_id,
-                 "{0}:{1}".format(major, minor),
-                 limit_write], stderr=subprocess.PIPE)
-            out, err = set_disk_bandwidth.communicate()
-            if set_disk_bandwidth.returncode == 0:
-                pass
-            else:
-                return False, {"error": "exit code of set_disk_bandwidth was: {0} with error message: {1}".format(str(
-                    set_disk_bandwidth.returncode), str(err))}
-        except subprocess.CalledProcessError as e:
-            return False, {"error": str(e)}
-
-    # blkio_path = "/".join([CGROUP_PATH, "blkio", "lxc", container_id])
-    # if DISK_READ_LIMIT_LABEL in disk_resource:
-    #     limit_read = disk_resource[DISK_READ_LIMIT_LABEL]
-    #     devices_read_limit_path = blkio_path + "/blkio.throttle.read_bps_device"
-    #
-    #     op = write_cgroup_file_value(devices_read_limit_path, str(major + ":" + minor + " " + limit_read))
-    #     if not op["success"]:
-    #         # Something happened
-    #         return False, op
-    #
-    # if DISK_WRITE_LIMIT_LABEL in disk_resource:
-    #     limit_write = disk_resource[DISK_WRITE_LIMIT_LABEL]
-    #     devices_write_limit_path = blkio_path + "/blkio.throttle.write_bps_device"
-    #
-    #     op = write_cgroup_file_value(devices_write_limit_path, str(major + ":" + minor + " " + limit_write))
-    #     if not op["success"]:
-    #         # Something happened
-    #         return False, op
+            limit = int(disk_resource[label])
+        except ValueError:
+            return False, {"error": "Bad {0} value: {1}".format(label, disk_resource[label])}
+
+        # A limit of 0 removes the throttling of the device
+        limit_bytes = 0 if limit == -1 else limit * 1048576
+        limit_path = get_cgroup_file_path(container_id, "blkio", cgroup_file, container_engine)
+        op = write_cgroup_file_value(limit_path, "{0}:{1} {2}".format(major, minor, limit_bytes))
+        if not op["success"]:
+            # Something happened
+            return False, op
 
     # Nothing bad happened
     return True, disk_resource
@@ -399,10 +380,10 @@ def get_device_major_minor(device_path):
     return None
 
 
-def get_node_disks(container_id, devices):
+def get_node_disks(container_id, devices, container_engine="lxc"):
     SKIP_DISKS = ["bdev", "development", "production", "root"]
     retrieved_disks = list()
-    limits_read, limits_write = get_node_disk_limits(container_id)
+    limits_read, limits_write = get_node_disk_limits(container_id, container_engine)
     for device in devices.keys():
         # TODO FIX, ignored devices should be obtained from a file
         if device in SKIP_DISKS:
@@ -133,7 +133,7 @@ def change_policy_rule(rule_name):
     put_done = rule["rescale_policy"] == rescale_policy
     tries = 0
 
-    if rescale_policy not in ["amount", "proportional"]:
+    if rescale_policy not in ["amount", "proportional", "forecast", "pid"]:
         return abort(400, {"message": "Invalid policy"})
     else:
         while not put_done:
@@ -151,6 +151,37 @@ def change_policy_rule(rule_name):
 
 
 
+@rules_routes.route("/rule/<rule_name>/gains", methods=['PUT'])
+def change_gains_rule(rule_name):
+    rule = retrieve_rule(rule_name)
+
+    if rule["generates"] != "requests":
+        return abort(400, {"message": "This rule can't have its gains changed"})
+
+    try:
+        gains = {gain: float(request.json[gain]) for gain in ["kp", "ki", "kd"] if gain in request.json}
+    except (KeyError, TypeError, ValueError):
+        return abort(400, {"message": "Invalid gains"})
+    if not gains or any(value < 0 for value in gains.values()):
+        return abort(400, {"message": "Invalid gains, only 'kp', 'ki' and 'kd' of 0 or greater are valid"})
+
+    put_done = all(rule.get(gain) == value for gain, value in gains.items())
+    tries = 0
+
+    while not put_done:
+        tries += 1
+        rule = retrieve_rule(rule_name)
+        rule.update(gains)
+        get_db().update_rule(rule)
+
+        time.sleep(BACK_OFF_TIME_MS / 1000)
+        rule = retrieve_rule(rule_name)
+        put_done = all(rule.get(gain) == value for gain, value in gains.items())
+        if tries >= MAX_TRIES:
+            return abort(400, {"message": "MAX_TRIES updating database document"})
+    return jsonify(201)
+
+
 @rules_routes.route("/rule/<rule_name>/events_required", methods=['PUT'])
 def change_event_up_amount(rule_name):
     put_done = False
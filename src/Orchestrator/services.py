@@ -92,7 +92,7 @@ def set_service_value(service_name, key):
         pass
     elif isinstance(value, list):
         pass
-    elif key == "ENERGY_MODEL_NAME":
+    elif key == "ENERGY_MODEL_NAME" or key == "ENGINE":
         pass
     else:
         try:
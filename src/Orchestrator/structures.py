@@ -32,6 +32,7 @@ import time
 
 import src.Scaler.Scaler
 from src.MyUtils import MyUtils
+from src.MyUtils.CoreAllocator import CoreAllocator
 from src.MyUtils.MyUtils import valid_resource, get_host_containers
 from src.Orchestrator.utils import get_db, BACK_OFF_TIME_MS, MAX_TRIES
 from src.Scaler import Scaler
@@ -337,15 +338,9 @@ def desubscribe_container_from_app(structure_name, app_name):
 
 
 def free_container_cores(cont_name, host):
-    core_map = host["resources"]["cpu"]["core_usage_mapping"]
-    freed_shares = 0
-    for core in core_map:
-        if cont_name in core_map[core]:
-            core_shares = core_map[core][cont_name]
-            freed_shares += core_shares
-            core_map[core][cont_name] = 0
-            core_map[core]["free"] += core_shares
-    host["resources"]["cpu"]["core_usage_mapping"] = core_map
+    allocator = CoreAllocator.from_host(host)
+    freed_shares = allocator.release_all(cont_name)
+    host["resources"]["cpu"]["core_usage_mapping"] = allocator.to_core_usage_mapping()
     host["resources"]["cpu"]["free"] += freed_shares
 
 
@@ -418,55 +413,15 @@ def desubscribe_container(structure_name):
 
 
 def map_container_to_host_cores(cont_name, host, needed_shares):
-    core_map = host["resources"]["cpu"]["core_usage_mapping"]
-    host_max_cores = int(host["resources"]["cpu"]["max"] / 100)
-    host_cpu_list = [str(i) for i in range(host_max_cores)]
-
-    pending_shares = needed_shares
-    used_cores = list()
-
-    # Try to satisfy the request by looking and adding a single core
-    for core in host_cpu_list:
-        if core_map[core]["free"] >= pending_shares:
-            core_map[core]["free"] -= pending_shares
-            core_map[core][cont_name] = pending_shares
-            pending_shares = 0
-            used_cores.append(core)
-            break
-
-    # Finally, if unsuccessful, add as many cores as necessary, starting with the
-    # ones with the largest free shares to avoid too much spread
-    if pending_shares > 0:
-        l = list()
-        for core in host_cpu_list:
-            l.append((core, core_map[core]["free"]))
-        l.sort(key=lambda tup: tup[1], reverse=True)  # Sort by free shares
-        less_used_cores = [i[0] for i in l]
-
-        for core in less_used_cores:
-            # If this core has free shares
-            if core_map[core]["free"] > 0 and pending_shares > 0:
-                if cont_name not in core_map[core]:
-                    core_map[core][cont_name] = 0
-
-                # If it has more free shares than needed, assign them and finish
-                if core_map[core]["free"] >= pending_shares:
-                    core_map[core]["free"] -= pending_shares
-                    core_map[core][cont_name] += pending_shares
-                    pending_shares = 0
-                    used_cores.append(core)
-                    break
-                else:
-                    # Otherwise, assign as many as possible and continue
-                    core_map[core][cont_name] += core_map[core]["free"]
-                    pending_shares -= core_map[core]["free"]
-                    core_map[core]["free"] = 0
-                    used_cores.append(core)
-
-    if pending_shares > 0:
+    # Try to satisfy the request with a single core and, if unsuccessful, add as many cores as necessary, starting
+    # with the ones with the largest free shares to avoid too much spread
+    allocator = CoreAllocator.from_host(host)
+    allocated_shares, used_cores = allocator.allocate(cont_name, needed_shares)
+
+    if allocated_shares < needed_shares:
         return abort(400, {"message": "Container host does not have enough free CPU shares as requested"})
 
-    host["resources"]["cpu"]["core_usage_mapping"] = core_map
+    host["resources"]["cpu"]["core_usage_mapping"] = allocator.to_core_usage_mapping()
     host["resources"]["cpu"]["free"] -= needed_shares
 
     return used_cores
@@ -492,12 +447,22 @@ def map_container_to_host_disks(container, host):
             host["resources"]["disks"][i]["load"] = new_disk_load
 
 
-def map_container_to_host_resources(container, host):
+def map_container_to_host_network(container, container_resources):
+    # The network bandwidth of the hosts is not accounted for, the limit is set on the host interface of the container
+    if not container_resources or "net" not in container_resources or "device_name_in_host" not in container_resources["net"]:
+        return abort(400, {"message": "Container host does not report a network interface for container '{0}'".format(container["name"])})
+    return {"device_name_in_host": container_resources["net"]["device_name_in_host"],
+            "net_limit": container["resources"]["net"]["current"]}
+
+
+def map_container_to_host_resources(container, host, container_resources=None):
     cont_name = container["name"]
     resource_dict = {}
     for resource in container["resources"]:
         if resource == 'disk':
             map_container_to_host_disks(container, host)
+        elif resource == 'net':
+            resource_dict[resource] = map_container_to_host_network(container, container_resources)
         else:
             resource_dict[resource] = {}
             needed_amount = container["resources"][resource]["current"]
@@ -554,13 +519,16 @@ def check_resources_data_is_present(data, res_info_type=None):
                 return abort(400, {"message": "Missing '{0}' {1} resource information".format(resource, res_info)})
 
 
-def get_resource_keys_from_requested_structure(req_structure, structure, resource, keys):
+def get_resource_keys_from_requested_structure(req_structure, structure, resource, keys, optional_keys=None):
     structure["resources"][resource] = {}
     for key in keys:
         if key not in req_structure["resources"][resource]:
             return abort(400, {"message": "Missing key '{0}' for '{1}' resource".format(key, resource)})
         else:
             structure["resources"][resource][key] = req_structure["resources"][resource][key]
+    for key in optional_keys or []:
+        if key in req_structure["resources"][resource]:
+            structure["resources"][resource][key] = req_structure["resources"][resource][key]
 
 
 @structure_routes.route("/structure/container/<structure_name>", methods=['PUT'])
@@ -596,9 +564,11 @@ def subscribe_container(structure_name):
     # Get data corresponding to container resources
     container["resources"] = {}
     resource_keys = ["max", "min", "current", "guard"]
-    keys = {"cpu": resource_keys, "mem": resource_keys, "energy": resource_keys, "disk": ["name", "path"]}
+    keys = {"cpu": resource_keys, "mem": resource_keys, "energy": resource_keys, "disk": ["name", "path"], "net": resource_keys}
+    # Disk bandwidth is only guarded if its values are given
+    optional_keys = {"disk": resource_keys}
     for resource in req_cont["resources"]:
-        get_resource_keys_from_requested_structure(req_cont, container, resource, keys[resource])
+        get_resource_keys_from_requested_structure(req_cont, container, resource, keys[resource], optional_keys.get(resource))
 
     # Get data corresponding to container resource limits
     limits = {"resources": {}}
@@ -616,7 +586,7 @@ def subscribe_container(structure_name):
     # Get the host info
     host = get_db().get_structure(container["host"])
 
-    resource_dict = map_container_to_host_resources(container, host)
+    resource_dict = map_container_to_host_resources(container, host, host_containers[container["name"]])
     Scaler.set_container_resources(node_scaler_session, container, resource_dict, True)
 
     get_db().add_structure(container)
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+from unittest import TestCase
+
+from flask import Flask, g
+
+import src.Orchestrator.rules as rules
+
+
+class FakeDatabase:
+    def __init__(self, rules_docs):
+        self.rules = {rule["name"]: rule for rule in rules_docs}
+
+    def get_rule(self, rule_name):
+        if rule_name not in self.rules:
+            raise ValueError("Rule {0} not found".format(rule_name))
+        return copy.deepcopy(self.rules[rule_name])
+
+    def update_rule(self, rule):
+        self.rules[rule["name"]] = copy.deepcopy(rule)
+
+
+class RulesTest(TestCase):
+
+    def setUp(self):
+        self.db = FakeDatabase([{"name": "CpuRescaleUp", "generates": "requests", "rescale_type": "up",
+                                 "rescale_policy": "amount"}])
+        app = Flask(__name__)
+        app.register_blueprint(rules.rules_routes)
+
+        @app.before_request
+        def set_db():
+            g.db_handler = self.db
+
+        self.client = app.test_client()
+
+    def test_change_policy_rule(self):
+        for policy in ["forecast", "pid", "proportional", "amount"]:
+            r = self.client.put("/rule/CpuRescaleUp/policy", json={"value": policy})
+            TestCase.assertEqual(self, first=200, second=r.status_code)
+            TestCase.assertEqual(self, first=policy, second=self.db.rules["CpuRescaleUp"]["rescale_policy"])
+
+        r = self.client.put("/rule/CpuRescaleUp/policy", json={"value": "unknown"})
+        TestCase.assertEqual(self, first=400, second=r.status_code)
+        TestCase.assertEqual(self, first="amount", second=self.db.rules["CpuRescaleUp"]["rescale_policy"])
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase
+
+from werkzeug.exceptions import BadRequest
+
+from src.Orchestrator.structures import map_container_to_host_resources
+
+
+class StructuresTest(TestCase):
+
+    def test_map_container_network(self):
+        host = {"name": "host0", "resources": {"mem": {"max": 8192, "free": 8192}}}
+        container = {"name": "cont0", "resources": {"mem": {"current": 1024}, "net": {"current": 100}}}
+
+        # The network limit is set on the host interface of the container, the host bandwidth is not accounted for
+        container_resources = {"net": {"device_name_in_container": "eth0", "device_name_in_host": "veth0", "net_limit": -1}}
+        resource_dict = map_container_to_host_resources(container, host, container_resources)
+        TestCase.assertEqual(self, first={"mem": {"mem_limit": 1024}, "net": {"device_name_in_host": "veth0", "net_limit": 100}},
+                             second=resource_dict)
+        TestCase.assertEqual(self, first=7168, second=host["resources"]["mem"]["free"])
+
+        # The container must have a network interface to be limited
+        with self.assertRaises(BadRequest):
+            map_container_to_host_resources(container, host, {"mem": {}})
@@ -27,9 +27,8 @@ import time
 import traceback
 
 import requests
-from json_logic import jsonLogic
-
 from src.MyUtils.MyUtils import log_info, get_config_value, log_error, log_warning, get_structures
+from src.MyUtils.RuleCompiler import evaluate_rule
 from src.ReBalancer.Utils import CONFIG_DEFAULT_VALUES, app_can_be_rebalanced
 from src.StateDatabase import opentsdb
 from src.StateDatabase import couchdb
@@ -97,6 +96,7 @@ class ContainerRebalancer:
 
     def __get_container_donors(self, containers):
         donors = list()
+        rule_low_usage = self.__couchdb_handler.get_rule("cpu_usage_low")
         for container in containers:
             try:
                 data = {"cpu": {"structure": {"cpu": {
@@ -108,13 +108,13 @@ class ContainerRebalancer:
                 continue
 
             # containers that have low resource usage (donors)
-            rule_low_usage = self.__couchdb_handler.get_rule("cpu_usage_low")
-            if jsonLogic(rule_low_usage["rule"], data):
+            if evaluate_rule(rule_low_usage, data):
                 donors.append(container)
         return donors
 
     def __get_container_receivers(self, containers):
         receivers = list()
+        rule_high_usage = self.__couchdb_handler.get_rule("cpu_usage_high")
         for container in containers:
             try:
                 data = {"cpu": {"structure": {"cpu": {
@@ -126,8 +126,7 @@ class ContainerRebalancer:
                 continue
 
             # containers that have a bottleneck (receivers)
-            rule_high_usage = self.__couchdb_handler.get_rule("cpu_usage_high")
-            if jsonLogic(rule_high_usage["rule"], data):
+            if evaluate_rule(rule_high_usage, data):
                 receivers.append(container)
         return receivers
 
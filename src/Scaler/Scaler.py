@@ -34,18 +34,18 @@ import requests
 import traceback
 import logging
 
-from requests import HTTPError
-
 import src.StateDatabase.couchdb as couchDB
 import src.StateDatabase.opentsdb as bdwatchdog
 from src.Guardian.Guardian import Guardian
+from src.MyUtils.CoreAllocator import CoreAllocator
+from src.MyUtils.WorkerPool import WorkerPool
 from src.Snapshoters.StructuresSnapshoter import get_container_resources_dict
 
 from src.MyUtils.MyUtils import MyConfig, log_error, get_service, beat, log_info, log_warning, \
     get_structures, update_structure, generate_request_name, structure_is_application, structure_is_container
 from src.StateDatabase import couchdb
 
-CONFIG_DEFAULT_VALUES = {"POLLING_FREQUENCY": 5, "REQUEST_TIMEOUT": 60, "self.debug": True, "CHECK_CORE_MAP": True, "ACTIVE": True}
+CONFIG_DEFAULT_VALUES = {"POLLING_FREQUENCY": 5, "REQUEST_TIMEOUT": 60, "self.debug": True, "CHECK_CORE_MAP": True, "ACTIVE": True, "MAX_WORKERS": 8}
 SERVICE_NAME = "scaler"
 
 BDWATCHDOG_CONTAINER_METRICS = {"cpu": ['proc.cpu.user', 'proc.cpu.kernel'],
@@ -74,6 +74,18 @@ def set_container_resources(rescaler_http_session, container, resources, debug):
         r.raise_for_status()
 
 
+def set_containers_resources(rescaler_http_session, rescaler_ip, rescaler_port, containers_resources, debug):
+    r = rescaler_http_session.put(
+        "http://{0}:{1}/containers".format(rescaler_ip, rescaler_port),
+        data=json.dumps(containers_resources),
+        headers={'Content-Type': 'application/json', 'Accept': 'application/json'})
+    if r.status_code == 201:
+        return dict(r.json())
+    else:
+        log_error(str(json.dumps(r.json())), debug)
+        r.raise_for_status()
+
+
 class Scaler:
     """
     Scaler class that implements the logic for this microservice.
@@ -86,6 +98,11 @@ class Scaler:
         self.bdwatchdog_handler = bdwatchdog.OpenTSDBServer()
         self.host_info_cache = dict()
         self.container_info_cache = dict()
+        self.core_allocators = dict()
+        self.hosts_new_resources = dict()
+        self.hosts_in_flight = dict()
+        self.request_timeout = CONFIG_DEFAULT_VALUES["REQUEST_TIMEOUT"]
+        self.worker_pool = WorkerPool(CONFIG_DEFAULT_VALUES["MAX_WORKERS"], name="scaler_worker")
         self.apply_request_by_resource = {"cpu": self.apply_cpu_request, "mem": self.apply_mem_request, "disk": self.apply_disk_request, "net": self.apply_net_request}
 
     #### CHECKS ####
@@ -105,6 +122,9 @@ class Scaler:
     def check_host_cpu_limits(self):
         errors_detected = False
         for host in self.host_info_cache.values():
+            # The core map of the hosts still being rescaled is being modified, so it is not checked
+            if host["name"] in self.hosts_in_flight:
+                continue
             all_accounted_shares = 0
             map = host["resources"]["cpu"]["core_usage_mapping"]
             for core in map.values():
@@ -238,19 +258,15 @@ class Scaler:
 
     #### REQUEST MANAGEMENT ####
     def filter_requests(self, request_timeout):
-        fresh_requests, purged_requests, final_requests = list(), list(), list()
-        # Remote database operation
-        all_requests = self.db_handler.get_requests()
-        purged_counter = 0
+        purged_requests, final_requests = list(), list()
+        min_timestamp = time.time() - request_timeout
         duplicated_counter = 0
 
-        # First purge the old requests
-        for request in all_requests:
-            if request["timestamp"] < time.time() - request_timeout:
-                purged_requests.append(request)
-                purged_counter += 1
-            else:
-                fresh_requests.append(request)
+        # First purge the old requests and then retrieve the fresh ones, both filtered by the database
+        # Remote database operation
+        purged_counter = self.db_handler.delete_stale_requests(min_timestamp)
+        # Remote database operation
+        fresh_requests = self.db_handler.get_fresh_requests(min_timestamp)
 
         # Then remove repeated requests for the same structure if found
         structure_requests_dict = {}
@@ -275,7 +291,8 @@ class Scaler:
 
                 duplicated_counter += 1
 
-        self.db_handler.delete_requests(purged_requests)
+        if purged_requests:
+            self.db_handler.delete_requests(purged_requests)
 
         for structure in structure_requests_dict:
             for action in structure_requests_dict[structure]:
@@ -298,12 +315,35 @@ class Scaler:
     ######################################################
 
     #### RESOURCE REQUEST MANAGEMENT ####
-    def process_request(self, request, real_resources, database_resources):
-        # Create a 'fake' container structure with only the required info
-        container = {"host_rescaler_ip": request["host_rescaler_ip"],
-                     "host_rescaler_port": request["host_rescaler_port"],
-                     "name": request["structure"]}
+    def add_new_resources(self, request, new_resources):
+        # Gather the new resources of the containers of the same host, so that they are set through a single call
+        host = request["host"]
+        if host not in self.hosts_new_resources:
+            self.hosts_new_resources[host] = {"host_rescaler_ip": request["host_rescaler_ip"],
+                                              "host_rescaler_port": request["host_rescaler_port"],
+                                              "containers": dict()}
+        container_resources = self.hosts_new_resources[host]["containers"].setdefault(request["structure"], dict())
+        container_resources.update(new_resources)
+
+    def set_host_new_resources(self, host):
+        host_new_resources = self.hosts_new_resources.pop(host, None)
+        if not host_new_resources:
+            return
+
+        # Apply changes through a REST call
+        try:
+            results = set_containers_resources(self.rescaler_http_session, host_new_resources["host_rescaler_ip"],
+                                               host_new_resources["host_rescaler_port"], host_new_resources["containers"], self.debug)
+        except requests.exceptions.RequestException as e:
+            log_error("Error setting resources of containers {0} in host {1} -> {2}".format(
+                list(host_new_resources["containers"].keys()), host, str(e)), self.debug)
+            return
+
+        for container_name in host_new_resources["containers"]:
+            if not results.get(container_name, {}).get("success", False):
+                log_error("Error setting container {0} resources -> {1}".format(container_name, results.get(container_name)), self.debug)
 
+    def process_request(self, request, real_resources, database_resources):
         # Apply the request and get the new resources to set
         try:
             new_resources = self.apply_request(request, real_resources, database_resources)
@@ -311,14 +351,11 @@ class Scaler:
                 log_info("Request: {0} for container : {1} for new resources : {2}".format(
                     request["action"], request["structure"], json.dumps(new_resources)), self.debug)
 
-                # Apply changes through a REST call
-                set_container_resources(self.rescaler_http_session, container, new_resources, self.debug)
+                # The changes are applied later, along with the ones of the other containers of the host
+                self.add_new_resources(request, new_resources)
         except (ValueError) as e:
             log_error("Error with container {0} in applying the request -> {1}".format(request["structure"], str(e)), self.debug)
             return
-        except (HTTPError) as e:
-            log_error("Error setting container {0} resources -> {1}".format(request["structure"], str(e)), self.debug)
-            return
         except (Exception) as e:
             log_error("Error with container {0} -> {1}".format(request["structure"], str(e)), self.debug)
             return
@@ -336,8 +373,9 @@ class Scaler:
         # Check that the resource limit is respected, not lower than min or higher than max
         self.check_invalid_resource_value(database_resources, amount, current_resource_limit, resource)
 
-        if amount > 0:
-            # If the request is for scale up, check that the host has enough free resources before proceeding
+        # If the request is for scale up, check that the host has enough free resources before proceeding, the disk and
+        # network bandwidth of the hosts is not accounted for, so they are not checked
+        if amount > 0 and resource in ["cpu", "mem"]:
             self.check_host_has_enough_free_resources(host_info, amount, resource)
 
         fun = self.apply_request_by_resource[resource]
@@ -345,119 +383,42 @@ class Scaler:
 
         return result
 
+    def get_core_allocator(self, host_name):
+        # The allocator works on the cached host document, so it is rebuilt whenever such document is retrieved again
+        core_usage_map = self.host_info_cache[host_name]["resources"]["cpu"]["core_usage_mapping"]
+        allocator = self.core_allocators.get(host_name)
+        if allocator is None or allocator.core_usage_mapping is not core_usage_map:
+            allocator = CoreAllocator.from_host(self.host_info_cache[host_name])
+            self.core_allocators[host_name] = allocator
+        return allocator
+
     def apply_cpu_request(self, request, database_resources, real_resources, amount):
         resource = request["resource"]
         structure_name = request["structure"]
-        host_info = self.host_info_cache[request["host"]]
-
-        core_usage_map = host_info["resources"][resource]["core_usage_mapping"]
+        allocator = self.get_core_allocator(request["host"])
 
         current_cpu_limit = self.get_current_resource_value(real_resources, resource)
         cpu_list = self.get_cpu_list(real_resources["cpu"]["cpu_num"])
 
-        host_max_cores = int(host_info["resources"]["cpu"]["max"] / 100)
-        host_cpu_list = [str(i) for i in range(host_max_cores)]
-        for core in host_cpu_list:
-            if core not in core_usage_map:
-                core_usage_map[core] = dict()
-                core_usage_map[core]["free"] = 100
-            if structure_name not in core_usage_map[core]:
-                core_usage_map[core][structure_name] = 0
-
         used_cores = list(cpu_list)  # copy
 
         if amount > 0:
             # Rescale up, so look for free shares to assign and maybe add cores
-            needed_shares = amount
-
-            # First fill the already used cores so that no additional cores are added unnecessarily
-            for core in cpu_list:
-                if core_usage_map[core]["free"] > 0:
-                    if core_usage_map[core]["free"] > needed_shares:
-                        core_usage_map[core]["free"] -= needed_shares
-                        core_usage_map[core][structure_name] += needed_shares
-                        needed_shares = 0
-                        break
-                    else:
-                        core_usage_map[core][structure_name] += core_usage_map[core]["free"]
-                        needed_shares -= core_usage_map[core]["free"]
-                        core_usage_map[core]["free"] = 0
-
-            # Next try to satisfy the request by looking and adding a single core
-            if needed_shares > 0:
-                for core in host_cpu_list:
-                    if core_usage_map[core]["free"] >= needed_shares:
-                        core_usage_map[core]["free"] -= needed_shares
-                        core_usage_map[core][structure_name] += needed_shares
-                        needed_shares = 0
-                        used_cores.append(core)
-                        break
+            allocated_shares, used_cores = allocator.allocate(structure_name, amount, cpu_list)
 
-            # Finally, if unsuccessful, add as many cores as necessary, starting with the ones with the largest free shares to avoid too much spread
-            if needed_shares > 0:
-                l = list()
-                for core in host_cpu_list:
-                    l.append((core, core_usage_map[core]["free"]))
-                l.sort(key=lambda tup: tup[1], reverse=True)
-                less_used_cores = [i[0] for i in l]
-
-                for core in less_used_cores:
-                    # If this core has free shares
-                    if core_usage_map[core]["free"] > 0 and needed_shares > 0:
-                        # If it has more free shares than needed, assign them and finish
-                        if core_usage_map[core]["free"] >= needed_shares:
-                            core_usage_map[core]["free"] -= needed_shares
-                            core_usage_map[core][structure_name] += needed_shares
-                            needed_shares = 0
-                            used_cores.append(core)
-                            break
-                        else:
-                            # Otherwise, assign as many as possible and continue
-                            core_usage_map[core][structure_name] += core_usage_map[core]["free"]
-                            needed_shares -= core_usage_map[core]["free"]
-                            core_usage_map[core]["free"] = 0
-                            used_cores.append(core)
-
-            if needed_shares > 0:
+            if allocated_shares < amount:
                 # raise ValueError("Error in setting cpu, couldn't get the resources needed, missing {0} shares".format(needed_shares))
                 log_warning("Structure {0} couldn't get as much CPU shares as intended ({1}), "
-                            "instead it got {2}".format(structure_name, amount, amount - needed_shares), self.debug)
-                amount = amount - needed_shares
+                            "instead it got {2}".format(structure_name, amount, allocated_shares), self.debug)
+                amount = allocated_shares
                 # FIXME couldn't do rescale up properly as shares to get remain
 
         elif amount < 0:
-            # Rescale down so free all shares and claim new one to see how many cores can be freed
-            shares_to_free = abs(amount)
-
-            # First try to find cores with less shares for this structure (less allocated) and remove them
-            l = list()
-            for core in cpu_list:
-                l.append((core, core_usage_map[core][structure_name]))
-            l.sort(key=lambda tup: tup[1], reverse=False)
-            less_allocated_cores = [i[0] for i in l]
-
-            for core in less_allocated_cores:
-                # Equal or less allocated shares than amount to be freed, remove this core altogether and if shares remain to be freed, continue
-                if core_usage_map[core][structure_name] <= shares_to_free:
-                    core_usage_map[core]["free"] += core_usage_map[core][structure_name]
-                    shares_to_free -= core_usage_map[core][structure_name]
-                    core_usage_map[core][structure_name] = 0
-                    used_cores.remove(core)
-                    # In the event that the amount to be freed was equal to the allocated one, finish
-                    if shares_to_free == 0:
-                        break
-                # More allocated shares than amount to be freed, reduce allocation and finish
-                elif core_usage_map[core][structure_name] > shares_to_free:
-                    core_usage_map[core]["free"] += shares_to_free
-                    core_usage_map[core][structure_name] -= shares_to_free
-                    shares_to_free = 0
-                    break
-
-            if shares_to_free > 0:
-                raise ValueError("Error in setting cpu, couldn't free the resources properly")
+            # Rescale down so free the shares of the less allocated cores first to see how many cores can be freed
+            used_cores = allocator.release(structure_name, abs(amount), cpu_list)
 
         # No error thrown, so persist the new mapping to the cache
-        self.host_info_cache[request["host"]]["resources"]["cpu"]["core_usage_mapping"] = core_usage_map
+        self.host_info_cache[request["host"]]["resources"]["cpu"]["core_usage_mapping"] = allocator.to_core_usage_mapping()
         self.host_info_cache[request["host"]]["resources"]["cpu"]["free"] -= amount
 
         resource_dict = {resource: {}}
@@ -482,6 +443,10 @@ class Scaler:
         resource_dict = {request["resource"]: {}}
         current_disk_limit = self.get_current_resource_value(real_resources, request["resource"])
 
+        # The NodeRescaler needs the device to be limited
+        for key in ["major", "minor"]:
+            resource_dict["disk"][key] = real_resources["disk"][key]
+
         # Return the dictionary to set the resources
         resource_dict["disk"]["disk_read_limit"] = str(int(amount + current_disk_limit))
         resource_dict["disk"]["disk_write_limit"] = str(int(amount + current_disk_limit))
@@ -492,6 +457,9 @@ class Scaler:
         resource_dict = {request["resource"]: {}}
         current_net_limit = self.get_current_resource_value(real_resources, request["resource"])
 
+        # The NodeRescaler needs the host interface to be limited
+        resource_dict["net"]["device_name_in_host"] = real_resources["net"]["device_name_in_host"]
+
         # Return the dictionary to set the resources
         resource_dict["net"]["net_limit"] = str(int(amount + current_net_limit))
 
@@ -624,18 +592,21 @@ class Scaler:
 
     def rescale_application(self, request, structure):
 
-        # Get container names that this app uses
+        # Get the containers that this app uses with a single query
         app_containers_names = structure["containers"]
-        app_containers = list()
-
-        for cont_name in app_containers_names:
-            # Get the container
-            container = self.db_handler.get_structure(cont_name)
-            app_containers.append(container)
-
-            # Retrieve host info and cache it in case other containers or applications need it
-            if container["host"] not in self.host_info_cache:
-                self.host_info_cache[container["host"]] = self.db_handler.get_structure(container["host"])
+        # Remote database operation
+        containers = {container["name"]: container for container in self.db_handler.get_structures_by_names(app_containers_names)}
+        app_containers = [containers[cont_name] for cont_name in app_containers_names if cont_name in containers]
+        missing_containers = [cont_name for cont_name in app_containers_names if cont_name not in containers]
+        if missing_containers:
+            log_error("Containers {0} of app {1} not found in database".format(missing_containers, structure["name"]), self.debug)
+
+        # Retrieve the info of the hosts not cached yet and cache it in case other containers or applications need it
+        missing_hosts = list({container["host"] for container in app_containers if container["host"] not in self.host_info_cache})
+        if missing_hosts:
+            # Remote database operation
+            for host in self.db_handler.get_structures_by_names(missing_hosts):
+                self.host_info_cache[host["name"]] = host
 
         total_amount = request["amount"]
 
@@ -654,14 +625,12 @@ class Scaler:
             request["amount"] = remaining_amount
             requests.append(dict(request))
 
-        # Get the request usage for all the containers and cache it
-        resource_usage_cache = dict()
-        for container in app_containers:
-            amount, resource = request["amount"], request["resource"]
-            metrics_to_retrieve = BDWATCHDOG_CONTAINER_METRICS[resource]
-            resource_usage_cache[container["name"]] = self.bdwatchdog_handler.get_structure_timeseries(
-                {"host": container["name"]}, 10, 20,
-                metrics_to_retrieve, RESCALER_CONTAINER_METRICS)
+        # Get the request usage for all the containers with grouped queries and cache it
+        metrics_to_retrieve = BDWATCHDOG_CONTAINER_METRICS[request["resource"]]
+        # Remote database operation
+        resource_usage_cache = self.bdwatchdog_handler.get_structures_timeseries(
+            "host", [container["name"] for container in app_containers], 10, 20,
+            metrics_to_retrieve, RESCALER_CONTAINER_METRICS)
 
         success, iterations = True, 0
         generated_requests = dict()
@@ -712,6 +681,8 @@ class Scaler:
         for key, num in [("POLLING_FREQUENCY", config.get_value("POLLING_FREQUENCY")), ("REQUEST_TIMEOUT", config.get_value("REQUEST_TIMEOUT"))]:
             if num < 5:
                 return True, "Configuration item '{0}' with a value of '{1}' is likely invalid".format(key, num)
+        if config.get_value("MAX_WORKERS") < 1:
+            return True, "Configuration item 'MAX_WORKERS' with a value of '{0}' is likely invalid".format(config.get_value("MAX_WORKERS"))
         return False, ""
 
     def get_cpu_list(self, cpu_num_string):
@@ -728,7 +699,7 @@ class Scaler:
         return cpu_list
 
     def get_current_resource_value(self, real_resources, resource):
-        translation_dict = {"cpu": "cpu_allowance_limit", "mem": "mem_limit"}
+        translation_dict = {"cpu": "cpu_allowance_limit", "mem": "mem_limit", "disk": "disk_write_limit", "net": "net_limit"}
 
         if resource not in translation_dict:
             raise ValueError("Resource '{0}' unknown".format(resource))
@@ -773,6 +744,22 @@ class Scaler:
             # Remove the request from the database
             self.db_handler.delete_request(request)
 
+    def process_host_requests(self, scale_down, scale_up, host=None):
+        # Process first the requests that free resources, then the ones that use them, so that the core map of the
+        # host is changed in the same order as when all the requests are processed serially
+        self.process_requests(scale_down)
+        self.process_requests(scale_up)
+
+        # Set the new resources of all the rescaled containers of the host at once
+        if host is not None:
+            self.set_host_new_resources(host)
+
+    def group_requests_by_host(self, reqs):
+        hosts_requests = dict()
+        for request in reqs:
+            hosts_requests.setdefault(request.get("host"), list()).append(request)
+        return hosts_requests
+
     def split_requests(self, all_requests):
         scale_down, scale_up = list(), list()
         for request in all_requests:
@@ -784,20 +771,38 @@ class Scaler:
                 scale_up.append(request)
         return scale_down, scale_up
 
+    def update_hosts_in_flight(self):
+        """Check the hosts whose requests exceeded the deadline in a previous epoch, persisting the information of the
+        ones whose requests have finished since then so that it is not lost when the host information is retrieved"""
+        for host, future in list(self.hosts_in_flight.items()):
+            if not future.done():
+                continue
+            del self.hosts_in_flight[host]
+            if future.exception():
+                log_error("Error processing requests of host {0}: {1}".format(host, str(future.exception())), self.debug)
+            log_info("Requests of host {0} have finished, persisting its information".format(host), self.debug)
+            update_structure(self.host_info_cache[host], self.db_handler, self.debug)
+
     def fill_host_info_cache(self, containers):
-        self.host_info_cache = dict()
+        self.update_hosts_in_flight()
+
+        # The information of the hosts still being rescaled is kept, as it is in use by their requests
+        self.host_info_cache = {host: self.host_info_cache[host] for host in self.hosts_in_flight}
+        self.core_allocators = {host: self.core_allocators[host] for host in self.hosts_in_flight if host in self.core_allocators}
         for container in containers:
             if container["host"] not in self.host_info_cache:
                 self.host_info_cache[container["host"]] = self.db_handler.get_structure(container["host"])
         return
 
-    def persist_new_host_information(self, ):
+    def persist_new_host_information(self, skip_hosts=()):
         def persist_thread(self, host):
             data = self.host_info_cache[host]
             update_structure(data, self.db_handler, self.debug)
 
         threads = list()
         for host in self.host_info_cache:
+            if host in skip_hosts:
+                continue
             t = Thread(target=persist_thread, args=(self, host,))
             t.start()
             threads.append(t)
@@ -813,12 +818,35 @@ class Scaler:
         # Split the requests between scale down and scale up
         scale_down, scale_up = self.split_requests(new_requests)
 
-        # Process first the requests that free resources, then the one that use them
-        self.process_requests(scale_down)
-        self.process_requests(scale_up)
+        # Hosts are independent, so their requests are processed concurrently, while the requests of the same host are
+        # processed serially. Requests without a host (i.e., application ones) may use several hosts, so they are
+        # processed first and serially.
+        down_by_host, up_by_host = self.group_requests_by_host(scale_down), self.group_requests_by_host(scale_up)
+        self.process_host_requests(down_by_host.pop(None, []), up_by_host.pop(None, []))
+
+        # The requests of the hosts whose previous requests are still being processed are deferred, they are kept in
+        # the database and retrieved again in the next epoch
+        futures = dict()
+        for host in set(down_by_host) | set(up_by_host):
+            if host in self.hosts_in_flight:
+                log_warning("Requests of host {0} are still being processed, deferring its new requests".format(host), self.debug)
+                continue
+            futures[host] = self.worker_pool.submit(host, self.process_host_requests, down_by_host.get(host, []), up_by_host.get(host, []), host)
+        late_hosts = self.worker_pool.join(list(futures.values()), self.request_timeout, self.debug)
+        for host, future in futures.items():
+            if future.cancelled():
+                # The requests of the host couldn't start, they are kept in the database for the next epoch
+                continue
+            elif host in late_hosts:
+                self.hosts_in_flight[host] = future
+            elif future.exception():
+                log_error("Error processing requests of host {0}: {1}".format(host, str(future.exception())), self.debug)
 
-        # Persist the new host information
-        self.persist_new_host_information()
+        # Persist the new host information, except for the hosts still being rescaled, whose information is not final
+        # and will be persisted once their requests finish
+        if late_hosts:
+            log_warning("Requests of hosts {0} took too long, their information won't be persisted yet".format(late_hosts), self.debug)
+        self.persist_new_host_information(skip_hosts=self.hosts_in_flight)
 
         t1 = time.time()
         log_info("It took {0} seconds to process requests".format(str("%.2f" % (t1 - t0))), self.debug)
@@ -830,6 +858,13 @@ class Scaler:
 
         myConfig = MyConfig(CONFIG_DEFAULT_VALUES)
 
+        # Create the indexes used to filter the requests and to retrieve the structures by name, if missing
+        try:
+            self.db_handler.create_requests_indexes()
+            self.db_handler.create_names_indexes()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log_warning("Couldn't create the indexes of the requests and structures databases: {0}".format(str(e)), True)
+
         # Remove previous requests
         log_info("Purging any previous requests", True)
         self.filter_requests(0)
@@ -846,6 +881,7 @@ class Scaler:
             myConfig.set_config(service["config"])
             polling_frequency = myConfig.get_value("POLLING_FREQUENCY")
             request_timeout = myConfig.get_value("REQUEST_TIMEOUT")
+            self.request_timeout = request_timeout
             self.debug = myConfig.get_value("self.debug")
             CHECK_CORE_MAP = myConfig.get_value("CHECK_CORE_MAP")
             SERVICE_IS_ACTIVATED = myConfig.get_value("ACTIVE")
@@ -868,6 +904,8 @@ class Scaler:
                 time.sleep(polling_frequency)
                 continue
 
+            self.worker_pool.resize(myConfig.get_value("MAX_WORKERS"))
+
             if SERVICE_IS_ACTIVATED:
 
                 # Get the container structures and their resource information as such data is going to be needed
@@ -890,8 +928,9 @@ class Scaler:
                     time.sleep(polling_frequency)
                     continue
 
-                # Do the core mapping check-up
+                # Do the core mapping check-up, except for the containers of the hosts still being rescaled
                 if CHECK_CORE_MAP:
+                    checked_containers = [c for c in containers if c["host"] not in self.hosts_in_flight]
                     log_info("Doing container CPU limits check", self.debug)
                     log_info("First hosts", self.debug)
                     errors_detected = self.check_host_cpu_limits()
@@ -899,12 +938,12 @@ class Scaler:
                         log_error("Errors detected during host CPU limits check", self.debug)
 
                     log_info("Second containers", self.debug)
-                    errors_detected = self.check_containers_cpu_limits(containers)
+                    errors_detected = self.check_containers_cpu_limits(checked_containers)
                     if errors_detected:
                         log_error("Errors detected during container CPU limits check", self.debug)
 
                     log_info("Doing core mapping check", self.debug)
-                    errors_detected = self.check_core_mapping(containers)
+                    errors_detected = self.check_core_mapping(checked_containers)
                     if errors_detected:
                         log_error("Errors detected during container CPU map check", self.debug)
                 else:
@@ -24,7 +24,15 @@
 # along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
 
 
+import json
+import os
+import shutil
+import tempfile
+import time
 import unittest
+from threading import Event, Lock
+
+import src.NodeRescaler.node_resource_manager as node_resource_manager
 import src.Scaler.Scaler as scaler
 
 
@@ -196,3 +204,258 @@ class ClusterRescalerTest(unittest.TestCase):
 
         ## MEM ##
 
+
+class FakeDatabase:
+    def __init__(self, requests=None):
+        self.requests = requests or list()
+        self.updated = list()
+
+    def get_structure(self, name):
+        return {"name": name, "subtype": "container"}
+
+    def update_structure(self, structure, max_tries=10):
+        self.updated.append(structure["name"])
+
+    def delete_request(self, request):
+        pass
+
+    def delete_stale_requests(self, min_timestamp):
+        stale_requests = [r for r in self.requests if r["timestamp"] < min_timestamp]
+        self.delete_requests(stale_requests)
+        return len(stale_requests)
+
+    def get_fresh_requests(self, min_timestamp):
+        return [r for r in self.requests if r["timestamp"] >= min_timestamp]
+
+    def delete_requests(self, requests):
+        self.requests = [r for r in self.requests if r not in requests]
+
+
+class FakeResponse:
+    status_code = 201
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = list()
+        self.lock = Lock()
+
+    def put(self, url, data=None, headers=None):
+        containers_resources = json.loads(data)
+        with self.lock:
+            self.calls.append((url, containers_resources))
+        return FakeResponse({name: {"success": True, "resources": resources} for name, resources in containers_resources.items()})
+
+
+class FakeApplicationDatabase:
+    def __init__(self, structures):
+        self.structures = {structure["name"]: structure for structure in structures}
+        self.queries, self.requests = 0, list()
+
+    def get_structures_by_names(self, names):
+        self.queries += 1
+        return [dict(self.structures[name]) for name in names if name in self.structures]
+
+    def add_request(self, request):
+        self.requests.append(request)
+
+
+class FakeOpenTSDB:
+    def __init__(self):
+        self.queries = 0
+
+    def get_structures_timeseries(self, tag, structure_names, window_difference, window_delay, retrieve_metrics, generate_metrics):
+        self.queries += 1
+        return {name: {"cpu": 50 + i} for i, name in enumerate(structure_names)}
+
+
+class ParallelScalerTest(unittest.TestCase):
+
+    def test_scale_structures_by_host(self):
+        s = scaler.Scaler()
+        s.debug = False
+        s.db_handler = FakeDatabase()
+        s.worker_pool.resize(4)
+        lock = Lock()
+        processed, running = list(), [0, 0]  # Current and maximum concurrent rescalings
+
+        def rescale_container(request, structure):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+                processed.append((request["host"], request["action"]))
+
+        s.rescale_container = rescale_container
+
+        reqs = list()
+        for host in ["host0", "host1", "host2"]:
+            for action in ["CpuRescaleUp", "CpuRescaleDown", "MemRescaleUp", "MemRescaleDown"]:
+                reqs.append({"structure": "cont_" + host, "host": host, "action": action, "structure_type": "container"})
+        s.scale_structures(reqs)
+
+        self.assertEqual(12, len(processed))
+        self.assertGreater(running[1], 1)
+        for host in ["host0", "host1", "host2"]:
+            host_actions = [action for h, action in processed if h == host]
+            self.assertEqual(["CpuRescaleDown", "MemRescaleDown", "CpuRescaleUp", "MemRescaleUp"], host_actions)
+
+    def test_hosts_in_flight(self):
+        s = scaler.Scaler()
+        s.debug = False
+        s.db_handler = FakeDatabase()
+        s.request_timeout = 0.2
+        release, processed = Event(), list()
+
+        def rescale_container(request, structure):
+            if request["host"] == "host0":
+                release.wait(5)
+            processed.append(request["host"])
+
+        s.rescale_container = rescale_container
+        containers = [{"name": "cont0", "host": "host0"}, {"name": "cont1", "host": "host1"}]
+        reqs = [{"structure": c["name"], "host": c["host"], "action": "CpuRescaleUp", "structure_type": "container"} for c in containers]
+        s.fill_host_info_cache(containers)
+        host0_info = s.host_info_cache["host0"]
+
+        # The late host is left running and its information is not persisted
+        s.scale_structures(reqs)
+        self.assertEqual(["host0"], list(s.hosts_in_flight))
+        self.assertEqual(["host1"], s.db_handler.updated)
+
+        # The information of the running host is kept and its new requests are deferred
+        s.fill_host_info_cache(containers)
+        self.assertIs(host0_info, s.host_info_cache["host0"])
+        s.scale_structures(reqs)
+        self.assertEqual(["host1", "host1"], processed)
+
+        # Once finished, the information of the host is persisted before retrieving it again
+        release.set()
+        s.hosts_in_flight["host0"].result(5)
+        s.fill_host_info_cache(containers)
+        self.assertEqual({}, s.hosts_in_flight)
+        self.assertEqual(["host1", "host1", "host0"], s.db_handler.updated)
+        self.assertIsNot(host0_info, s.host_info_cache["host0"])
+
+    def test_set_resources_by_host(self):
+        s = scaler.Scaler()
+        s.debug = False
+        s.db_handler = FakeDatabase()
+        s.rescaler_http_session = FakeSession()
+        s.apply_request = lambda request, real_resources, database_resources: {request["resource"]: {"amount": request["amount"]}}
+
+        reqs = list()
+        for host in ["host0", "host1"]:
+            for cont in ["cont0", "cont1"]:
+                s.container_info_cache[host + cont] = {"resources": {}}
+                for resource, amount in [("cpu", -50), ("mem", 100)]:
+                    reqs.append({"structure": host + cont, "host": host, "host_rescaler_ip": host, "host_rescaler_port": 8000,
+                                 "resource": resource, "amount": amount, "structure_type": "container",
+                                 "action": "{0}RescaleUp".format(resource) if amount > 0 else "{0}RescaleDown".format(resource)})
+        s.scale_structures(reqs)
+
+        # A single call per host with the resources of all its containers
+        self.assertEqual(["http://host0:8000/containers", "http://host1:8000/containers"], sorted(url for url, _ in s.rescaler_http_session.calls))
+        for url, containers_resources in s.rescaler_http_session.calls:
+            host = url.split("/")[2].split(":")[0]
+            self.assertEqual({host + "cont0": {"cpu": {"amount": -50}, "mem": {"amount": 100}},
+                              host + "cont1": {"cpu": {"amount": -50}, "mem": {"amount": 100}}}, containers_resources)
+        self.assertEqual({}, s.hosts_new_resources)
+
+    def test_filter_requests(self):
+        now = time.time()
+        db_requests = [{"structure": "cont0", "action": "CpuRescaleUp", "timestamp": now - 100},
+                       {"structure": "cont0", "action": "CpuRescaleUp", "timestamp": now - 10},
+                       {"structure": "cont0", "action": "CpuRescaleUp", "timestamp": now - 5},
+                       {"structure": "cont0", "action": "MemRescaleUp", "timestamp": now - 5},
+                       {"structure": "cont1", "action": "CpuRescaleDown", "timestamp": now - 20}]
+        s = scaler.Scaler()
+        s.db_handler = FakeDatabase(list(db_requests))
+
+        # The stale request and the older duplicated one are removed
+        self.assertEqual(db_requests[2:], s.filter_requests(60))
+        self.assertEqual(db_requests[2:], s.db_handler.requests)
+
+    def test_rescale_application(self):
+        hosts = [{"name": "host{0}".format(i), "resources": {"cpu": {"free": 1000}}} for i in range(4)]
+        containers = [{"name": "cont{0}".format(i), "host": "host{0}".format(i % 4), "subtype": "container",
+                       "host_rescaler_ip": "host{0}".format(i % 4), "host_rescaler_port": 8000,
+                       "resources": {"cpu": {"current": 100, "max": 400, "min": 50}}} for i in range(200)]
+        s = scaler.Scaler()
+        s.debug = False
+        s.db_handler = FakeApplicationDatabase(hosts + containers)
+        s.bdwatchdog_handler = FakeOpenTSDB()
+
+        app = {"name": "app0", "containers": [c["name"] for c in containers] + ["missing"]}
+        s.rescale_application({"structure": "app0", "resource": "cpu", "amount": 20}, app)
+
+        # One query for the containers, one for their hosts and one for the usages
+        self.assertEqual(2, s.db_handler.queries)
+        self.assertEqual(1, s.bdwatchdog_handler.queries)
+        self.assertEqual(["host0", "host1", "host2", "host3"], sorted(s.host_info_cache.keys()))
+
+        # The rescaling is split between the containers with the lowest margin between their usage and their limit
+        rescaled = {request["structure"]: request["amount"] for request in s.db_handler.requests}
+        self.assertEqual({"cont199": 5, "cont198": 5, "cont197": 5, "cont196": 5}, rescaled)
+
+
+class BandwidthRescalingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.s = scaler.Scaler()
+        self.s.debug = False
+        # Hosts don't account for their disk and network bandwidth
+        self.s.host_info_cache = {"host0": {"name": "host0", "resources": {"cpu": {"free": 0}, "mem": {"free": 0}, "disks": []}}}
+        self.database_resources = {"name": "cont0", "resources": {"disk": {"max": 500, "min": 10}, "net": {"max": 1000, "min": 10}}}
+
+    def test_disk_rescaling(self):
+        cgroup_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cgroup_path)
+        container_path = os.path.join(cgroup_path, "blkio", "lxc.payload.cont0")
+        os.makedirs(container_path)
+        for cgroup_file in ["blkio.throttle.read_bps_device", "blkio.throttle.write_bps_device"]:
+            with open(os.path.join(container_path, cgroup_file), "w") as f:
+                f.write("8:0 {0}\n".format(100 * 1048576))
+
+        previous_cgroup_path, node_resource_manager.CGROUP_PATH = node_resource_manager.CGROUP_PATH, cgroup_path
+        try:
+            # The current limit is the one reported by the NodeRescaler for the disk
+            _, limits_write = node_resource_manager.get_node_disk_limits("cont0", "lxc")
+            real_resources = {"disk": {"major": "8", "minor": "0", "unit": "Mbit", "disk_read_limit": 100,
+                                       "disk_write_limit": int(int(limits_write["8:0"]) / 1048576)}}
+            request = {"structure": "cont0", "host": "host0", "resource": "disk", "amount": 50, "action": "DiskRescaleUp"}
+            resource_dict = self.s.apply_request(request, real_resources, self.database_resources)
+
+            # The new limit is applied by the NodeRescaler and read back as the current one
+            success, _ = node_resource_manager.set_node_disk("cont0", resource_dict["disk"], "lxc")
+            self.assertTrue(success)
+            limits_read, limits_write = node_resource_manager.get_node_disk_limits("cont0", "lxc")
+            self.assertEqual({"8:0": str(150 * 1048576)}, limits_read)
+            self.assertEqual({"8:0": str(150 * 1048576)}, limits_write)
+        finally:
+            node_resource_manager.CGROUP_PATH = previous_cgroup_path
+
+    def test_net_rescaling(self):
+        applied = list()
+        previous_functions = node_resource_manager.unset_interface_limit, node_resource_manager.set_interface_limit
+        node_resource_manager.unset_interface_limit = lambda interface: True
+        node_resource_manager.set_interface_limit = lambda interface, net: applied.append((interface, net["net_limit"])) or (True, net)
+        try:
+            real_resources = {"net": {"device_name_in_container": "eth0", "device_name_in_host": "veth0", "net_limit": 100, "unit": "Mbit"}}
+            request = {"structure": "cont0", "host": "host0", "resource": "net", "amount": -20, "action": "NetRescaleDown"}
+            resource_dict = self.s.apply_request(request, real_resources, self.database_resources)
+
+            success, _ = node_resource_manager.set_node_net(resource_dict["net"])
+            self.assertTrue(success)
+            self.assertEqual([("veth0", "80")], applied)
+        finally:
+            node_resource_manager.unset_interface_limit, node_resource_manager.set_interface_limit = previous_functions
+
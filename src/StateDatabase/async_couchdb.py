@@ -0,0 +1,205 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import asyncio
+import random
+import json
+
+import aiohttp
+
+from src.MyUtils.MyUtils import log_error
+
+
+class AsyncCouchDBServer:
+    """
+    Asynchronous counterpart of the CouchDBServer class, implementing only the operations needed by the services that
+    run on an asyncio event loop (e.g., the Guardian asyncio engine). It shares an aiohttp session with the rest of
+    the asynchronous clients, so that connections are pooled and concurrency is bounded in a single place.
+    """
+    post_doc_headers = {'content-type': 'application/json'}
+    __structures_db_name = "structures"
+    __limits_db_name = "limits"
+    __rules_db_name = "rules"
+    __events_db_name = "events"
+    __requests_db_name = "requests"
+    __MAX_UPDATE_TRIES = 20
+    __NAMES_QUERY_CHUNK_SIZE = 200
+
+    def __init__(self, server, session):
+        self.server = server
+        self.session = session
+
+    def set_database_name(self, database_type, database_name):
+        if database_type == "structures":
+            self.__structures_db_name = database_name
+        elif database_type == "limits":
+            self.__limits_db_name = database_name
+        elif database_type == "rules":
+            self.__rules_db_name = database_name
+        elif database_type == "events":
+            self.__events_db_name = database_name
+        elif database_type == "requests":
+            self.__requests_db_name = database_name
+        else:
+            pass
+
+    async def __get_all_database_docs(self, database):
+        async with self.session.get(self.server + "/" + database + "/_all_docs?include_docs=true") as r:
+            r.raise_for_status()
+            rows = json.loads(await r.text())["rows"]
+            return [row["doc"] for row in rows]
+
+    async def __add_bulk_docs(self, database, docs):
+        docs_data = {"docs": docs}
+        async with self.session.post(self.server + "/" + database + "/_bulk_docs", data=json.dumps(docs_data),
+                                     headers=self.post_doc_headers) as r:
+            if r.status != 201:
+                r.raise_for_status()
+            return await r.json()
+
+    async def __delete_bulk_docs(self, database, docs):
+        for doc in docs:
+            doc["_deleted"] = True
+        await self.__add_bulk_docs(database, docs)
+
+    def __merge(self, input_dict, output_dict):
+        for key, value in input_dict.items():
+            if isinstance(value, dict):
+                # get node or create one
+                node = output_dict.setdefault(key, {})
+                self.__merge(value, node)
+            else:
+                output_dict[key] = value
+
+        return output_dict
+
+    async def __resilient_update_doc(self, database, doc, time_backoff_milliseconds=100):
+        for _ in range(self.__MAX_UPDATE_TRIES):
+            async with self.session.post(self.server + "/" + database, data=json.dumps(doc),
+                                         headers=self.post_doc_headers) as r:
+                if r.status == 200 or r.status == 201:
+                    return True
+                elif r.status == 409:
+                    # Conflict error, document may have been updated by other service,
+                    # update revision and retry after slightly random wait
+                    await asyncio.sleep((time_backoff_milliseconds + random.randint(1, 100)) / 1000)
+                    matches = await self.__find_documents_by_matches(database, {"_id": doc["_id"]})
+                    if len(matches) > 0:
+                        new_doc = matches[0]
+                        doc["_rev"] = new_doc["_rev"]
+                        doc = self.__merge(doc, new_doc)
+                elif r.status == 404:
+                    # Database may have been reinitialized (deleted and recreated), wait and retry again
+                    await asyncio.sleep((time_backoff_milliseconds + random.randint(1, 200)) / 1000)
+                else:
+                    r.raise_for_status()
+        return False
+
+    async def __retry_bulk_doc(self, database, doc, result):
+        try:
+            updated = await self.__resilient_update_doc(database, doc)
+            error = result.get("reason", result["error"])
+        except aiohttp.ClientResponseError as e:
+            updated, error = False, str(e)
+        if not updated:
+            log_error("Couldn't update document {0} of database {1}: {2}".format(
+                result.get("id", doc.get("_id")), database, error), False)
+        return updated
+
+    async def __resilient_bulk_update_docs(self, database, docs):
+        results = await self.__add_bulk_docs(database, docs)
+        # The results are returned in the same order as the documents were sent
+        failed = [(doc, result) for doc, result in zip(docs, results) if "error" in result]
+        if failed:
+            # Documents may have been updated by other service (conflict) or failed for some other reason, retry just
+            # these documents
+            updated = await asyncio.gather(*[self.__retry_bulk_doc(database, doc, result) for doc, result in failed])
+            return all(updated)
+        return True
+
+    async def __find_documents_by_matches(self, database, selectors, limit=50):
+        query = {"selector": dict(selectors), "limit": limit}
+        async with self.session.post(self.server + "/" + database + "/_find", data=json.dumps(query),
+                                     headers={'Content-Type': 'application/json'}) as r:
+            r.raise_for_status()
+            return (await r.json())["docs"]
+
+    async def __find_documents_by_names(self, database, doc_names):
+        # The names are queried in chunks to bound the size of each query, which is served by the 'name' index
+        doc_names = list(doc_names)
+        chunks = [doc_names[i:i + self.__NAMES_QUERY_CHUNK_SIZE] for i in range(0, len(doc_names), self.__NAMES_QUERY_CHUNK_SIZE)]
+        results = await asyncio.gather(*[self.__find_documents_by_matches(database, {"name": {"$in": chunk}}, limit=len(chunk))
+                                         for chunk in chunks])
+        return [doc for docs in results for doc in docs]
+
+    # STRUCTURES #
+    async def get_structures(self, subtype=None):
+        if subtype is None:
+            return await self.__get_all_database_docs(self.__structures_db_name)
+        else:
+            return await self.__find_documents_by_matches(self.__structures_db_name, {"subtype": subtype})
+
+    # EVENTS #
+    async def add_events(self, events):
+        await self.__add_bulk_docs(self.__events_db_name, events)
+
+    async def get_events(self, structure):
+        return await self.__find_documents_by_matches(self.__events_db_name, {"structure": structure["name"]})
+
+    async def delete_num_events_by_structure(self, structure, event_name, event_num):
+        events = await self.__find_documents_by_matches(self.__events_db_name,
+                                                        {"structure": structure["name"], "name": event_name})
+        event_num = min(len(events), event_num)
+        await self.__delete_bulk_docs(self.__events_db_name, events[0:event_num])
+
+    async def delete_events(self, events):
+        await self.__delete_bulk_docs(self.__events_db_name, events)
+
+    # LIMITS #
+    async def get_limits(self, structure):
+        # Return just the first item, as it should only be one 'limits' document, otherwise raise error
+        limits = await self.__find_documents_by_matches(self.__limits_db_name, {"name": structure["name"]})
+        if not limits:
+            raise ValueError("Structure with name {0} has no limits".format(structure["name"]))
+        else:
+            return limits[0]
+
+    async def get_limits_by_names(self, structure_names):
+        return await self.__find_documents_by_names(self.__limits_db_name, structure_names)
+
+    async def update_limit(self, limit):
+        return await self.__resilient_update_doc(self.__limits_db_name, limit)
+
+    async def update_limits(self, limits):
+        return await self.__resilient_bulk_update_docs(self.__limits_db_name, limits)
+
+    # REQUESTS #
+    async def add_requests(self, reqs):
+        await self.__add_bulk_docs(self.__requests_db_name, reqs)
+
+    # RULES #
+    async def get_rules(self):
+        return await self.__get_all_database_docs(self.__rules_db_name)
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import asyncio
+import json
+
+from src.StateDatabase.opentsdb import OpenTSDBServer
+
+
+class AsyncOpenTSDBServer:
+    """
+    Asynchronous counterpart of the OpenTSDBServer class for the read operations. Queries are generated and their
+    results parsed exactly as in the synchronous client, only the remote operations differ.
+    """
+    NO_METRIC_DATA_DEFAULT_VALUE = OpenTSDBServer.NO_METRIC_DATA_DEFAULT_VALUE
+
+    def __init__(self, server, session):
+        self.server = server
+        self.session = session
+
+    async def get_points(self, query):
+        async with self.session.post("{0}/{1}".format(self.server, "api/query"), data=json.dumps(query),
+                                     headers={'content-type': 'application/json', 'Accept': 'application/json'}) as r:
+            if r.status == 200:
+                return json.loads(await r.text())
+            elif r.status == 400:
+                error_message = json.loads(await r.text())["error"]["message"]
+                if "No such name for 'tagv'" in error_message:
+                    return {}
+            # Any other error is raised instead of returning no points
+            r.raise_for_status()
+
+    async def get_structure_timeseries(self, tags, window_difference, window_delay, retrieve_metrics, generate_metrics,
+                                       downsample=5):
+        query = OpenTSDBServer.generate_structure_query(tags, window_difference, window_delay, retrieve_metrics,
+                                                        downsample)
+        result = await self.get_points(query)
+        return OpenTSDBServer.parse_structure_result(result, retrieve_metrics, generate_metrics)
+
+    async def get_structures_timeseries(self, tag, structure_names, window_difference, window_delay, retrieve_metrics,
+                                        generate_metrics, downsample=5, chunk_size=100, only_found=False):
+        """Asynchronous version of OpenTSDBServer.get_structures_timeseries, with the grouped queries sent
+        concurrently."""
+        queries = OpenTSDBServer.generate_structures_queries(tag, structure_names, window_difference, window_delay,
+                                                             retrieve_metrics, downsample, chunk_size)
+        results = await asyncio.gather(*[self.get_points(query) for _, query in queries])
+
+        structures_usages = dict()
+        for (chunk, _), result in zip(queries, results):
+            structures_usages.update(
+                OpenTSDBServer.parse_structures_result(tag, chunk, result, retrieve_metrics, generate_metrics,
+                                                       only_found))
+        return structures_usages
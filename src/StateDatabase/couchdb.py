@@ -31,6 +31,8 @@ import json
 import yaml
 import os
 
+from src.MyUtils.MyUtils import log_error
+
 class CouchDBServer:
     post_doc_headers = {'content-type': 'application/json'}
     __COUCHDB_URL = "couchdb"
@@ -44,6 +46,7 @@ class CouchDBServer:
     __users_db_name = "users"
     __MAX_UPDATE_TRIES = 10
     __DATABASE_TIMEOUT = 10
+    __NAMES_QUERY_CHUNK_SIZE = 200
 
     def __init__(self, couchdb_url=None, couchdbdb_port=None):
 
@@ -89,6 +92,11 @@ class CouchDBServer:
         else:
             pass
 
+    def get_database_name(self, database_type):
+        return {"structures": self.__structures_db_name, "services": self.__services_db_name,
+                "limits": self.__limits_db_name, "rules": self.__rules_db_name, "events": self.__events_db_name,
+                "requests": self.__requests_db_name}.get(database_type)
+
     def database_exists(self, database):
         r = self.session.head(self.server + "/" + database)
         return r.status_code == 200
@@ -114,6 +122,25 @@ class CouchDBServer:
         else:
             return json.loads(r.text)["ok"]
 
+    def create_index(self, database, index_name, fields):
+        """Create a Mango index, nothing is done if an index with the same definition already exists
+
+        Args:
+            database (string): The name of the database
+            index_name (string): The name of the index
+            fields (list): The fields to index
+
+        Returns:
+            (boolean) True if the index was created, False if it already existed
+        """
+        index = {"index": {"fields": fields}, "name": index_name, "ddoc": index_name, "type": "json"}
+        r = self.session.post(self.server + "/" + database + "/_index", data=json.dumps(index),
+                              headers=self.post_doc_headers)
+        if r.status_code != 200:
+            r.raise_for_status()
+        else:
+            return r.json()["result"] == "created"
+
     def __get_all_database_docs(self, database):
         # TODO Implement pagination
         docs = list()
@@ -127,6 +154,34 @@ class CouchDBServer:
                 docs.append(row["doc"])
             return docs
 
+    def get_changes(self, database_type, since="0", feed="normal", timeout=None):
+        """Get the changes of the documents of a database since a sequence, including the documents themselves.
+
+        Args:
+            database_type (string): The type of the database (e.g., structures, limits or rules)
+            since (string): The sequence after which the changes are returned, "0" to get all the documents
+            feed (string): Either 'normal' to return immediately or 'longpoll' to wait until there are changes
+            timeout (integer): Maximum time in seconds to wait for changes with the 'longpoll' feed
+
+        Returns:
+            (tuple[list,string]) The changes, each one with the document 'id', the 'doc' and a 'deleted' flag if it
+            was deleted, and the last sequence to be used in the next call
+        """
+        databases = {"structures": self.__structures_db_name, "limits": self.__limits_db_name,
+                     "rules": self.__rules_db_name, "services": self.__services_db_name}
+        params = {"include_docs": "true", "since": since, "feed": feed}
+        request_timeout = self.__DATABASE_TIMEOUT
+        if feed == "longpoll" and timeout:
+            params["timeout"] = int(timeout * 1000)
+            request_timeout += timeout
+        r = self.session.get(self.server + "/" + databases[database_type] + "/_changes", params=params,
+                             timeout=request_timeout)
+        if r.status_code != 200:
+            r.raise_for_status()
+        else:
+            changes = r.json()
+            return changes["results"], changes["last_seq"]
+
     # PRIVATE CRUD METHODS #
 
     # def __delete_doc(self, database, docid, rev):
@@ -152,6 +207,31 @@ class CouchDBServer:
         else:
             return True
 
+    def __resilient_bulk_update_docs(self, database, docs):
+        docs_data = {"docs": docs}
+        r = self.session.post(self.server + "/" + database + "/_bulk_docs", data=json.dumps(docs_data),
+                              headers=self.post_doc_headers)
+        if r.status_code != 201:
+            r.raise_for_status()
+        else:
+            # The results are returned in the same order as the documents were sent
+            failed = [(doc, result) for doc, result in zip(docs, r.json()) if "error" in result]
+            # Documents may have been updated by other service (conflict) or failed for some other reason, retry just
+            # these documents
+            updated = [self.__retry_bulk_doc(database, doc, result) for doc, result in failed]
+            return all(updated)
+
+    def __retry_bulk_doc(self, database, doc, result):
+        try:
+            updated = self.__resilient_update_doc(database, doc)
+            error = result.get("reason", result["error"])
+        except requests.exceptions.HTTPError as e:
+            updated, error = False, str(e)
+        if not updated:
+            log_error("Couldn't update document {0} of database {1}: {2}".format(
+                result.get("id", doc.get("_id")), database, error), False)
+        return updated
+
     def __resilient_delete_doc(self, database, doc, max_tries=10):
         time_backoff_milliseconds = 100
         i = 0
@@ -214,7 +294,8 @@ class CouchDBServer:
                 return self.__resilient_update_doc(database, doc, previous_tries + 1)
             else:
                 r.raise_for_status()
-        return False
+            return False
+        return True
 
     # TODO This new method should work, test it in isolation and new commit
     # def __resilient_update_doc(self, database, doc, max_tries=10):
@@ -240,9 +321,9 @@ class CouchDBServer:
     #             r.raise_for_status()
     #     return False
 
-    def __find_documents_by_matches(self, database, selectors):
+    def __find_documents_by_matches(self, database, selectors, limit=50):
         # TODO Implement pagination
-        query = {"selector": {}, "limit": 50}
+        query = {"selector": {}, "limit": limit}
 
         for key in selectors:
             query["selector"][key] = selectors[key]
@@ -254,6 +335,24 @@ class CouchDBServer:
         else:
             return req_docs.json()["docs"]
 
+    def __find_all_documents_by_matches(self, database, selectors, fields=None, page_size=1000):
+        # Same as __find_documents_by_matches, but retrieves all the matching documents in pages
+        docs = list()
+        query = {"selector": selectors, "limit": page_size}
+        if fields:
+            query["fields"] = fields
+
+        while True:
+            r = self.session.post(self.server + "/" + database + "/_find", data=json.dumps(query),
+                                  headers={'Content-Type': 'application/json'}, timeout=self.__DATABASE_TIMEOUT)
+            if r.status_code != 200:
+                r.raise_for_status()
+            result = r.json()
+            docs += result["docs"]
+            if len(result["docs"]) < page_size:
+                return docs
+            query["bookmark"] = result["bookmark"]
+
     def __find_document_by_name(self, database, doc_name):
         docs = self.__find_documents_by_matches(database, {"name": doc_name})
         if not docs:
@@ -262,6 +361,19 @@ class CouchDBServer:
             # Return the first one as it should only be one
             return dict(docs[0])
 
+    def __find_documents_by_names(self, database, doc_names):
+        # The names are queried in chunks to bound the size of each query, which is served by the 'name' index
+        doc_names, docs = list(doc_names), list()
+        for i in range(0, len(doc_names), self.__NAMES_QUERY_CHUNK_SIZE):
+            chunk = doc_names[i:i + self.__NAMES_QUERY_CHUNK_SIZE]
+            docs += self.__find_documents_by_matches(database, {"name": {"$in": chunk}}, limit=len(chunk))
+        return docs
+
+    def create_names_indexes(self):
+        # Indexes used to retrieve the structures and limits by name
+        self.create_index(self.__structures_db_name, "structures-name", ["name"])
+        self.create_index(self.__limits_db_name, "limits-name", ["name"])
+
     # STRUCTURES #
     def add_structure(self, structure):
         return self.__add_doc(self.__structures_db_name, structure)
@@ -275,6 +387,10 @@ class CouchDBServer:
         else:
             return self.__find_documents_by_matches(self.__structures_db_name, {"subtype": subtype})
 
+    def get_structures_by_names(self, structure_names):
+        # Return the documents of several structures with a single query, missing structures are left out
+        return self.__find_documents_by_names(self.__structures_db_name, structure_names)
+
     def delete_structure(self, structure):
         self.__resilient_delete_doc(self.__structures_db_name, structure)
 
@@ -291,6 +407,9 @@ class CouchDBServer:
     def get_events(self, structure):
         return self.__find_documents_by_matches(self.__events_db_name, {"structure": structure["name"]})
 
+    def get_all_events(self):
+        return self.__get_all_database_docs(self.__events_db_name)
+
     def delete_num_events_by_structure(self, structure, event_name, event_num):
         events = self.__find_documents_by_matches(self.__events_db_name,
                                                   {"structure": structure["name"], "name": event_name})
@@ -319,12 +438,19 @@ class CouchDBServer:
         else:
             return limits[0]
 
+    def get_limits_by_names(self, structure_names):
+        # Return the 'limits' documents of several structures with a single query, structures without limits are left out
+        return self.__find_documents_by_names(self.__limits_db_name, structure_names)
+
     def delete_limit(self, limit):
         self.__resilient_delete_doc(self.__limits_db_name, limit)
 
     def update_limit(self, limit):
         return self.__resilient_update_doc(self.__limits_db_name, limit)
 
+    def update_limits(self, limits):
+        return self.__resilient_bulk_update_docs(self.__limits_db_name, limits)
+
     # REQUESTS #
     def get_requests(self, structure=None):
         if structure is None:
@@ -344,6 +470,26 @@ class CouchDBServer:
     def delete_requests(self, requests):
         self.__delete_bulk_docs(self.__requests_db_name, requests)
 
+    def create_requests_indexes(self):
+        # Index used to filter the fresh and stale requests by timestamp
+        self.create_index(self.__requests_db_name, "requests-timestamp", ["timestamp"])
+
+    def get_fresh_requests(self, min_timestamp):
+        return self.__find_all_documents_by_matches(self.__requests_db_name, {"timestamp": {"$gte": min_timestamp}})
+
+    def delete_stale_requests(self, min_timestamp):
+        """Delete the requests older than a timestamp in a single bulk operation, only their ids and revisions are
+        retrieved
+
+        Returns:
+            (integer) The number of deleted requests
+        """
+        stale_requests = self.__find_all_documents_by_matches(self.__requests_db_name, {"timestamp": {"$lt": min_timestamp}},
+                                                              fields=["_id", "_rev"])
+        if stale_requests:
+            self.__delete_bulk_docs(self.__requests_db_name, stale_requests)
+        return len(stale_requests)
+
     # RULES #
     def add_rule(self, rule):
         return self.__add_doc(self.__rules_db_name, rule)
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import copy
+from threading import Thread, Lock, Event
+
+from src.MyUtils.DataModel import Structure, Limits
+from src.MyUtils.MyUtils import log_warning, log_info
+from src.StateDatabase.couchdb import CouchDBServer
+
+
+class CouchDBMirror:
+    """
+    In-memory mirror of the structures, limits and rules databases, kept up to date by following the '_changes' feed
+    of each database from a background thread. It offers the same read operations as CouchDBServer so that it can be
+    used instead of it to avoid scanning the databases on every epoch. Structures and limits are kept as compact
+    slotted documents (see DataModel) and all the documents are returned as dictionary copies, as they are modified by
+    the services.
+    """
+
+    MIRRORED_DATABASES = ["structures", "limits", "rules"]
+    DOCUMENT_CLASSES = {"structures": Structure, "limits": Limits}
+
+    def __init__(self, handler_factory=CouchDBServer, poll_timeout=30, retry_time=5, debug=False):
+        self.handler_factory = handler_factory
+        self.poll_timeout = poll_timeout
+        self.retry_time = retry_time
+        self.debug = debug
+        self.__docs = {database: dict() for database in self.MIRRORED_DATABASES}  # database -> doc id -> doc
+        self.__sequences = {database: "0" for database in self.MIRRORED_DATABASES}
+        self.__synced = {database: Event() for database in self.MIRRORED_DATABASES}
+        self.__stopped = Event()
+        self.__threads = list()
+        self.__lock = Lock()
+
+    def start(self):
+        self.__stopped.clear()
+        for database in self.MIRRORED_DATABASES:
+            thread = Thread(name="couchdb_mirror_{0}".format(database), target=self.__follow_changes, args=(database,),
+                            daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+
+    def stop(self):
+        # Threads waiting for changes finish once the poll times out
+        self.__stopped.set()
+        self.__threads = list()
+
+    def is_synced(self):
+        """Check whether all the databases have been loaded, otherwise the mirror should not be used yet"""
+        return all(synced.is_set() for synced in self.__synced.values())
+
+    def wait_synced(self, timeout=None):
+        for synced in self.__synced.values():
+            if not synced.wait(timeout):
+                return False
+        return True
+
+    def __follow_changes(self, database):
+        # Each thread uses its own handler, as sessions should not be shared between threads
+        handler = self.handler_factory()
+        while not self.__stopped.is_set():
+            try:
+                # Load all the documents first, then wait for the changes
+                feed = "longpoll" if self.__synced[database].is_set() else "normal"
+                # Remote database operation
+                changes, last_sequence = handler.get_changes(database, since=self.__sequences[database], feed=feed,
+                                                             timeout=self.poll_timeout)
+                self.apply_changes(database, changes, last_sequence)
+                if not self.__synced[database].is_set():
+                    log_info("Mirrored {0} documents of database '{1}'".format(len(self.__docs[database]), database), self.debug)
+                    self.__synced[database].set()
+            except Exception as e:
+                log_warning("Error following the changes of database '{0}', retrying in {1} seconds: {2}".format(
+                    database, self.retry_time, str(e)), self.debug)
+                self.__stopped.wait(self.retry_time)
+
+    def apply_changes(self, database, changes, last_sequence):
+        document_class = self.DOCUMENT_CLASSES.get(database)
+        with self.__lock:
+            docs = self.__docs[database]
+            for change in changes:
+                if change["id"].startswith("_design/"):
+                    continue
+                if change.get("deleted", False):
+                    docs.pop(change["id"], None)
+                else:
+                    docs[change["id"]] = document_class.from_dict(change["doc"]) if document_class else change["doc"]
+            self.__sequences[database] = last_sequence
+
+    def __get_docs(self, database, condition=None):
+        with self.__lock:
+            docs = [doc for doc in self.__docs[database].values() if condition is None or condition(doc)]
+            if database in self.DOCUMENT_CLASSES:
+                return [doc.to_dict() for doc in docs]
+        return copy.deepcopy(docs)
+
+    # STRUCTURES #
+    def get_structures(self, subtype=None):
+        if subtype is None:
+            return self.__get_docs("structures")
+        else:
+            return self.__get_docs("structures", lambda doc: doc.get("subtype") == subtype)
+
+    def get_structure(self, structure_name):
+        docs = self.__get_docs("structures", lambda doc: doc.get("name") == structure_name)
+        if not docs:
+            raise ValueError("Document with name {0} not found in database {1}".format(structure_name, "structures"))
+        return docs[0]
+
+    # LIMITS #
+    def get_all_limits(self):
+        return self.__get_docs("limits")
+
+    def get_limits(self, structure):
+        limits = self.__get_docs("limits", lambda doc: doc.get("name") == structure["name"])
+        if not limits:
+            raise ValueError("Structure with name {0} has no limits".format(structure["name"]))
+        return limits[0]
+
+    def get_limits_by_names(self, structure_names):
+        structure_names = set(structure_names)
+        return self.__get_docs("limits", lambda doc: doc.get("name") in structure_names)
+
+    # RULES #
+    def get_rules(self):
+        return self.__get_docs("rules")
@@ -104,34 +104,118 @@ class OpenTSDBServer:
                 self.get_points(query, tries)
 
 
-    def get_structure_timeseries(self, tags, window_difference, window_delay, retrieve_metrics, generate_metrics, downsample=5):
-        usages = dict()
+    @staticmethod
+    def __get_average_from_dps(dps):
+        if len(dps) > 0:
+            return sum(dps.values()) / len(dps)
+        else:
+            return 0
+
+    @classmethod
+    def __generate_final_values(cls, usages, generate_metrics):
+        final_values = dict()
+        for value in generate_metrics:
+            final_values[value] = cls.NO_METRIC_DATA_DEFAULT_VALUE
+            for metric in generate_metrics[value]:
+                if metric in usages and usages[metric] != cls.NO_METRIC_DATA_DEFAULT_VALUE:
+                    final_values[value] += usages[metric]
+        return final_values
+
+    # The query generation and result parsing are kept apart from the remote operations so that they can be shared
+    # with other clients of the same server (e.g., the asynchronous one)
+    @staticmethod
+    def generate_structure_query(tags, window_difference, window_delay, retrieve_metrics, downsample=5):
         subquery = list()
         for metric in retrieve_metrics:
-            usages[metric] = self.NO_METRIC_DATA_DEFAULT_VALUE
             subquery.append(dict(aggregator='zimsum', metric=metric, tags=tags, downsample=str(downsample) + "s-avg"))
 
         start = int(time.time() - (window_difference + window_delay))
         end = int(time.time() - window_delay)
-        query = dict(start=start, end=end, queries=subquery)
-        result = self.get_points(query)
+        return dict(start=start, end=end, queries=subquery)
+
+    @classmethod
+    def parse_structure_result(cls, result, retrieve_metrics, generate_metrics):
+        usages = dict()
+        for metric in retrieve_metrics:
+            usages[metric] = cls.NO_METRIC_DATA_DEFAULT_VALUE
 
         if result:
             for metric in result:
-                dps = metric["dps"]
-                summatory = sum(dps.values())
-                if len(dps) > 0:
-                    average_real = summatory / len(dps)
-                else:
-                    average_real = 0
-                usages[metric["metric"]] = average_real
+                usages[metric["metric"]] = cls.__get_average_from_dps(metric["dps"])
 
-        final_values = dict()
+        return cls.__generate_final_values(usages, generate_metrics)
 
-        for value in generate_metrics:
-            final_values[value] = self.NO_METRIC_DATA_DEFAULT_VALUE
-            for metric in generate_metrics[value]:
-                if metric in usages and usages[metric] != self.NO_METRIC_DATA_DEFAULT_VALUE:
-                    final_values[value] += usages[metric]
+    @staticmethod
+    def generate_structures_queries(tag, structure_names, window_difference, window_delay, retrieve_metrics,
+                                    downsample=5, chunk_size=100):
+        start = int(time.time() - (window_difference + window_delay))
+        end = int(time.time() - window_delay)
 
-        return final_values
+        queries = list()
+        for i in range(0, len(structure_names), chunk_size):
+            chunk = structure_names[i:i + chunk_size]
+            subquery = list()
+            structures_filter = dict(type="literal_or", tagk=tag, filter="|".join(chunk), groupBy=True)
+            for metric in retrieve_metrics:
+                subquery.append(dict(aggregator='zimsum', metric=metric, filters=[structures_filter],
+                                     downsample=str(downsample) + "s-avg"))
+            queries.append((chunk, dict(start=start, end=end, queries=subquery)))
+        return queries
+
+    @classmethod
+    def parse_structures_result(cls, tag, structure_names, result, retrieve_metrics, generate_metrics, only_found=False):
+        usages, found_names = dict(), set()
+        for name in structure_names:
+            usages[name] = dict()
+            for metric in retrieve_metrics:
+                usages[name][metric] = cls.NO_METRIC_DATA_DEFAULT_VALUE
+
+        if result:
+            for metric in result:
+                name = metric.get("tags", {}).get(tag)
+                if name in usages:
+                    usages[name][metric["metric"]] = cls.__get_average_from_dps(metric["dps"])
+                    found_names.add(name)
+
+        structures_usages = dict()
+        for name in structure_names:
+            # Structures without any time series are left out if requested, so that the caller can retrieve them apart
+            if only_found and name not in found_names:
+                continue
+            structures_usages[name] = cls.__generate_final_values(usages[name], generate_metrics)
+        return structures_usages
+
+    def get_structure_timeseries(self, tags, window_difference, window_delay, retrieve_metrics, generate_metrics, downsample=5):
+        query = self.generate_structure_query(tags, window_difference, window_delay, retrieve_metrics, downsample)
+        result = self.get_points(query)
+        return self.parse_structure_result(result, retrieve_metrics, generate_metrics)
+
+    def get_structures_timeseries(self, tag, structure_names, window_difference, window_delay, retrieve_metrics,
+                                  generate_metrics, downsample=5, chunk_size=100, only_found=False):
+        """Retrieve the usages of several structures with a few grouped queries instead of one query per structure.
+        The structure names are sent as a 'literal_or' filter (e.g., host=node0|node1|node2) with group-by, so that
+        OpenTSDB returns one time series per structure and metric, which are then demultiplexed locally.
+
+        Args:
+            tag (string): The tag that identifies the structures (e.g., 'host' for containers)
+            structure_names (list): The names of the structures whose usages are retrieved
+            window_difference (integer): The length in seconds of the time window
+            window_delay (integer): The delay in seconds of the time window with respect to now
+            retrieve_metrics (list): The metrics to be retrieved from OpenTSDB
+            generate_metrics (dict): The metrics to generate from the retrieved ones
+            downsample (integer): The downsample period in seconds
+            chunk_size (integer): The maximum number of structures sent in a single query
+            only_found (boolean): Whether to leave out the structures without any time series in the result, instead
+            of giving them the default values
+
+        Returns:
+            (dict) A dictionary with the final usage values of each structure, indexed by structure name
+        """
+        structures_usages = dict()
+        for chunk, query in self.generate_structures_queries(tag, structure_names, window_difference, window_delay,
+                                                             retrieve_metrics, downsample, chunk_size):
+            result = self.get_points(query)
+            structures_usages.update(
+                self.parse_structures_result(tag, chunk, result, retrieve_metrics, generate_metrics, only_found))
+
+        return structures_usages
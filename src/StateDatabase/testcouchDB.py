@@ -24,6 +24,7 @@
 # along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
 
 
+import json
 from unittest import TestCase
 
 from src.StateDatabase.couchdb import CouchDBServer
@@ -33,6 +34,66 @@ from src.test.documents.rules import cpu_exceeded_upper, CpuRescaleUp
 from src.test.documents.structures import base_container
 
 
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code, self.data = status_code, data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeBulkSession:
+    def __init__(self, bulk_results, failing_ids):
+        self.bulk_results, self.failing_ids, self.updated = bulk_results, failing_ids, list()
+
+    def post(self, url, data=None, headers=None):
+        if url.endswith("/_bulk_docs"):
+            return FakeResponse(201, self.bulk_results)
+        doc = json.loads(data)
+        if doc["_id"] in self.failing_ids:
+            return FakeResponse(403, {"error": "forbidden"})
+        self.updated.append(doc["_id"])
+        return FakeResponse(201, {"ok": True})
+
+
+class BulkUpdateTest(TestCase):
+
+    def test_bulk_update_errors(self):
+        couchdb = CouchDBServer()
+        limits = [{"_id": "limit{0}".format(i), "_rev": "1", "name": "node{0}".format(i)} for i in range(3)]
+
+        # Every document that failed is retried, not only the conflicting ones
+        couchdb.session = FakeBulkSession([{"id": "limit0", "rev": "2"},
+                                           {"id": "limit1", "error": "conflict", "reason": "Document update conflict."},
+                                           {"id": "limit2", "error": "unknown_error", "reason": "timeout"}], [])
+        TestCase.assertEqual(self, first=True, second=couchdb.update_limits(limits))
+        TestCase.assertEqual(self, first=["limit1", "limit2"], second=couchdb.session.updated)
+
+        # Documents that can't be updated are reported
+        couchdb.session = FakeBulkSession([{"id": "limit0", "error": "forbidden", "reason": "invalid"},
+                                           {"id": "limit1", "rev": "2"}, {"id": "limit2", "rev": "2"}], ["limit0"])
+        TestCase.assertEqual(self, first=False, second=couchdb.update_limits(limits))
+
+    def test_find_by_names_in_chunks(self):
+        queries = list()
+
+        class FakeFindSession:
+            def post(self, url, data=None, headers=None):
+                query = json.loads(data)
+                queries.append(query)
+                return FakeResponse(200, {"docs": [{"name": name} for name in query["selector"]["name"]["$in"]]})
+
+        couchdb = CouchDBServer()
+        couchdb.session = FakeFindSession()
+        names = ["node{0}".format(i) for i in range(450)]
+        TestCase.assertEqual(self, first=names, second=[d["name"] for d in couchdb.get_limits_by_names(names)])
+        TestCase.assertEqual(self, first=[200, 200, 50], second=[q["limit"] for q in queries])
+        TestCase.assertEqual(self, first=[], second=couchdb.get_structures_by_names([]))
+
+
 class DocumentTest(TestCase):
     __database = None
     __database_type = None
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+from threading import Event
+from unittest import TestCase
+
+from src.StateDatabase.couchdb_mirror import CouchDBMirror
+
+
+class ChangesFeedStub:
+    """Changes feed of the mirrored databases, each call returns the changes added since the given sequence"""
+
+    def __init__(self):
+        self.changes = {"structures": list(), "limits": list(), "rules": list()}
+        self.changed = Event()
+
+    def add_change(self, database, doc, deleted=False):
+        change = {"id": doc["_id"], "doc": doc}
+        if deleted:
+            change["deleted"] = True
+        self.changes[database].append(change)
+        self.changed.set()
+
+    def get_changes(self, database, since="0", feed="normal", timeout=None):
+        if feed == "longpoll" and len(self.changes[database]) <= int(since):
+            self.changed.wait(0.05)
+            self.changed.clear()
+        changes = self.changes[database][int(since):]
+        return changes, str(int(since) + len(changes))
+
+
+class CouchDBMirrorTest(TestCase):
+
+    def wait_until(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.02)
+        self.fail("Condition not met in time")
+
+    def test_mirror(self):
+        feed = ChangesFeedStub()
+        feed.add_change("structures", {"_id": "s0", "name": "node0", "subtype": "container"})
+        feed.add_change("structures", {"_id": "s1", "name": "app0", "subtype": "application"})
+        feed.add_change("limits", {"_id": "l0", "name": "node0", "resources": {"cpu": {"upper": 100}}})
+        feed.add_change("rules", {"_id": "_design/rules", "views": {}})
+        feed.add_change("rules", {"_id": "r0", "name": "CpuRescaleUp"})
+
+        mirror = CouchDBMirror(handler_factory=lambda: feed, poll_timeout=1, retry_time=0.1)
+        TestCase.assertEqual(self, first=False, second=mirror.is_synced())
+        mirror.start()
+        self.assertTrue(mirror.wait_synced(timeout=5))
+
+        TestCase.assertEqual(self, first=["node0"], second=[s["name"] for s in mirror.get_structures(subtype="container")])
+        TestCase.assertEqual(self, first=2, second=len(mirror.get_structures()))
+        TestCase.assertEqual(self, first=["CpuRescaleUp"], second=[r["name"] for r in mirror.get_rules()])
+        TestCase.assertEqual(self, first=["node0"], second=[l["name"] for l in mirror.get_limits_by_names(["node0", "node1"])])
+        with self.assertRaises(ValueError):
+            mirror.get_limits({"name": "node1"})
+
+        # The documents returned are copies
+        mirror.get_limits({"name": "node0"})["resources"]["cpu"]["upper"] = 200
+        TestCase.assertEqual(self, first=100, second=mirror.get_limits({"name": "node0"})["resources"]["cpu"]["upper"])
+
+        # Updates and deletions are applied as they are received
+        feed.add_change("limits", {"_id": "l0", "name": "node0", "resources": {"cpu": {"upper": 150}}})
+        feed.add_change("structures", {"_id": "s1"}, deleted=True)
+        self.wait_until(lambda: mirror.get_limits({"name": "node0"})["resources"]["cpu"]["upper"] == 150)
+        self.wait_until(lambda: len(mirror.get_structures()) == 1)
+
+        mirror.stop()
+
+    def test_retry_on_error(self):
+        feed = ChangesFeedStub()
+        calls = list()
+
+        def get_changes(database, since="0", feed="normal", timeout=None):
+            calls.append(database)
+            if calls.count(database) == 1:
+                raise ValueError("Database not available")
+            return list(), since
+
+        feed.get_changes = get_changes
+        mirror = CouchDBMirror(handler_factory=lambda: feed, poll_timeout=1, retry_time=0.05)
+        mirror.start()
+        self.assertTrue(mirror.wait_synced(timeout=5))
+        mirror.stop()
@@ -0,0 +1,44 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2022 Universidade da Coruña
+# Authors:
+#     - Jonatan Enes [main](jonatan.enes@udc.es)
+#     - Roberto R. Expósito
+#     - Juan Touriño
+#
+# This file is part of the ServerlessContainers framework, from
+# now on referred to as ServerlessContainers.
+#
+# ServerlessContainers is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3
+# of the License, or (at your option) any later version.
+#
+# ServerlessContainers is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ServerlessContainers. If not, see <http://www.gnu.org/licenses/>.
+
+
+class AsyncWattWizardUtils:
+    """
+    Asynchronous counterpart of the WattWizardUtils class, implementing only the model queries needed by the
+    services that run on an asyncio event loop.
+    """
+
+    def __init__(self, server, session):
+        self.server = server
+        self.session = session
+
+    async def get_usage_meeting_budget(self, structure, model_name, user_usage, system_usage, power_budget):
+        params = {'user_load': user_usage,
+                  'system_load': system_usage,
+                  'desired_power': power_budget}
+        async with self.session.get("{0}/{1}/{2}/{3}".format(self.server, "inverse-predict", structure, model_name),
+                                    params=params) as r:
+            r.raise_for_status()
+            return await r.json()
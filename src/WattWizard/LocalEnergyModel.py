@@ -0,0 +1,167 @@
+import time
+from itertools import combinations_with_replacement
+from threading import Lock
+
+import numpy as np
+
+# Same values as in WattWizard (see model/Model.py and app/routes.py), which are not imported to avoid depending on
+# the libraries used to train the models
+MAX_ERROR = 0.001
+MAX_ITERS = 100
+DYNAMIC_VAR = "user_load"
+
+
+class LocalEnergyModel:
+    """
+    Copy of a WattWizard polynomial model (including linear ones) built from its '/model-attributes', so that
+    predictions and inverse predictions are computed locally with the same results as WattWizard.
+    """
+
+    def __init__(self, attributes, cpu_limits):
+        polynomial = attributes.get("polynomial")
+        if not polynomial:
+            raise ValueError("Model can't be evaluated as a polynomial")
+
+        self.version = attributes["version"]
+        self.model_vars = attributes["model_vars"]
+        self.idle_consumption = attributes["idle_consumption"]
+        self.cpu_limits = cpu_limits
+        self.coefficients = np.array(attributes["coefficients"], dtype=float).ravel()
+        self.intercept = float(np.sum(attributes["intercept"]))
+        self.offset = polynomial["offset"] or 0
+        self.include_bias = polynomial["include_bias"]
+        self.scaler_mean = None if polynomial["scaler_mean"] is None else np.array(polynomial["scaler_mean"])
+        self.scaler_scale = None if polynomial["scaler_scale"] is None else np.array(polynomial["scaler_scale"])
+
+        # Same terms and order as sklearn PolynomialFeatures
+        self.terms = list()
+        for degree in range(1, polynomial["degree"] + 1):
+            self.terms += [list(term) for term in combinations_with_replacement(range(len(self.model_vars)), degree)]
+
+        num_features = len(self.terms) + (1 if self.include_bias else 0)
+        if len(self.coefficients) != num_features:
+            raise ValueError("Model has {0} coefficients but {1} features".format(len(self.coefficients), num_features))
+
+    def get_features(self, X_dict):
+        x = np.array([X_dict[var] for var in self.model_vars], dtype=float)
+        features = [np.prod(x[term]) for term in self.terms]
+        if self.include_bias:
+            features.insert(0, 1.0)
+        features = np.array(features)
+        if self.scaler_mean is not None:
+            features = (features - self.scaler_mean) / self.scaler_scale
+        return features
+
+    def predict(self, X_dict):
+        return self.offset + self.intercept + float(np.dot(self.coefficients, self.get_features(X_dict)))
+
+    def check_resources_limits(self, X_dict):
+        for var, value in X_dict.items():
+            var_limits = self.cpu_limits[var]
+            if value < var_limits["min"]:
+                raise ValueError(f'Too low {var} value ({value}). Minimum value is {var_limits["min"]}.')
+            if value > var_limits["max"]:
+                raise ValueError(f'{var} value ({value}) exceeds its maximum. Maximum value is {var_limits["max"]}.')
+
+    def get_inverse_prediction(self, current_X, desired_power, dynamic_var):
+        # Same method as WattWizard Model.get_inverse_prediction
+        limits = self.cpu_limits[dynamic_var]
+        estimated_power = self.predict(current_X)
+        error = abs(desired_power - estimated_power)
+        count_iters = 0
+        while error > MAX_ERROR and count_iters < MAX_ITERS and limits["min"] < current_X[dynamic_var] < limits["max"]:
+            current_X[dynamic_var] = desired_power * current_X[dynamic_var] / estimated_power
+            estimated_power = self.predict(current_X)
+            error = abs(desired_power - estimated_power)
+            count_iters += 1
+
+        return {
+            "value": max(limits["min"], min(limits["max"], current_X[dynamic_var]))
+        }
+
+    def get_usage_meeting_budget(self, user_usage, system_usage, power_budget):
+        """Local equivalent of WattWizardUtils.get_usage_meeting_budget
+
+        Args:
+            user_usage (float): The current CPU user usage
+            system_usage (float): The current CPU system usage
+            power_budget (float): The desired power
+
+        Returns:
+            (dict) The CPU 'value' that would meet the power budget
+        """
+        loads = {"user_load": user_usage, "system_load": system_usage}
+        if any(var not in loads for var in self.model_vars):
+            raise ValueError("Model variables {0} are not supported".format(self.model_vars))
+        current_X = {var: loads[var] for var in self.model_vars}
+        self.check_resources_limits(current_X)
+        if self.idle_consumption and power_budget <= self.idle_consumption:
+            raise ValueError(f'Requested power value ({power_budget}) lower than idle consumption ({self.idle_consumption})')
+        return self.get_inverse_prediction(current_X, power_budget, DYNAMIC_VAR)
+
+
+class LocalEnergyModels:
+    """
+    Cache of the local copies of the WattWizard models. The model attributes are retrieved again after a refresh
+    period and the copy is only rebuilt if the model version has changed (e.g., it has been trained). Models that
+    can't be evaluated locally are also cached for the refresh period, so that their attributes are not retrieved on
+    every evaluation.
+    """
+
+    def __init__(self, wattwizard_handler, refresh_period=60):
+        self.wattwizard_handler = wattwizard_handler
+        self.refresh_period = refresh_period
+        self.__models = dict()  # (structure, model name) -> (LocalEnergyModel or error message, last refresh)
+        self.__fetch_locks = dict()  # (structure, model name) -> Lock held while the model attributes are retrieved
+        self.__lock = Lock()
+
+    def __get_cached(self, key):
+        with self.__lock:
+            cached = self.__models.get(key)
+        if cached and time.time() - cached[1] < self.refresh_period:
+            return cached
+        return None
+
+    def is_fresh(self, structure, model_name):
+        cached = self.__get_cached((structure, model_name))
+        return cached is not None and isinstance(cached[0], LocalEnergyModel)
+
+    def get_model(self, structure, model_name):
+        key = (structure, model_name)
+        cached = self.__get_cached(key)
+        if cached is None:
+            # The remote operations are done without holding the cache lock so that other models can still be used,
+            # only the retrievals of the same model wait for each other
+            with self.__lock:
+                fetch_lock = self.__fetch_locks.setdefault(key, Lock())
+            with fetch_lock:
+                cached = self.__get_cached(key)
+                if cached is None:
+                    cached = self.__fetch_model(key)
+        if isinstance(cached[0], LocalEnergyModel):
+            return cached[0]
+        raise ValueError(cached[0])
+
+    def __fetch_model(self, key):
+        with self.__lock:
+            previous = self.__models.get(key)
+
+        # Remote operation
+        attributes = self.wattwizard_handler.get_model_attributes(*key)
+        if previous and isinstance(previous[0], LocalEnergyModel) and previous[0].version == attributes["version"]:
+            model = previous[0]
+        else:
+            try:
+                # Remote operation
+                model = LocalEnergyModel(attributes, self.wattwizard_handler.get_cpu_limits())
+            except ValueError as e:
+                model = str(e)
+
+        cached = (model, time.time())
+        with self.__lock:
+            self.__models[key] = cached
+        return cached
+
+    def clear(self):
+        with self.__lock:
+            self.__models.clear()
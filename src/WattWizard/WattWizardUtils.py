@@ -125,6 +125,34 @@ class WattWizardUtils:
             else:
                 self.get_models_structure(structure, avoid_static, tries)
 
+    def get_model_attributes(self, structure, model_name, tries=3):
+        try:
+            r = self.session.get("{0}/{1}/{2}/{3}".format(self.server, "model-attributes", structure, model_name))
+            if r.status_code == 200:
+                return r.json()
+            else:
+                r.raise_for_status()
+        except requests.ConnectionError as e:
+            tries -= 1
+            if tries <= 0:
+                raise Exception(f"Failed to connect to WattWizard: {str(e)}") from e
+            else:
+                return self.get_model_attributes(structure, model_name, tries)
+
+    def get_cpu_limits(self, tries=3):
+        try:
+            r = self.session.get("{0}/{1}".format(self.server, "cpu-limits"))
+            if r.status_code == 200:
+                return r.json()
+            else:
+                r.raise_for_status()
+        except requests.ConnectionError as e:
+            tries -= 1
+            if tries <= 0:
+                raise Exception(f"Failed to connect to WattWizard: {str(e)}") from e
+            else:
+                return self.get_cpu_limits(tries)
+
     def train_model(self, structure, model_name, user_usage, system_usage, power, tries=3):
         try:
             payload = {'user_load': user_usage, 'system_load': system_usage, 'power': power}
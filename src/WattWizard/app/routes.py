@@ -117,7 +117,15 @@ def get_model_attributes(structure=None, model_name=None):
         if intercept is None or coefs is None:
             return jsonify({'ERROR': 'Model not trained. Train the model first, then you could get its attributes'}), 400
         else:
-            return jsonify({'intercept': intercept, 'coefficients': coefs})
+            attributes = {'intercept': intercept, 'coefficients': coefs,
+                          'model_vars': model_instance.get_model_vars(),
+                          'idle_consumption': model_instance.get_idle_consumption(),
+                          'version': model_instance.get_version()}
+            try:
+                attributes['polynomial'] = model_instance.get_polynomial_attributes()
+            except NotImplementedError:
+                attributes['polynomial'] = None
+            return jsonify(attributes)
     except Exception as e:
         return jsonify({'ERROR': str(e)}), 400
 
@@ -1,3 +1,5 @@
+import time
+
 MAX_ERROR = 0.001
 MAX_ITERS = 100
 
@@ -14,6 +16,7 @@ class Model(object):
         self.times_trained = 0
         self.pretrained = False
         self.idle_consumption = 0
+        self.created = time.time()
 
     def get_times_trained(self):
         return self.times_trained
@@ -21,6 +24,14 @@ class Model(object):
     def get_model_vars(self):
         return self.model_vars
     
+    def get_version(self):
+        # Changes whenever the model is trained or reset, so that clients can tell if their copy is outdated
+        return "{0}-{1}-{2}".format(self.created, int(self.pretrained), self.times_trained)
+
+    def get_polynomial_attributes(self):
+        # Attributes needed to evaluate the model as a polynomial outside WattWizard, see LocalEnergyModel
+        raise NotImplementedError("Model can't be evaluated as a polynomial")
+
     def get_idle_consumption(self):
         return self.idle_consumption if self.pretrained else None
 
@@ -24,6 +24,13 @@ class Perceptron(Model):
             return self.model.intercepts_[0].tolist()
         return None
 
+    def get_polynomial_attributes(self):
+        # Without hidden layers and with an identity output activation the perceptron is a linear model
+        if not self.is_fitted('scaler'):
+            return None
+        return {"degree": 1, "include_bias": False,
+                "scaler_mean": self.scaler.mean_.tolist(), "scaler_scale": self.scaler.scale_.tolist(), "offset": 0}
+
     def pretrain(self, X, y):
         X_scaled = self.scaler.fit_transform(X)
         self.model.fit(X_scaled, y)
@@ -23,6 +23,10 @@ class PolynomialRegression(Model):
             return self.model.intercept_
         return None
 
+    def get_polynomial_attributes(self):
+        return {"degree": self.poly_features.degree, "include_bias": self.poly_features.include_bias,
+                "scaler_mean": None, "scaler_scale": None, "offset": self.idle_consumption}
+
     def pretrain(self, X, y):
         X_poly = self.poly_features.fit_transform(X)
         self.model.fit(X_poly, y)
@@ -30,6 +30,14 @@ class SGDRegression(Model):
             return self.model.intercept_.tolist()
         return None
 
+    def get_polynomial_attributes(self):
+        if not self.is_fitted('pipeline'):
+            return None
+        preprocessor = self.pipeline.named_steps['preprocessor']
+        scaler = self.pipeline.named_steps['scaler']
+        return {"degree": preprocessor.degree, "include_bias": preprocessor.include_bias,
+                "scaler_mean": scaler.mean_.tolist(), "scaler_scale": scaler.scale_.tolist(), "offset": 0}
+
     def pretrain(self, X, y):
         X_scaled = self.pipeline.fit_transform(X)
         self.model.fit(X_scaled, y)
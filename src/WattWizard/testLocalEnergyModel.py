@@ -0,0 +1,111 @@
+import threading
+from unittest import TestCase
+
+from src.WattWizard.LocalEnergyModel import LocalEnergyModel, LocalEnergyModels
+
+CPU_LIMITS = {"user_load": {"min": 0, "max": 400}, "system_load": {"min": 0, "max": 400}}
+
+
+def get_attributes(version="1", scaled=False):
+    # power = 20 (idle) + 0.2 * u + 0.1 * s + 0.001 * u^2 + 0 * u * s + 0 * s^2
+    polynomial = {"degree": 2, "include_bias": False, "scaler_mean": None, "scaler_scale": None, "offset": 20}
+    coefficients = [0.2, 0.1, 0.001, 0, 0]
+    if scaled:
+        polynomial.update(include_bias=True, scaler_mean=[1, 0, 0, 0, 0, 0], scaler_scale=[1, 2, 2, 2, 2, 2], offset=0)
+        coefficients = [0] + [2 * c for c in coefficients]
+    return {"intercept": 0.0, "coefficients": coefficients, "model_vars": ["user_load", "system_load"],
+            "idle_consumption": 20, "version": version, "polynomial": polynomial}
+
+
+class WattWizardStub:
+    def __init__(self):
+        self.version = "1"
+        self.calls = 0
+        self.polynomial = True
+        self.blocked = dict()  # model name -> Event to wait for before returning its attributes
+
+    def get_model_attributes(self, structure, model_name):
+        self.calls += 1
+        if model_name in self.blocked:
+            self.blocked[model_name].wait(5)
+        attributes = get_attributes(self.version)
+        if not self.polynomial:
+            attributes["polynomial"] = None
+        return attributes
+
+    def get_cpu_limits(self):
+        return CPU_LIMITS
+
+
+class LocalEnergyModelTest(TestCase):
+
+    def test_predict(self):
+        model = LocalEnergyModel(get_attributes(), CPU_LIMITS)
+        TestCase.assertAlmostEqual(self, first=20 + 20 + 1 + 10, second=model.predict({"user_load": 100, "system_load": 10}))
+
+        # A scaled model with the bias feature gives the same predictions
+        scaled_model = LocalEnergyModel(get_attributes(scaled=True), CPU_LIMITS)
+        TestCase.assertAlmostEqual(self, first=51, second=scaled_model.predict({"user_load": 100, "system_load": 10}) + 20)
+
+        attributes = get_attributes()
+        attributes["coefficients"] = [0.2, 0.1]
+        with self.assertRaises(ValueError):
+            LocalEnergyModel(attributes, CPU_LIMITS)
+
+    def test_get_usage_meeting_budget(self):
+        model = LocalEnergyModel(get_attributes(), CPU_LIMITS)
+        value = model.get_usage_meeting_budget(100, 10, 80)["value"]
+        TestCase.assertAlmostEqual(self, first=80, second=model.predict({"user_load": value, "system_load": 10}), delta=0.01)
+
+        # Budgets under the idle consumption and usages out of the limits can't be met
+        with self.assertRaises(ValueError):
+            model.get_usage_meeting_budget(100, 10, 15)
+        with self.assertRaises(ValueError):
+            model.get_usage_meeting_budget(500, 10, 80)
+
+    def test_models_cache(self):
+        wattwizard = WattWizardStub()
+        models = LocalEnergyModels(wattwizard, refresh_period=60)
+        model = models.get_model("host", "polyreg_General")
+        self.assertTrue(models.is_fresh("host", "polyreg_General"))
+        self.assertIs(model, models.get_model("host", "polyreg_General"))
+        TestCase.assertEqual(self, first=1, second=wattwizard.calls)
+
+        # Once the refresh period is over the attributes are retrieved again, but the model is only rebuilt if changed
+        models.refresh_period = 0
+        self.assertIs(model, models.get_model("host", "polyreg_General"))
+        wattwizard.version = "2"
+        self.assertIsNot(model, models.get_model("host", "polyreg_General"))
+        TestCase.assertEqual(self, first=3, second=wattwizard.calls)
+
+    def test_models_cache_not_local(self):
+        # Models that can't be evaluated locally are not retrieved again until the refresh period is over
+        wattwizard = WattWizardStub()
+        wattwizard.polynomial = False
+        models = LocalEnergyModels(wattwizard, refresh_period=60)
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                models.get_model("host", "perceptron_General")
+        self.assertFalse(models.is_fresh("host", "perceptron_General"))
+        TestCase.assertEqual(self, first=1, second=wattwizard.calls)
+
+        models.refresh_period = 0
+        wattwizard.polynomial = True
+        self.assertIsNotNone(models.get_model("host", "perceptron_General"))
+        TestCase.assertEqual(self, first=2, second=wattwizard.calls)
+
+    def test_models_cache_not_blocked(self):
+        # Retrieving the attributes of a model doesn't block the use of the other ones
+        wattwizard = WattWizardStub()
+        models = LocalEnergyModels(wattwizard, refresh_period=60)
+        models.get_model("host", "polyreg_General")
+        wattwizard.blocked["polyreg_Slow"] = threading.Event()
+        thread = threading.Thread(target=models.get_model, args=("host", "polyreg_Slow"))
+        thread.start()
+        try:
+            self.assertIsNotNone(models.get_model("host", "polyreg_General"))
+            self.assertFalse(models.is_fresh("host", "polyreg_Slow"))
+        finally:
+            wattwizard.blocked["polyreg_Slow"].set()
+            thread.join()
+        self.assertTrue(models.is_fresh("host", "polyreg_Slow"))